@@ -0,0 +1,83 @@
+"""
+Benchmark: API-layer workloads against the in-process mock panel.
+
+Runs the same calls the handlers make (full user list, dashboard stats, user
+lookups, nodes/hosts lists) with API_TRANSPORT=mock at a realistic data size,
+latency and error rate, and reports per-workload timings and client counters.
+
+Run from the repository root:
+    python -m benchmarks.bench_api_mock --users 20000 --latency-ms 30 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def configure(args):
+    # Must be set before modules.config is imported
+    os.environ["API_TRANSPORT"] = "mock"
+    os.environ["MOCK_PANEL_USERS"] = str(args.users)
+    os.environ["MOCK_PANEL_NODES"] = str(args.nodes)
+    os.environ["MOCK_PANEL_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["MOCK_PANEL_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["MOCK_PANEL_ERROR_RATE"] = str(args.error_rate)
+
+
+async def timed(name, rounds, factory):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await factory()
+        timings.append(time.perf_counter() - start)
+    print(f"{name:<36} median {statistics.median(timings) * 1000:9.1f} ms   max {max(timings) * 1000:9.1f} ms")
+
+
+async def run(args):
+    from modules.api.client import RemnaAPI
+    from modules.api.hosts import HostAPI
+    from modules.api.nodes import NodeAPI
+    from modules.api.users import UserAPI
+    from modules.handlers.core.diagnostics import format_api_stats
+
+    await RemnaAPI.init_client()
+    try:
+        first = await UserAPI.get_all_users()
+        sample = first["users"][: args.lookups] if first else []
+
+        await timed("UserAPI.get_all_users", args.rounds, UserAPI.get_all_users)
+        await timed("UserAPI.get_users_stats", args.rounds, UserAPI.get_users_stats)
+        await timed(
+            f"{args.lookups} x get_user_by_username (parallel)", args.rounds,
+            lambda: asyncio.gather(*(UserAPI.get_user_by_username(u["username"]) for u in sample)),
+        )
+        await timed("NodeAPI.get_all_nodes", args.rounds, NodeAPI.get_all_nodes)
+        await timed("HostAPI.get_all_hosts", args.rounds, HostAPI.get_all_hosts)
+        await timed(
+            "10 x concurrent get_all_users", args.rounds,
+            lambda: asyncio.gather(*(UserAPI.get_all_users() for _ in range(10))),
+        )
+        print()
+        print(format_api_stats())
+    finally:
+        await RemnaAPI.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    configure(args)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: decoding a synthetic 500-user /users page.
+
+Compares the old path (response.text.strip() followed by response.json(),
+i.e. the body is decoded to str twice) with the single-decode path used by
+RemnaAPI._make_request for every available JSON backend.
+
+Run from the repository root:
+    python -m benchmarks.bench_json_decode [--users 500] [--rounds 50]
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+from modules.api import json_codec
+from modules.api.mock_panel import MockPanelData
+
+
+def make_page(users: int) -> bytes:
+    data = MockPanelData(users=users)
+    payload = {"response": {"users": data.users, "total": users}}
+    return json.dumps(payload).encode()
+
+
+def old_path(response: httpx.Response):
+    if not response.text.strip():
+        return None
+    data = response.json()
+    if isinstance(data, dict) and "response" in data:
+        return data["response"]
+    return data
+
+
+def make_new_path(loads):
+    def new_path(response: httpx.Response):
+        content = response.content
+        if json_codec.is_blank(content):
+            return None
+        data = loads(content)
+        if isinstance(data, dict) and "response" in data:
+            return data["response"]
+        return data
+    return new_path
+
+
+def bench(name: str, func, body: bytes, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        # A fresh Response each round: httpx caches response.text after the first access
+        response = httpx.Response(200, content=body, headers={"content-type": "application/json"})
+        start = time.perf_counter()
+        result = func(response)
+        timings.append(time.perf_counter() - start)
+        assert len(result["users"]) > 0
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(f"{name:<28} median {median * 1000:8.2f} ms   best {timings[0] * 1000:8.2f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    body = make_page(args.users)
+    print(f"Page: {args.users} users, {len(body) / 1024:.0f} KiB, {args.rounds} rounds")
+    print(f"Default backend: {json_codec.BACKEND_NAME}\n")
+
+    baseline = bench("text.strip() + json()", old_path, body, args.rounds)
+    for backend in ("json", "orjson", "msgspec"):
+        name, loads = json_codec.select_backend(backend)
+        if name != backend:
+            print(f"{'single decode (' + backend + ')':<28} not installed")
+            continue
+        median = bench(f"single decode ({backend})", make_new_path(loads), body, args.rounds)
+        print(f"{'':<28} speedup x{baseline / median:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: HTTP/1.1 keep-alive pool vs HTTP/2 multiplexing on fan-out workloads.
+
+Fires batches of concurrent GET requests (like parallel /users page fetches or
+per-node stats) against a real panel or any HTTP/2-capable endpoint and reports
+wall time and latency percentiles for each transport mode. HTTP/2 needs the h2
+package (pip install "httpx[http2]") and a reverse proxy that negotiates h2.
+
+Run from the repository root:
+    python -m benchmarks.bench_transport --url https://panel.example.com/api \\
+        --token "$REMNAWAVE_API_TOKEN" --endpoint nodes --fanout 32 --rounds 5
+"""
+import argparse
+import asyncio
+import importlib.util
+import statistics
+import time
+
+import httpx
+
+MODES = [
+    ("HTTP/1.1, 5 connections", False, 5),
+    ("HTTP/1.1, 20 connections", False, 20),
+    ("HTTP/2, 1 connection", True, 1),
+]
+
+
+async def run_mode(args, http2: bool, max_connections: int):
+    headers = {"Accept": "application/json"}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    url = f"{args.url.rstrip('/')}/{args.endpoint.lstrip('/')}"
+    latencies = []
+    walls = []
+    versions = set()
+
+    async with httpx.AsyncClient(http2=http2, limits=limits, headers=headers, timeout=args.timeout) as client:
+        # Warm up: open the connection(s) before measuring
+        await client.get(url)
+
+        async def one():
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            versions.add(response.http_version)
+            response.raise_for_status()
+
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.fanout)))
+            walls.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "wall": statistics.median(walls),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "versions": ", ".join(sorted(versions)),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True, help="API base URL, e.g. https://panel/api")
+    parser.add_argument("--token", default=None, help="Bearer token")
+    parser.add_argument("--endpoint", default="system/health")
+    parser.add_argument("--fanout", type=int, default=32, help="Concurrent requests per batch")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    has_h2 = importlib.util.find_spec("h2") is not None
+    print(f"{args.fanout} concurrent GET /{args.endpoint.lstrip('/')}, {args.rounds} rounds\n")
+    for name, http2, max_connections in MODES:
+        if http2 and not has_h2:
+            print(f"{name:<26} skipped: h2 is not installed (pip install 'httpx[http2]')")
+            continue
+        result = await run_mode(args, http2, max_connections)
+        print(
+            f"{name:<26} batch {result['wall'] * 1000:8.1f} ms   "
+            f"p50 {result['p50'] * 1000:7.1f} ms   p95 {result['p95'] * 1000:7.1f} ms   [{result['versions']}]"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
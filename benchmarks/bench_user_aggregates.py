@@ -0,0 +1,81 @@
+"""
+Benchmark: dashboard aggregates over the user snapshot.
+
+Compares per-user Python loops over UserRecord with UserColumns (per-status
+counts, sums and sorted columns) for the status histogram, total traffic,
+expiring-within-7-days, online-in-5-minutes, over-80%-of-limit and an
+ACTIVE-only online count. The columns are rebuilt once per snapshot change
+(typically once per background sync) and then serve every dashboard read.
+
+Run from the repository root:
+    python -m benchmarks.bench_user_aggregates [--users 100000] [--rounds 20]
+"""
+import argparse
+import statistics
+import time
+
+from modules.api.mock_panel import MockPanelData
+from modules.api.user_columns import UserColumns
+from modules.api.user_record import UserRecord
+
+
+def median_ms(func, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, result
+
+
+def loop_aggregates(users, now):
+    stats = {}
+    total = expiring = online = over = active_online = 0
+    for user in users:
+        stats[user.status] = stats.get(user.status, 0) + 1
+        total += user.used_traffic_bytes
+        if user.expire_at is not None and now <= user.expire_at < now + 7 * 86400:
+            expiring += 1
+        if user.online_at is not None and user.online_at >= now - 300:
+            online += 1
+            if user.status == 'ACTIVE':
+                active_online += 1
+        if user.traffic_limit_bytes > 0 and user.used_traffic_bytes / user.traffic_limit_bytes >= 0.8:
+            over += 1
+    return stats, total, expiring, online, over, active_online
+
+
+def column_aggregates(columns, now):
+    return (
+        columns.status_histogram(),
+        columns.total_traffic(),
+        columns.count_expiring(7, now=now),
+        columns.count_online(5, now=now),
+        columns.count_over_limit(80),
+        columns.count_online(5, status='ACTIVE', now=now),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    data = MockPanelData(users=args.users)
+    users = [UserRecord.from_api(user) for user in data.users]
+    now = data.now.timestamp()
+    print(f"{args.users} users\n")
+
+    loop_ms, expected = median_ms(lambda: loop_aggregates(users, now), args.rounds)
+    build_ms, columns = median_ms(lambda: UserColumns(users), max(1, args.rounds // 4))
+    columns_ms, result = median_ms(lambda: column_aggregates(columns, now), args.rounds)
+    assert result == expected, (result, expected)
+
+    print(f"{'Python loop over records':<32} {loop_ms:8.2f} ms")
+    print(f"{'UserColumns build (per change)':<32} {build_ms:8.2f} ms")
+    print(f"{'UserColumns aggregates':<32} {columns_ms:8.2f} ms   x{loop_ms / columns_ms:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: memory of the user snapshot, raw /users JSON vs UserRecord.
+
+Decodes a synthetic /users payload (the shape the store used to keep), then
+builds the compact UserRecord list and the snapshot indexes from it, and
+reports traced allocations and the cost of a full scan for each.
+
+Run from the repository root:
+    python -m benchmarks.bench_user_memory [--users 100000]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from modules.api import json_codec
+from modules.api.mock_panel import MockPanelData
+from modules.api.user_record import UserRecord
+from modules.api.user_store import UserSnapshot
+
+
+def traced(build):
+    """Return (result, bytes still allocated by build)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def scan_ms(users, read) -> float:
+    start = time.perf_counter()
+    total = 0
+    for user in users:
+        total += read(user)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    body = json.dumps(MockPanelData(users=args.users).users).encode()
+    print(f"Payload: {args.users} users, {len(body) / 1024 / 1024:.1f} MiB of JSON ({json_codec.BACKEND_NAME})\n")
+
+    raw, raw_bytes = traced(lambda: json_codec.loads(body))
+    # Decode again so the records own their strings once the temporary dicts are freed
+    records, record_bytes = traced(lambda: [UserRecord.from_api(user) for user in json_codec.loads(body)])
+    _, index_bytes = traced(lambda: UserSnapshot(records, len(records), True))
+
+    def row(name, size):
+        print(f"{name:<28} {size / 1024 / 1024:9.1f} MiB   {size / args.users:7.0f} B/user")
+
+    row("raw dicts", raw_bytes)
+    row("UserRecord", record_bytes)
+    row("snapshot indexes", index_bytes)
+    print(f"{'':<28} records use x{raw_bytes / record_bytes:.1f} less memory than raw dicts\n")
+
+    print(f"{'scan traffic (raw dicts)':<28} {scan_ms(raw, lambda u: u.get('usedTrafficBytes') or 0):9.1f} ms")
+    print(f"{'scan traffic (UserRecord)':<28} {scan_ms(records, lambda u: u.used_traffic_bytes):9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: generic user search, linear scan vs the trigram index.
+
+Runs a mix of selective and broad queries against a synthetic snapshot, both
+with the per-user substring scan the search handler used to do and with
+TrigramIndex, and checks that the text-field matches agree. Then times
+typo-tolerant search (TrigramIndex.similar, trigram prefilter + bounded edit
+distance) against a full edit-distance scan of all usernames, and reports
+the one-time index build and the cost of an incremental update.
+
+Run from the repository root:
+    python -m benchmarks.bench_user_search [--users 100000] [--rounds 5]
+"""
+import argparse
+import statistics
+import time
+
+from modules.api.mock_panel import MockPanelData
+from modules.api.search_index import TEXT_FIELDS, TrigramIndex, edit_distance, max_edits
+from modules.api.user_record import UserRecord
+
+
+def median_ms(func, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, result
+
+
+def linear_search(users, term):
+    term = term.lower()
+    return [
+        user for user in users
+        if any(term in str(getattr(user, field)).lower() for field in TEXT_FIELDS if getattr(user, field) is not None)
+    ]
+
+
+def scan_similar(users, term, max_distance):
+    term = term.lower()
+    edits = min(max_distance, max_edits(term))
+    return [user for user in users if user.username and edit_distance(term, user.username.lower(), edits) <= edits]
+
+
+def typo(username: str) -> str:
+    """Swap two adjacent characters and drop one, as a hurried admin would"""
+    swapped = username[1] + username[0] + username[2:]
+    return swapped[:len(swapped) // 2] + swapped[len(swapped) // 2 + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    users = [UserRecord.from_api(user) for user in MockPanelData(users=args.users).users]
+    print(f"{args.users} users\n")
+
+    build_ms, index = median_ms(lambda: TrigramIndex(users), 1)
+    stats = index.get_stats()
+    print(f"{'index build (once per process)':<34} {build_ms:9.1f} ms   "
+          f"{stats['trigrams']} trigrams, {stats['postings']} postings\n")
+
+    sample = users[len(users) // 2]
+    queries = [sample.username, "synthetic user 1", "example.com", "zzzq", "us", sample.short_uuid[:8]]
+    for term in queries:
+        linear_ms, expected = median_ms(lambda: linear_search(users, term), args.rounds)
+        index_ms, (matches, candidates) = median_ms(lambda: index.search(term), args.rounds)
+        text_matches = {user.uuid for user in matches} & {user.uuid for user in expected}
+        assert text_matches == {user.uuid for user in expected}, term
+        print(f"{term!r:<34} linear {linear_ms:8.2f} ms   index {index_ms:7.2f} ms   "
+              f"{len(matches):6} matches, {candidates:6} checked")
+
+    print()
+    for term in [typo(sample.username), typo(users[len(users) // 3].username)[:6]]:
+        scan_ms, expected = median_ms(lambda: scan_similar(users, term, 2), 1)
+        similar_ms, found = median_ms(lambda: index.similar(term, 2, limit=10), args.rounds)
+        assert {user.uuid for user in found} <= {user.uuid for user in expected}, term
+        print(f"{'similar ' + repr(term):<34} scan   {scan_ms:8.1f} ms   index {similar_ms:7.2f} ms   "
+              f"{len(found):6} found (of {len(expected)})")
+
+    updated = sample.copy()
+    updated.description = "renamed by benchmark"
+    update_ms, _ = median_ms(lambda: index.add(updated), args.rounds)
+    print(f"\n{'incremental update (one user)':<34} {update_ms:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import gc
 import os
 import logging
 import sys
@@ -81,13 +82,88 @@ logger.error("Error logging enabled")
 sys.stdout.flush()
 sys.stderr.flush()
 
-from telegram.ext import Application, MessageHandler, CallbackQueryHandler, filters
+from telegram.ext import Application, MessageHandler, CallbackQueryHandler, InlineQueryHandler, filters
 
 # Import modules
 from modules.handlers.core.conversation import create_conversation_handler
+from modules.handlers.users.inline import inline_user_search
+from modules.api.client import RemnaAPI
+from modules.api.user_store import user_store
+from modules.api.snapshot_file import snapshot_file
+from modules.config import API_HEALTH_PROBE_INTERVAL, USER_STORE_REFRESH_INTERVAL, USER_STORE_REFRESH_JITTER
 from modules import localization  # noqa: F401 - ensure localization patches are loaded
 
 
+async def health_probe_job(context):
+    """Periodically probe the panel so the circuit breaker recovers without user traffic"""
+    await RemnaAPI.probe_health()
+
+
+_gc_frozen = False
+
+
+def freeze_user_snapshot():
+    """Once the first user snapshot is in memory, move it out of the GC's reach: full
+    collections would otherwise walk every record and stall the event loop for hundreds
+    of ms at 100k users. Done once, after a collection, so no garbage is frozen with it."""
+    global _gc_frozen
+    if _gc_frozen or user_store.snapshot is None:
+        return
+    gc.collect()
+    gc.freeze()
+    _gc_frozen = True
+
+
+async def user_store_refresh_job(context):
+    """Rebuild the shared user snapshot before it expires so handlers never wait for pagination"""
+    await user_store.refresh()
+    freeze_user_snapshot()
+    await snapshot_file.save()
+
+
+async def post_init(application: Application):
+    """Open the shared Remnawave API connection pool and schedule background jobs"""
+    await RemnaAPI.init_client()
+    # Serve the last saved state until the background sync catches up
+    await snapshot_file.load()
+    freeze_user_snapshot()
+
+    if API_HEALTH_PROBE_INTERVAL > 0:
+        if application.job_queue is None:
+            logger.warning("JobQueue is not available, panel health probe is disabled")
+        else:
+            application.job_queue.run_repeating(
+                health_probe_job,
+                interval=API_HEALTH_PROBE_INTERVAL,
+                first=API_HEALTH_PROBE_INTERVAL,
+                name="panel_health_probe"
+            )
+            logger.info(f"Panel health probe scheduled every {API_HEALTH_PROBE_INTERVAL}s")
+
+    if USER_STORE_REFRESH_INTERVAL > 0:
+        if application.job_queue is None:
+            logger.warning("JobQueue is not available, users will be loaded on first use")
+        else:
+            # First run right after startup warms the snapshot before the first admin action
+            application.job_queue.run_repeating(
+                user_store_refresh_job,
+                interval=USER_STORE_REFRESH_INTERVAL,
+                first=1,
+                name="user_store_refresh",
+                job_kwargs={"jitter": USER_STORE_REFRESH_JITTER} if USER_STORE_REFRESH_JITTER > 0 else None
+            )
+            logger.info(
+                f"User store refresh scheduled every {USER_STORE_REFRESH_INTERVAL}s "
+                f"(jitter {USER_STORE_REFRESH_JITTER}s)"
+            )
+
+
+async def post_shutdown(application: Application):
+    """Save the snapshot for the next start and close the shared Remnawave API connection pool"""
+    await snapshot_file.save()
+    await RemnaAPI.close_client()
+
+
 def main():
     # Load environment variables
     load_dotenv()
@@ -122,7 +198,13 @@ def main():
         return
     # Create the Application
     logger.info("Creating Telegram Application...")
-    application = Application.builder().token(bot_token).build()
+    application = (
+        Application.builder()
+        .token(bot_token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     logger.info("Telegram Application created successfully")
     
     # Cache cleanup will be handled automatically by the cache TTL mechanism
@@ -133,6 +215,10 @@ def main():
     conv_handler = create_conversation_handler()
     application.add_handler(conv_handler, group=0)
     logger.info("Conversation handler added successfully")
+
+    # Inline queries carry no chat, so they are handled outside the conversation;
+    # block=False lets the per-user debounce wait without holding up other updates
+    application.add_handler(InlineQueryHandler(inline_user_search, block=False), group=1)
     
     # Run polling with retry logic
     max_retries = 10
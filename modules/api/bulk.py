@@ -1,31 +1,40 @@
 from modules.api.client import RemnaAPI
+from modules.api.users import UserAPI
 
 class BulkAPI:
     """API methods for bulk operations"""
     
+    @staticmethod
+    async def _post_users_bulk(endpoint, data=None):
+        """Send a bulk user action and let caches resync the affected users"""
+        result = await RemnaAPI.post(endpoint, data)
+        if result:
+            UserAPI.notify_mutation(UserAPI.MUTATION_BULK)
+        return result
+    
     @staticmethod
     async def bulk_delete_users_by_status(status):
         """Bulk delete users by status"""
         data = {"status": status}
-        return await RemnaAPI.post("users/bulk/delete-by-status", data)
+        return await BulkAPI._post_users_bulk("users/bulk/delete-by-status", data)
     
     @staticmethod
     async def bulk_delete_users(uuids):
         """Bulk delete users by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/delete", data)
+        return await BulkAPI._post_users_bulk("users/bulk/delete", data)
     
     @staticmethod
     async def bulk_revoke_users_subscription(uuids):
         """Bulk revoke users subscription by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/revoke-subscription", data)
+        return await BulkAPI._post_users_bulk("users/bulk/revoke-subscription", data)
     
     @staticmethod
     async def bulk_reset_user_traffic(uuids):
         """Bulk reset traffic for users by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/reset-traffic", data)
+        return await BulkAPI._post_users_bulk("users/bulk/reset-traffic", data)
     
     @staticmethod
     async def bulk_update_users(uuids, fields):
@@ -34,7 +43,7 @@ class BulkAPI:
             "uuids": uuids,
             "fields": fields
         }
-        return await RemnaAPI.post("users/bulk/update", data)
+        return await BulkAPI._post_users_bulk("users/bulk/update", data)
     
     @staticmethod
     async def bulk_update_users_inbounds(uuids, inbounds):
@@ -44,9 +53,9 @@ class BulkAPI:
     @staticmethod
     async def bulk_update_all_users(fields):
         """Bulk update all users"""
-        return await RemnaAPI.post("users/bulk/all/update", fields)
+        return await BulkAPI._post_users_bulk("users/bulk/all/update", fields)
     
     @staticmethod
     async def bulk_reset_all_users_traffic():
         """Bulk reset all users traffic"""
-        return await RemnaAPI.post("users/bulk/all/reset-traffic")
+        return await BulkAPI._post_users_bulk("users/bulk/all/reset-traffic")
@@ -0,0 +1,134 @@
+"""
+Response cache for slow-changing panel resources
+"""
+import copy
+import logging
+import re
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# GET endpoint pattern -> TTL in seconds. Endpoints not listed here are never cached.
+CACHE_POLICIES = [
+    (r"^nodes$", 30),
+    (r"^nodes/[0-9a-f-]{36}$", 30),
+    (r"^hosts$", 60),
+    (r"^hosts/[0-9a-f-]{36}$", 60),
+    (r"^config-profiles$", 300),
+    (r"^config-profiles/inbounds$", 300),
+    (r"^config-profiles/[0-9a-f-]{36}/inbounds$", 300),
+    (r"^keygen$", 3600),
+    (r"^system/stats$", 10),
+]
+
+# Mutating endpoint pattern -> cached GET endpoint prefixes it makes stale
+INVALIDATION_RULES = [
+    (r"^nodes", ("nodes", "system/stats")),
+    (r"^hosts", ("hosts",)),
+    (r"^config-profiles", ("config-profiles", "hosts", "nodes")),
+    (r"^users", ("system/stats",)),
+]
+
+_COMPILED_POLICIES = [(re.compile(pattern), ttl) for pattern, ttl in CACHE_POLICIES]
+_COMPILED_RULES = [(re.compile(pattern), prefixes) for pattern, prefixes in INVALIDATION_RULES]
+
+
+class ResponseCache:
+    """TTL cache keyed by (endpoint, params) with hit/miss counters per endpoint"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generation = 0
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def ttl_for(endpoint: str) -> Optional[float]:
+        """Return the TTL configured for an endpoint or None if it is not cacheable"""
+        endpoint = endpoint.strip('/')
+        for pattern, ttl in _COMPILED_POLICIES:
+            if pattern.match(endpoint):
+                return ttl
+        return None
+
+    @property
+    def generation(self) -> int:
+        """Incremented on every invalidation; a fetch started earlier must not be stored"""
+        return self._generation
+
+    def _count(self, endpoint: str, counter: str):
+        counters = self._counters.setdefault(endpoint, {"hits": 0, "misses": 0})
+        counters[counter] += 1
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """Return (hit, value); the value is a copy so callers may modify it.
+        An expired entry is a miss but stays stored as the last good response (see export)"""
+        endpoint = key[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._count(endpoint, "hits")
+                return True, copy.deepcopy(value)
+        self._count(endpoint, "misses")
+        return False, None
+
+    def set(self, key: Tuple, value: Any, ttl: float, generation: int):
+        """Store a response unless the cache was invalidated while it was being fetched"""
+        if value is None or generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+
+    def export(self, prefixes: Tuple[str, ...]) -> Dict[str, Any]:
+        """Last good responses without query params for endpoints under prefixes (for persistence).
+        Expired ones are included: the snapshot is saved far less often than nodes/hosts expire,
+        and a mutation drops the affected entries anyway."""
+        return {
+            key[0]: value
+            for key, (_, value) in self._entries.items()
+            if not key[1] and any(key[0] == prefix or key[0].startswith(prefix + "/") for prefix in prefixes)
+        }
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every cached endpoint starting with prefix"""
+        self._generation += 1
+        stale = [key for key in self._entries if key[0] == prefix or key[0].startswith(prefix + "/")]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    @staticmethod
+    def stale_prefixes(endpoint: str) -> Tuple[str, ...]:
+        """Cached GET endpoint prefixes a mutating call on endpoint makes stale"""
+        endpoint = endpoint.strip('/')
+        for pattern, prefixes in _COMPILED_RULES:
+            if pattern.match(endpoint):
+                return prefixes
+        return ()
+
+    def invalidate_for_mutation(self, endpoint: str):
+        """Invalidate GET keys related to a mutating call on endpoint"""
+        prefixes = self.stale_prefixes(endpoint)
+        if prefixes:
+            dropped = sum(self.invalidate_prefix(prefix) for prefix in prefixes)
+            logger.debug(f"Mutation {endpoint.strip('/')} invalidated {dropped} cached responses")
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._generation += 1
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters overall and per endpoint"""
+        hits = sum(c["hits"] for c in self._counters.values())
+        misses = sum(c["misses"] for c in self._counters.values())
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "endpoints": {endpoint: dict(counters) for endpoint, counters in self._counters.items()},
+        }
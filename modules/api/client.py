@@ -1,7 +1,18 @@
 import httpx
 import logging
 import asyncio
-from modules.config import API_BASE_URL, API_TOKEN, API_COOKIES
+import copy
+import time
+from typing import Any, Dict, Optional, Tuple
+from modules.api import json_codec
+from modules.api.cache import ResponseCache
+from modules.api.health import api_health
+from modules.api.retry import retry_policy
+from modules.api.transport import create_transport
+from modules.config import (
+    API_BASE_URL, API_TOKEN, API_COOKIES, API_TIMEOUT, API_CACHE_ENABLED, API_TRANSPORT,
+    API_MAX_CONNECTIONS, API_MAX_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY, API_MAX_CONCURRENCY
+)
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +21,7 @@ def get_headers():
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
-        "User-Agent": "RemnaBot/1.0",
-        "Connection": "close"
+        "User-Agent": "RemnaBot/1.0"
     }
     if API_TOKEN:
         headers["Authorization"] = f"Bearer {API_TOKEN}"
@@ -20,19 +30,10 @@ def get_headers():
 def get_client_kwargs():
     """Get httpx client configuration"""
     client_kwargs = {
-        "timeout": 30.0,  # Reduced timeout for faster failure detection
-        "verify": True,  # Enable SSL verification for HTTPS
+        "timeout": API_TIMEOUT,
         "headers": get_headers(),
-        # More conservative connection limits to prevent exhaustion
-        "limits": httpx.Limits(
-            max_keepalive_connections=2, 
-            max_connections=5, 
-            keepalive_expiry=10  # Shorter keepalive to prevent stale connections
-        ),
-        # Force HTTP/1.1 for better compatibility
-        "http2": False,
-        # SSL configuration for HTTPS
-        "cert": None,  # No client certificate
+        # Connection pool, TLS and HTTP/2 settings live in the transport (see modules/api/transport.py)
+        "transport": create_transport(),
         "trust_env": False  # Don't use environment variables for proxy settings
     }
 
@@ -46,194 +47,356 @@ def get_client_kwargs():
 class RemnaAPI:
     """API client for Remnawave API using httpx"""
     
+    # Application-scoped client shared by all API classes (see init_client/close_client)
+    _client: Optional[httpx.AsyncClient] = None
+    
+    # Single-flight registry: identical in-flight GETs share one task and one response
+    _inflight: Dict[Tuple, asyncio.Future] = {}
+    _waiters: Dict[asyncio.Future, int] = {}
+    _get_calls = 0
+    _coalesced_calls = 0
+    
+    # Limits simultaneous requests to the panel across all API classes
+    _concurrency: Optional[asyncio.Semaphore] = None
+    _active_requests = 0
+    _http2 = False
+    
+    # TTL cache for slow-changing resources (nodes, hosts, config profiles, ...)
+    _cache = ResponseCache(enabled=API_CACHE_ENABLED)
+    
+    @staticmethod
+    async def init_client():
+        """Create the shared HTTP client (called from Application.post_init)"""
+        if RemnaAPI._client is not None and not RemnaAPI._client.is_closed:
+            return RemnaAPI._client
+        client_kwargs = get_client_kwargs()
+        RemnaAPI._client = httpx.AsyncClient(**client_kwargs)
+        RemnaAPI._http2 = getattr(client_kwargs['transport'], 'http2', False)
+        logger.info(
+            f"Shared API client created (transport={API_TRANSPORT}, http2={RemnaAPI._http2}, "
+            f"max_connections={API_MAX_CONNECTIONS}, "
+            f"max_keepalive={API_MAX_KEEPALIVE_CONNECTIONS}, keepalive_expiry={API_KEEPALIVE_EXPIRY}s, "
+            f"max_concurrency={API_MAX_CONCURRENCY or 'unlimited'})"
+        )
+        return RemnaAPI._client
+    
+    @staticmethod
+    async def close_client():
+        """Close the shared HTTP client (called from Application.post_shutdown)"""
+        client = RemnaAPI._client
+        RemnaAPI._client = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+            logger.info("Shared API client closed")
+    
+    @staticmethod
+    async def get_client() -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it lazily outside the bot lifecycle"""
+        client = RemnaAPI._client
+        if client is None or client.is_closed:
+            client = await RemnaAPI.init_client()
+        return client
+    
     @staticmethod
-    async def _test_connection():
-        """Test basic connectivity to the API server"""
+    def get_limiter() -> Optional[asyncio.Semaphore]:
+        """Return the semaphore shared by all API calls (None when concurrency is unlimited)"""
+        if API_MAX_CONCURRENCY <= 0:
+            return None
+        if RemnaAPI._concurrency is None:
+            RemnaAPI._concurrency = asyncio.Semaphore(API_MAX_CONCURRENCY)
+        return RemnaAPI._concurrency
+    
+    @staticmethod
+    async def _send(client: httpx.AsyncClient, method: str, **kwargs) -> httpx.Response:
+        """Send one request through the shared concurrency limiter"""
+        limiter = RemnaAPI.get_limiter()
+        if limiter is None:
+            return await client.request(method, **kwargs)
+        async with limiter:
+            RemnaAPI._active_requests += 1
+            try:
+                return await client.request(method, **kwargs)
+            finally:
+                RemnaAPI._active_requests -= 1
+    
+    @staticmethod
+    def is_available() -> bool:
+        """Return False while the circuit breaker considers the panel down"""
+        return api_health.is_available()
+    
+    @staticmethod
+    async def probe_health() -> bool:
+        """Probe system/health and feed the result into the circuit breaker"""
+        url = f"{API_BASE_URL.rstrip('/')}/system/health"
         try:
-            # Используем известный рабочий эндпоинт для проверки подключения
-            url = f"{API_BASE_URL.rstrip('/')}/users"
-            client_kwargs = get_client_kwargs()
-            
-            async with httpx.AsyncClient(**client_kwargs) as client:
-                response = await client.get(url, timeout=10.0, follow_redirects=True)
-                logger.debug(f"Тест подключения: статус {response.status_code}, URL: {response.url}")
-                return response.status_code == 200
+            client = await RemnaAPI.get_client()
+            response = await client.get(url, timeout=10.0, follow_redirects=True)
+            logger.debug(f"Проверка здоровья панели: статус {response.status_code}")
         except Exception as e:
-            logger.debug(f"Тест подключения не прошел: {e}")
+            logger.debug(f"Проверка здоровья панели не прошла: {e}")
+            api_health.record_failure()
+            return False
+        if response.status_code >= 500:
+            api_health.record_failure()
             return False
+        api_health.record_success()
+        return True
     
     @staticmethod
-    async def _make_request(method, endpoint, data=None, params=None, retry_count=3):
-        """Make HTTP request with retry logic and proper error handling"""
+    async def _make_request(method, endpoint, data=None, params=None, retry_count=None, deadline=None):
+        """Make HTTP request; failures are retried according to retry_policy.
+        POST/PATCH are only resent when the request never reached the panel."""
         url = f"{API_BASE_URL.rstrip('/')}/{endpoint.lstrip('/')}"
+        method = method.upper()
         
         logger.info(f"Making {method} request to: {url}")
         logger.debug(f"Request params: {params}")
         logger.debug(f"Request data: {data}")
         
-        for attempt in range(retry_count):
+        request_kwargs = {
+            'url': url,
+            'params': params
+        }
+        if method in ['POST', 'PATCH', 'PUT'] and data is not None:
+            request_kwargs['json'] = data
+        
+        deadline_at = time.monotonic() + (deadline or retry_policy.deadline)
+        if retry_policy.budget is not None:
+            retry_policy.budget.record_request()
+        
+        attempt = 0
+        delay = 0.0
+        while True:
+            attempt += 1
+            # Fail fast while the panel is known to be down
+            if not api_health.allow_request():
+                logger.warning(f"Панель недоступна (circuit breaker открыт), запрос {method} {endpoint} пропущен")
+                return None
+            
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"Истёк срок выполнения запроса {method} {endpoint}")
+                return None
+            
+            response = None
             try:
-                # Test connection on first attempt or after failures
-                if attempt == 0 or attempt > 0:
-                    if not await RemnaAPI._test_connection():
-                        logger.warning(f"Тест подключения не прошел на попытке {attempt + 1}")
-                        if attempt < retry_count - 1:
-                            wait_time = 2 ** attempt
-                            logger.info(f"Ожидание {wait_time} секунд перед повторной попыткой...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            logger.error("Тест подключения не прошел на финальной попытке")
-                            return None
-                
-                client_kwargs = get_client_kwargs()
-                logger.debug(f"Client config: {client_kwargs}")
-                
-                async with httpx.AsyncClient(**client_kwargs) as client:
-                    request_kwargs = {
-                        'url': url,
-                        'params': params
-                    }
-                    
-                    if method.upper() in ['POST', 'PATCH', 'PUT'] and data is not None:
-                        request_kwargs['json'] = data
-                    
-                    response = await client.request(method, follow_redirects=True, **request_kwargs)
-                    
-                    logger.debug(f"Response status: {response.status_code}")
-                    logger.debug(f"Response headers: {dict(response.headers)}")
-                    
-                    # Проверка статуса ответа
-                    if response.status_code >= 500:
-                        logger.warning(f"Ошибка сервера {response.status_code}, повторная попытка...")
-                        if attempt < retry_count - 1:
-                            await asyncio.sleep(2 ** attempt)
-                            continue
-                    
-                    response.raise_for_status()
-                    
-                    # Проверка Content-Type
-                    content_type = response.headers.get('content-type', '')
-                    if 'application/json' not in content_type.lower():
-                        logger.error(f"Ожидался JSON, получен {content_type}. Ответ: {response.text[:500]}")
-                        return None
-                    
-                    # Парсинг JSON
-                    if not response.text.strip():
-                        logger.warning("Получен пустой ответ")
-                        return None
-                    
-                    json_response = response.json()
-                    
-                    # Обработка структуры ответа Remnawave API
-                    if isinstance(json_response, dict):
-                        if 'response' in json_response:
-                            return json_response['response']
-                        elif 'error' in json_response:
-                            logger.error(f"API вернул ошибку: {json_response['error']}")
-                            return None
-                        else:
-                            return json_response
-                    
-                    return json_response
-                        
-            except httpx.ConnectError as e:
-                logger.error(f"Ошибка подключения на попытке {attempt + 1}: {str(e)}")
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Не удалось подключиться после {retry_count} попыток")
-                    return None
-                    
-            except httpx.TimeoutException as e:
-                logger.error(f"Превышено время ожидания на попытке {attempt + 1}: {str(e)}")
-                if attempt < retry_count - 1:
-                    wait_time = min(2 ** attempt, 10)
-                    logger.info(f"Повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Превышено время ожидания после {retry_count} попыток")
-                    return None
-                    
-            except httpx.HTTPStatusError as e:
-                status = e.response.status_code
-                if status == 404:
-                    logger.info(f"HTTP 404 для {url}: {e.response.text}")
-                    return None
-                logger.error(f"HTTP ошибка {status}: {e.response.text}")
-                if status >= 500 and attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Ошибка сервера, повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    return None
-                    
-            except httpx.RemoteProtocolError as e:
-                logger.error(f"Ошибка протокола на попытке {attempt + 1}: {str(e)}")
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Ошибка протокола, повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Ошибка протокола после {retry_count} попыток")
-                    return None
-                    
-            except httpx.ConnectTimeout as e:
-                logger.error(f"Таймаут подключения на попытке {attempt + 1}: {str(e)}")
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Таймаут подключения, повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Таймаут подключения после {retry_count} попыток")
-                    return None
-                    
-            except httpx.ReadTimeout as e:
-                logger.error(f"Таймаут чтения на попытке {attempt + 1}: {str(e)}")
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Таймаут чтения, повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Таймаут чтения после {retry_count} попыток")
+                client = await RemnaAPI.get_client()
+                response = await RemnaAPI._send(
+                    client, method, follow_redirects=True, timeout=min(API_TIMEOUT, remaining), **request_kwargs
+                )
+            except httpx.HTTPError as e:
+                api_health.record_failure()
+                logger.error(f"{type(e).__name__} при запросе {method} {endpoint} (попытка {attempt}): {e}")
+                if not retry_policy.should_retry_error(method, e):
                     return None
-                    
             except Exception as e:
-                logger.error(f"Неожиданная ошибка на попытке {attempt + 1}: {str(e)}")
+                logger.error(f"Неожиданная ошибка при запросе {method} {endpoint}: {e}")
                 logger.debug(f"Тип исключения: {type(e).__name__}")
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Неожиданная ошибка, повторная попытка через {wait_time} секунд...")
-                    await asyncio.sleep(wait_time)
+                return None
+            else:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Response status: {response.status_code}")
+                    logger.debug(f"Response headers: {dict(response.headers)}")
+                
+                if response.status_code >= 500:
+                    api_health.record_failure()
                 else:
-                    logger.error(f"Неожиданная ошибка после {retry_count} попыток")
-                    return None
+                    api_health.record_success()
+                
+                if not retry_policy.should_retry_status(method, response.status_code):
+                    return RemnaAPI._parse_response(response)
+                logger.warning(f"Панель ответила {response.status_code} на {method} {endpoint} (попытка {attempt})")
+            
+            delay = retry_policy.plan_retry(attempt, delay, deadline_at, response, retry_count)
+            if delay is None:
+                logger.error(f"Запрос {method} {endpoint} не выполнен после {attempt} попыток")
+                return None
+            logger.info(f"Повторная попытка {method} {endpoint} через {delay:.1f} секунд...")
+            await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _parse_response(response: httpx.Response):
+        """Check the status, decode the body once and unwrap the Remnawave response envelope"""
+        status = response.status_code
+        if status == 404:
+            logger.info(f"HTTP 404 для {response.request.url}: {response.text}")
+            return None
+        if status >= 400:
+            logger.error(f"HTTP ошибка {status}: {response.text}")
+            return None
+        
+        # Проверка Content-Type
+        content_type = response.headers.get('content-type', '')
+        if 'application/json' not in content_type.lower():
+            logger.error(f"Ожидался JSON, получен {content_type}. Ответ: {response.text[:500]}")
+            return None
         
-        return None
+        # Парсинг JSON: тело декодируется один раз из сырых байтов
+        content = response.content
+        if json_codec.is_blank(content):
+            logger.warning("Получен пустой ответ")
+            return None
+        
+        try:
+            json_response = json_codec.loads(content)
+        except ValueError as e:
+            logger.error(f"Некорректный JSON в ответе: {e}")
+            return None
+        
+        # Обработка структуры ответа Remnawave API
+        if isinstance(json_response, dict):
+            if 'response' in json_response:
+                return json_response['response']
+            elif 'error' in json_response:
+                logger.error(f"API вернул ошибку: {json_response['error']}")
+                return None
+        
+        return json_response
     
     @staticmethod
     async def get(endpoint, params=None):
-        """Make a GET request to the API"""
-        return await RemnaAPI._make_request('GET', endpoint, params=params)
+        """Make a GET request to the API, serving cacheable endpoints from the TTL cache
+        and coalescing identical concurrent calls"""
+        key = RemnaAPI._request_key(endpoint, params)
+        RemnaAPI._get_calls += 1
+        
+        cache = RemnaAPI._cache
+        ttl = cache.ttl_for(key[0]) if cache.enabled else None
+        if ttl is not None:
+            hit, value = cache.get(key)
+            if hit:
+                return value
+        
+        task = RemnaAPI._inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            RemnaAPI._coalesced_calls += 1
+            logger.debug(f"Coalesced GET {endpoint} with an in-flight request")
+        else:
+            task = asyncio.ensure_future(RemnaAPI._fetch(key, endpoint, params, ttl))
+            RemnaAPI._inflight[key] = task
+            
+            def _release(done, key=key):
+                if RemnaAPI._inflight.get(key) is done:
+                    del RemnaAPI._inflight[key]
+            
+            task.add_done_callback(_release)
+        
+        # Shield so that one cancelled caller does not cancel the shared request; the request
+        # itself is cancelled once every caller waiting for it has been cancelled
+        RemnaAPI._waiters[task] = RemnaAPI._waiters.get(task, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+            # Like cache hits, joined callers get their own copy: the response stays safe to modify
+            return copy.deepcopy(result) if coalesced else result
+        finally:
+            waiters = RemnaAPI._waiters.pop(task) - 1
+            if waiters:
+                RemnaAPI._waiters[task] = waiters
+            elif not task.done():
+                if RemnaAPI._inflight.get(key) is task:
+                    del RemnaAPI._inflight[key]
+                task.cancel()
+    
+    @staticmethod
+    async def _fetch(key, endpoint, params, ttl):
+        """Send a GET and store the result if the endpoint is cacheable"""
+        generation = RemnaAPI._cache.generation
+        result = await RemnaAPI._make_request('GET', endpoint, params=params)
+        if ttl is not None:
+            RemnaAPI._cache.set(key, result, ttl, generation)
+        return result
+    
+    @staticmethod
+    async def revalidate(endpoint, params=None):
+        """Fetch a cacheable GET bypassing the cache and store the fresh response.
+        On failure the cached value (e.g. restored from disk) is kept."""
+        key = RemnaAPI._request_key(endpoint, params)
+        ttl = RemnaAPI._cache.ttl_for(key[0]) if RemnaAPI._cache.enabled else None
+        return await RemnaAPI._fetch(key, endpoint, params, ttl)
+    
+    @staticmethod
+    def seed_cache(endpoint, value, params=None) -> bool:
+        """Put a response obtained elsewhere (e.g. the on-disk snapshot) into the cache"""
+        cache = RemnaAPI._cache
+        key = RemnaAPI._request_key(endpoint, params)
+        ttl = cache.ttl_for(key[0]) if cache.enabled else None
+        if ttl is None:
+            return False
+        cache.set(key, value, ttl, cache.generation)
+        return True
+    
+    @staticmethod
+    def export_cache(prefixes) -> Dict[str, Any]:
+        """Cached responses under the given endpoint prefixes"""
+        return RemnaAPI._cache.export(tuple(prefixes))
+    
+    @staticmethod
+    def _request_key(endpoint, params) -> Tuple:
+        """Build a hashable key from the endpoint and query params"""
+        normalized_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return endpoint.strip('/'), normalized_params
+    
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """Return request coalescing and response cache counters"""
+        calls = RemnaAPI._get_calls
+        coalesced = RemnaAPI._coalesced_calls
+        cache = RemnaAPI._cache.get_stats()
+        return {
+            "get_calls": calls,
+            "coalesced": coalesced,
+            "sent": calls - coalesced - cache["hits"],
+            "coalesced_ratio": coalesced / calls if calls else 0.0,
+            "inflight": len(RemnaAPI._inflight),
+            "active_requests": RemnaAPI._active_requests,
+            "max_concurrency": API_MAX_CONCURRENCY,
+            "transport": API_TRANSPORT,
+            "http2": RemnaAPI._http2,
+            "cache": cache,
+        }
+    
+    @staticmethod
+    def invalidate_cache(endpoint=None):
+        """Drop cached GET responses related to endpoint (all of them if endpoint is None)"""
+        if endpoint is None:
+            RemnaAPI._cache.clear()
+            stale = None
+        else:
+            RemnaAPI._cache.invalidate_for_mutation(endpoint)
+            path = endpoint.strip('/')
+            stale = (path.split('/')[0],) + RemnaAPI._cache.stale_prefixes(path)
+        # A related GET already in flight may be answered with pre-mutation data: later callers
+        # start a new request instead of joining it (its current waiters still get its result)
+        for key in list(RemnaAPI._inflight):
+            if stale is None or any(key[0] == prefix or key[0].startswith(prefix + '/') for prefix in stale):
+                del RemnaAPI._inflight[key]
     
     @staticmethod
     async def post(endpoint, data=None):
         """Make a POST request to the API"""
-        return await RemnaAPI._make_request('POST', endpoint, data=data)
+        try:
+            return await RemnaAPI._make_request('POST', endpoint, data=data)
+        finally:
+            RemnaAPI.invalidate_cache(endpoint)
     
     @staticmethod
     async def patch(endpoint, data=None):
         """Make a PATCH request to the API"""
-        return await RemnaAPI._make_request('PATCH', endpoint, data=data)
+        try:
+            return await RemnaAPI._make_request('PATCH', endpoint, data=data)
+        finally:
+            RemnaAPI.invalidate_cache(endpoint)
     
     @staticmethod
     async def delete(endpoint, params=None):
         """Make a DELETE request to the API"""
-        return await RemnaAPI._make_request('DELETE', endpoint, params=params)
+        try:
+            return await RemnaAPI._make_request('DELETE', endpoint, params=params)
+        finally:
+            RemnaAPI.invalidate_cache(endpoint)
     
     @staticmethod
     async def health_check():
         """Check API server health"""
-        return await RemnaAPI._test_connection()
+        return await RemnaAPI.probe_health()
@@ -0,0 +1,100 @@
+"""
+Circuit breaker that tracks Remnawave panel availability
+"""
+import logging
+import time
+from typing import Any, Dict
+
+from modules.config import API_CB_FAILURE_THRESHOLD, API_CB_RECOVERY_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker fed by real request outcomes and health probes"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at = 0.0
+        self._last_success_at = 0.0
+        self._last_failure_at = 0.0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker turns half-open once the recovery timeout passes"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_started_at = 0.0
+            logger.info("Circuit breaker half-open: allowing a trial request")
+        return self._state
+
+    def is_available(self) -> bool:
+        """Return False while the panel is considered down"""
+        return self.state != self.OPEN
+
+    def allow_request(self) -> bool:
+        """Decide whether a request may be sent now (fail fast while open)"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            now = time.monotonic()
+            # Only one trial at a time; a stuck trial is replaced after recovery_timeout
+            if not self._trial_started_at or now - self._trial_started_at >= self.recovery_timeout:
+                self._trial_started_at = now
+                return True
+        self._rejected += 1
+        return False
+
+    def record_success(self):
+        """Register a successful round trip to the panel"""
+        self._last_success_at = time.time()
+        self._consecutive_failures = 0
+        if self._state != self.CLOSED:
+            logger.info("Circuit breaker closed: panel is reachable again")
+        self._state = self.CLOSED
+        self._trial_started_at = 0.0
+
+    def record_failure(self):
+        """Register a connection-level failure or a 5xx response"""
+        self._last_failure_at = time.time()
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_started_at = 0.0
+        logger.warning(
+            f"Circuit breaker open after {self._consecutive_failures} failures, "
+            f"failing fast for {self.recovery_timeout:.0f}s"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return breaker state for diagnostics"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "rejected": self._rejected,
+            "last_success_at": self._last_success_at or None,
+            "last_failure_at": self._last_failure_at or None,
+        }
+
+
+# Глобальный экземпляр для всех API классов
+api_health = CircuitBreaker(
+    failure_threshold=API_CB_FAILURE_THRESHOLD,
+    recovery_timeout=API_CB_RECOVERY_TIMEOUT
+)
@@ -0,0 +1,74 @@
+"""
+JSON decoding backend for API responses: orjson or msgspec when installed, stdlib json otherwise
+"""
+import json
+import logging
+from typing import Any, Callable, Optional
+
+from modules.config import API_JSON_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+def _load_orjson() -> Optional[Callable[[bytes], Any]]:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson.loads
+
+
+def _load_msgspec() -> Optional[Callable[[bytes], Any]]:
+    try:
+        import msgspec
+    except ImportError:
+        return None
+    return msgspec.json.Decoder().decode
+
+
+def _load_stdlib() -> Callable[[bytes], Any]:
+    return json.loads
+
+
+_BACKENDS = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+    "json": _load_stdlib,
+}
+
+
+def select_backend(name: str = "auto"):
+    """Return (backend_name, loads) for the requested backend, falling back to stdlib json"""
+    name = (name or "auto").lower()
+    candidates = ["orjson", "msgspec", "json"] if name == "auto" else [name, "json"]
+    for candidate in candidates:
+        loader = _BACKENDS.get(candidate)
+        if loader is None:
+            logger.warning(f"Unknown JSON backend '{candidate}', skipping")
+            continue
+        loads = loader()
+        if loads is not None:
+            return candidate, loads
+        if candidate == name:
+            logger.warning(f"JSON backend '{candidate}' is not installed, falling back to stdlib json")
+    return "json", json.loads
+
+
+BACKEND_NAME, _loads = select_backend(API_JSON_BACKEND)
+logger.debug(f"JSON decoder backend: {BACKEND_NAME}")
+
+
+def is_blank(content: bytes) -> bool:
+    """Return True for an empty or whitespace-only body without copying or decoding it"""
+    return not content or content.isspace()
+
+
+def loads(content: bytes) -> Any:
+    """Decode raw response bytes with the selected backend; errors are raised as ValueError"""
+    try:
+        return _loads(content)
+    except ValueError:
+        raise
+    except Exception as e:
+        # msgspec raises its own DecodeError; normalize it for callers
+        raise ValueError(str(e)) from e
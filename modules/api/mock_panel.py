@@ -0,0 +1,376 @@
+"""
+In-process mock of the Remnawave panel for offline benchmarks and load tests.
+
+Serves synthetic data shaped like remnawave-api-v2113.json through an httpx
+transport, with configurable latency and error injection. Enable it with
+API_TRANSPORT=mock.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import uuid as uuid_lib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+INBOUND_TEMPLATES = [
+    ("VLESS_TCP_REALITY", "vless", "tcp", "reality", 443),
+    ("VLESS_XHTTP_TLS", "vless", "xhttp", "tls", 8443),
+    ("TROJAN_TCP_TLS", "trojan", "tcp", "tls", 2083),
+    ("SS_TCP", "shadowsocks", "tcp", None, 1080),
+]
+
+COUNTRIES = ["DE", "NL", "FI", "US", "GB", "FR", "SE", "PL", "TR", "KZ"]
+TAGS = ["VIP", "TRIAL", "FRIENDS", "RESELLER", None, None, None]
+USER_AGENTS = ["v2rayNG/1.8.5", "Hiddify/2.5.7", "Happ/1.9.2", "Streisand/1.6", None]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+class MockPanelData:
+    """Deterministic synthetic panel state: users, nodes, hosts and config profiles"""
+
+    def __init__(self, users: int = 1000, nodes: int = 8, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc)
+        self.profiles = [self._make_profile(i) for i in range(2)]
+        self.inbounds = [inbound for profile in self.profiles for inbound in profile["inbounds"]]
+        self.nodes = [self._make_node(i) for i in range(nodes)]
+        self.hosts = [self._make_host(i, node, inbound)
+                      for i, (node, inbound) in enumerate((n, ib) for n in self.nodes for ib in self.inbounds[:2])]
+        self.squads = [{"uuid": self._uuid(), "name": name} for name in ("Default-Squad", "Premium-Squad")]
+        self.users: List[Dict[str, Any]] = [self.make_user(i) for i in range(users)]
+        self.users_by_uuid = {user["uuid"]: user for user in self.users}
+
+    def _uuid(self) -> str:
+        return str(uuid_lib.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _make_profile(self, index: int) -> Dict[str, Any]:
+        profile_uuid = self._uuid()
+        inbounds = []
+        for tag, kind, network, security, port in INBOUND_TEMPLATES:
+            inbounds.append({
+                "uuid": self._uuid(), "profileUuid": profile_uuid, "tag": f"{tag}_{index}" if index else tag,
+                "type": kind, "network": network, "security": security, "port": port + index,
+                "rawInbound": None, "activeSquads": [],
+            })
+        return {
+            "uuid": profile_uuid, "name": f"Profile-{index + 1}", "config": {}, "inbounds": inbounds, "nodes": [],
+            "createdAt": _iso(self.now - timedelta(days=200)), "updatedAt": _iso(self.now - timedelta(days=3)),
+        }
+
+    def _make_node(self, index: int) -> Dict[str, Any]:
+        profile = self.profiles[index % len(self.profiles)]
+        country = COUNTRIES[index % len(COUNTRIES)]
+        online = self.rng.random() > 0.1
+        node = {
+            "uuid": self._uuid(), "name": f"{country}-{index + 1:02d}", "address": f"10.0.{index}.1", "port": 2222,
+            "isConnected": online, "isDisabled": False, "isConnecting": False, "isNodeOnline": online,
+            "isXrayRunning": online, "lastStatusChange": _iso(self.now - timedelta(hours=index)),
+            "lastStatusMessage": None, "xrayVersion": "25.6.8", "nodeVersion": "2.1.0",
+            "xrayUptime": str(self.rng.randint(3600, 3600 * 24 * 30)), "isTrafficTrackingActive": True,
+            "trafficResetDay": 1, "trafficLimitBytes": 10 * 1024 * GIB, "trafficUsedBytes": self.rng.randint(0, 5000) * GIB,
+            "notifyPercent": 80, "usersOnline": self.rng.randint(0, 300), "viewPosition": index + 1,
+            "countryCode": country, "consumptionMultiplier": 1, "cpuCount": 4, "cpuModel": "AMD EPYC",
+            "totalRam": "8 GB", "createdAt": _iso(self.now - timedelta(days=100 + index)),
+            "updatedAt": _iso(self.now - timedelta(days=index)),
+            "configProfile": {
+                "activeConfigProfileUuid": profile["uuid"],
+                "activeInbounds": [{k: v for k, v in ib.items() if k != "activeSquads"} for ib in profile["inbounds"]],
+            },
+            "providerUuid": None, "provider": None,
+        }
+        profile["nodes"].append({"uuid": node["uuid"], "name": node["name"], "countryCode": country})
+        return node
+
+    def _make_host(self, index: int, node: Dict[str, Any], inbound: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "uuid": self._uuid(), "viewPosition": index + 1, "remark": f"{node['name']} {inbound['tag']}",
+            "address": f"{node['name'].lower()}.example.com", "port": inbound["port"], "path": None,
+            "sni": f"{node['name'].lower()}.example.com", "host": None, "alpn": None, "fingerprint": "chrome",
+            "isDisabled": False, "securityLayer": "DEFAULT", "xHttpExtraParams": None, "muxParams": None,
+            "sockoptParams": None,
+            "inbound": {"configProfileUuid": inbound["profileUuid"], "configProfileInboundUuid": inbound["uuid"]},
+            "serverDescription": None, "tag": None, "isHidden": False, "overrideSniFromAddress": False,
+            "vlessRouteId": None, "allowInsecure": False,
+        }
+
+    def make_user(self, index: int, **overrides) -> Dict[str, Any]:
+        """Build one user object shaped like the v2.1.13 /users response"""
+        rng = self.rng
+        user_uuid = self._uuid()
+        short_uuid = user_uuid.replace("-", "")[:16]
+        status = rng.choices(["ACTIVE", "DISABLED", "LIMITED", "EXPIRED"], weights=[80, 8, 5, 7])[0]
+        limit = rng.choice([0, 50, 100, 200, 500]) * GIB
+        used = rng.randint(0, limit or 300 * GIB)
+        created = self.now - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86400))
+        online = self.now - timedelta(minutes=rng.randint(0, 60 * 24 * 60)) if rng.random() > 0.15 else None
+        node = rng.choice(self.nodes) if self.nodes else None
+        user = {
+            "uuid": user_uuid, "shortUuid": short_uuid, "username": f"user_{index:06d}", "status": status,
+            "usedTrafficBytes": used, "lifetimeUsedTrafficBytes": used + rng.randint(0, 2000) * GIB,
+            "trafficLimitBytes": limit, "trafficLimitStrategy": rng.choice(["NO_RESET", "MONTH", "WEEK", "DAY"]),
+            "subLastUserAgent": rng.choice(USER_AGENTS),
+            "subLastOpenedAt": _iso(online) if online else None,
+            "expireAt": _iso(self.now + timedelta(days=rng.randint(-60, 365))),
+            "onlineAt": _iso(online) if online else None, "subRevokedAt": None, "lastTrafficResetAt": None,
+            "trojanPassword": self._uuid().replace("-", "")[:24], "vlessUuid": self._uuid(),
+            "ssPassword": self._uuid().replace("-", "")[:24],
+            "description": f"Synthetic user {index}" if rng.random() > 0.5 else None,
+            "tag": rng.choice(TAGS),
+            "telegramId": 100000000 + index if rng.random() > 0.3 else None,
+            "email": f"user{index}@example.com" if rng.random() > 0.5 else None,
+            "hwidDeviceLimit": rng.choice([None, 1, 3, 5]), "firstConnectedAt": _iso(created) if online else None,
+            "lastTriggeredThreshold": 0, "createdAt": _iso(created), "updatedAt": _iso(online or created),
+            "activeInternalSquads": [dict(self.squads[0])] if self.squads else [],
+            "subscriptionUrl": f"https://sub.example.com/{short_uuid}",
+            "lastConnectedNode": (
+                {"connectedAt": _iso(online), "nodeName": node["name"], "countryCode": node["countryCode"]}
+                if online and node else None
+            ),
+            "happ": {"cryptoLink": f"happ://crypt3/{short_uuid}"},
+        }
+        user.update(overrides)
+        return user
+
+    def system_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for user in self.users:
+            counts[user["status"]] = counts.get(user["status"], 0) + 1
+        online_now = sum(1 for user in self.users
+                         if user["onlineAt"] and user["onlineAt"] >= _iso(self.now - timedelta(minutes=1)))
+        return {
+            "cpu": {"cores": 8, "physicalCores": 4},
+            "memory": {"total": 16 * GIB, "free": 6 * GIB, "used": 10 * GIB, "active": 9 * GIB, "available": 6 * GIB},
+            "uptime": 86400 * 12, "timestamp": int(self.now.timestamp() * 1000),
+            "users": {
+                "statusCounts": counts, "totalUsers": len(self.users),
+                "totalTrafficBytes": str(sum(user["usedTrafficBytes"] for user in self.users)),
+            },
+            "onlineStats": {
+                "lastDay": sum(1 for u in self.users if u["onlineAt"] and u["onlineAt"] >= _iso(self.now - timedelta(days=1))),
+                "lastWeek": sum(1 for u in self.users if u["onlineAt"] and u["onlineAt"] >= _iso(self.now - timedelta(days=7))),
+                "neverOnline": sum(1 for u in self.users if not u["onlineAt"]),
+                "onlineNow": online_now,
+            },
+            "nodes": {"totalOnline": sum(1 for node in self.nodes if node["isNodeOnline"])},
+        }
+
+
+Route = Tuple[str, "re.Pattern", Callable]
+
+
+class MockPanelTransport(httpx.AsyncBaseTransport):
+    """httpx transport that answers API requests from MockPanelData"""
+
+    def __init__(
+        self,
+        data: Optional[MockPanelData] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        max_page_size: int = 500,
+        seed: int = 42,
+    ):
+        self.data = data or MockPanelData(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.requests = 0
+        self.injected_errors = 0
+        self._rng = random.Random(seed)
+        self._routes: List[Route] = []
+        self._register_routes()
+
+    def _route(self, method: str, pattern: str, handler: Callable):
+        self._routes.append((method, re.compile(f"^{pattern}$"), handler))
+
+    def _register_routes(self):
+        uuid_re = r"(?P<uuid>[0-9a-fA-F-]{36})"
+        self._route("GET", "system/health", lambda r, m: {"pm2Stats": []})
+        self._route("GET", "system/stats", lambda r, m: self.data.system_stats())
+        self._route("GET", "system/stats/bandwidth", self._bandwidth)
+        self._route("GET", "system/stats/nodes", lambda r, m: {"lastSevenDays": []})
+        self._route("GET", "keygen", lambda r, m: {"pubKey": "MOCK-PUBLIC-KEY"})
+
+        self._route("GET", "users", self._list_users)
+        self._route("POST", "users", self._create_user)
+        self._route("PATCH", "users", self._update_user)
+        self._route("GET", "users/tags", lambda r, m: {"tags": sorted({u["tag"] for u in self.data.users if u["tag"]})})
+        self._route("GET", f"users/{uuid_re}", lambda r, m: self.data.users_by_uuid.get(m["uuid"]))
+        self._route("DELETE", f"users/{uuid_re}", self._delete_user)
+        self._route("POST", f"users/{uuid_re}/actions/(?P<action>enable|disable|reset-traffic|revoke)", self._user_action)
+        self._route("GET", "users/by-username/(?P<value>[^/]+)", self._find_user("username", single=True))
+        self._route("GET", "users/by-short-uuid/(?P<value>[^/]+)", self._find_user("shortUuid", single=True))
+        self._route("GET", "users/by-telegram-id/(?P<value>[^/]+)", self._find_user("telegramId"))
+        self._route("GET", "users/by-email/(?P<value>[^/]+)", self._find_user("email"))
+        self._route("GET", "users/by-tag/(?P<value>[^/]+)", self._find_user("tag"))
+        self._route("POST", "users/bulk/.+", lambda r, m: {"affectedRows": len(self._body(r).get("uuids") or [])})
+
+        self._route("GET", "nodes", lambda r, m: self.data.nodes)
+        self._route("GET", f"nodes/{uuid_re}", lambda r, m: self._by_uuid(self.data.nodes, m["uuid"]))
+        self._route("PATCH", "nodes", lambda r, m: self._patch(self.data.nodes, self._body(r)))
+        self._route("DELETE", f"nodes/{uuid_re}", lambda r, m: {"isDeleted": self._remove(self.data.nodes, m["uuid"])})
+        self._route("POST", "nodes/actions/.+", lambda r, m: {"eventSent": True})
+        self._route("POST", f"nodes/{uuid_re}/actions/(?P<action>enable|disable|restart)", self._node_action)
+        self._route("GET", "nodes/usage/realtime", self._realtime_usage)
+
+        self._route("GET", "hosts", lambda r, m: self.data.hosts)
+        self._route("GET", f"hosts/{uuid_re}", lambda r, m: self._by_uuid(self.data.hosts, m["uuid"]))
+        self._route("PATCH", "hosts", lambda r, m: self._patch(self.data.hosts, self._body(r)))
+        self._route("DELETE", f"hosts/{uuid_re}", lambda r, m: {"isDeleted": self._remove(self.data.hosts, m["uuid"])})
+        self._route("POST", "hosts/(actions|bulk)/.+", lambda r, m: {"affectedRows": len(self._body(r).get("uuids") or [])})
+
+        self._route("GET", "config-profiles", lambda r, m: {"total": len(self.data.profiles), "configProfiles": self.data.profiles})
+        self._route("GET", "config-profiles/inbounds", lambda r, m: {"total": len(self.data.inbounds), "inbounds": self.data.inbounds})
+        self._route("GET", f"config-profiles/{uuid_re}/inbounds", self._profile_inbounds)
+
+    @staticmethod
+    def _body(request: httpx.Request) -> Dict[str, Any]:
+        return json.loads(request.content) if request.content else {}
+
+    @staticmethod
+    def _by_uuid(items: List[Dict[str, Any]], item_uuid: str) -> Optional[Dict[str, Any]]:
+        return next((item for item in items if item["uuid"] == item_uuid), None)
+
+    def _patch(self, items: List[Dict[str, Any]], body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        item = self._by_uuid(items, body.get("uuid"))
+        if item is not None:
+            item.update(body)
+        return item
+
+    @staticmethod
+    def _remove(items: List[Dict[str, Any]], item_uuid: str) -> bool:
+        for index, item in enumerate(items):
+            if item["uuid"] == item_uuid:
+                del items[index]
+                return True
+        return False
+
+    def _list_users(self, request: httpx.Request, match) -> Dict[str, Any]:
+        start = int(float(request.url.params.get("start", 0)))
+        size = min(int(float(request.url.params.get("size", 25))), self.max_page_size)
+        return {"users": self.data.users[start:start + size], "total": len(self.data.users)}
+
+    def _create_user(self, request: httpx.Request, match) -> Dict[str, Any]:
+        body = self._body(request)
+        body.pop("activeInternalSquads", None)
+        user = self.data.make_user(len(self.data.users), **body)
+        user["createdAt"] = user["updatedAt"] = _iso(datetime.now(timezone.utc))
+        self.data.users.append(user)
+        self.data.users_by_uuid[user["uuid"]] = user
+        return user
+
+    def _update_user(self, request: httpx.Request, match) -> Optional[Dict[str, Any]]:
+        body = self._body(request)
+        body.pop("activeInternalSquads", None)
+        user = self.data.users_by_uuid.get(body.get("uuid"))
+        if user is not None:
+            user.update(body)
+            user["updatedAt"] = _iso(datetime.now(timezone.utc))
+        return user
+
+    def _delete_user(self, request: httpx.Request, match) -> Dict[str, Any]:
+        user = self.data.users_by_uuid.pop(match["uuid"], None)
+        if user is not None:
+            self.data.users.remove(user)
+        return {"isDeleted": user is not None}
+
+    def _user_action(self, request: httpx.Request, match) -> Optional[Dict[str, Any]]:
+        user = self.data.users_by_uuid.get(match["uuid"])
+        if user is None:
+            return None
+        action = match["action"]
+        if action in ("enable", "disable"):
+            user["status"] = "ACTIVE" if action == "enable" else "DISABLED"
+        elif action == "reset-traffic":
+            user["usedTrafficBytes"] = 0
+        elif action == "revoke":
+            user["subRevokedAt"] = _iso(datetime.now(timezone.utc))
+        user["updatedAt"] = _iso(datetime.now(timezone.utc))
+        return user
+
+    def _find_user(self, field: str, single: bool = False) -> Callable:
+        def handler(request: httpx.Request, match):
+            value = unquote(match["value"])
+            found = [user for user in self.data.users if str(user.get(field)) == value]
+            if single:
+                return found[0] if found else None
+            return found or None
+        return handler
+
+    def _node_action(self, request: httpx.Request, match) -> Optional[Dict[str, Any]]:
+        node = self._by_uuid(self.data.nodes, match["uuid"])
+        if node is not None and match["action"] in ("enable", "disable"):
+            node["isDisabled"] = match["action"] == "disable"
+        return node
+
+    def _realtime_usage(self, request: httpx.Request, match) -> List[Dict[str, Any]]:
+        usage = []
+        for node in self.data.nodes:
+            down, up = self._rng.randint(0, 10 * GIB), self._rng.randint(0, 2 * GIB)
+            usage.append({
+                "nodeUuid": node["uuid"], "nodeName": node["name"], "countryCode": node["countryCode"],
+                "downloadBytes": down, "uploadBytes": up, "totalBytes": down + up,
+                "downloadSpeedBps": down // 60, "uploadSpeedBps": up // 60, "totalSpeedBps": (down + up) // 60,
+            })
+        return usage
+
+    def _profile_inbounds(self, request: httpx.Request, match) -> Optional[Dict[str, Any]]:
+        profile = self._by_uuid(self.data.profiles, match["uuid"])
+        if profile is None:
+            return None
+        return {"total": len(profile["inbounds"]), "inbounds": profile["inbounds"]}
+
+    def _bandwidth(self, request: httpx.Request, match) -> Dict[str, Any]:
+        period = {"current": "1.2 TB", "previous": "1.1 TB", "difference": "100 GB"}
+        return {key: dict(period) for key in (
+            "bandwidthLastTwoDays", "bandwidthLastSevenDays", "bandwidthLast30Days",
+            "bandwidthCalendarMonth", "bandwidthCurrentYear",
+        )}
+
+    async def _delay(self):
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _inject_error(self, request: httpx.Request) -> Optional[httpx.Response]:
+        if self.error_rate <= 0 or self._rng.random() >= self.error_rate:
+            return None
+        self.injected_errors += 1
+        kind = self._rng.choice(("503", "connect", "read_timeout"))
+        if kind == "connect":
+            raise httpx.ConnectError("Mock panel: injected connection error", request=request)
+        if kind == "read_timeout":
+            raise httpx.ReadTimeout("Mock panel: injected read timeout", request=request)
+        return httpx.Response(503, json={"message": "Mock panel: injected error"}, request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self._delay()
+        error_response = self._inject_error(request)
+        if error_response is not None:
+            return error_response
+
+        path = request.url.path
+        path = path[path.find("/api/") + 5:] if "/api/" in path else path.lstrip("/")
+        path = path.strip("/")
+        for method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match and method == request.method:
+                result = handler(request, match)
+                if result is None:
+                    return httpx.Response(404, json={"message": "Not found"}, request=request)
+                return httpx.Response(200, json={"response": result}, request=request)
+        return httpx.Response(404, json={"message": f"Mock panel: no route for {request.method} {path}"}, request=request)
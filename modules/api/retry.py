@@ -0,0 +1,160 @@
+"""
+Retry policy for panel requests: idempotency-aware, decorrelated jitter, retry budget and Retry-After
+"""
+import collections
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+from modules.config import (
+    API_RETRY_MAX_ATTEMPTS, API_RETRY_BASE_DELAY, API_RETRY_MAX_DELAY,
+    API_RETRY_DEADLINE, API_RETRY_BUDGET_RATIO, API_RETRY_BUDGET_MIN_PER_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+# Methods that can be repeated without changing the result on the panel
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Statuses worth repeating for idempotent requests
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+
+# Failures where the request never reached the panel, so even POST/PATCH are safe to resend
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Failures where the panel may or may not have processed the request
+TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+class RetryBudget:
+    """Caps retries at a share of recent requests so a degraded panel is not hit by a retry storm"""
+
+    def __init__(self, ratio: float = 0.2, min_per_window: int = 5, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_window = min_per_window
+        self.window = window
+        self._requests = collections.deque()
+        self._retries = collections.deque()
+        self._exhausted = 0
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        """Register a first attempt"""
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Take a retry token; False when retries already exceed the allowed share"""
+        now = time.monotonic()
+        self._trim(now)
+        allowed = max(self.min_per_window, int(len(self._requests) * self.ratio))
+        if len(self._retries) >= allowed:
+            self._exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "requests": len(self._requests),
+            "retries": len(self._retries),
+            "exhausted": self._exhausted,
+        }
+
+
+class RetryPolicy:
+    """Decides whether and when to repeat a failed request"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        deadline: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget
+
+    @staticmethod
+    def is_idempotent(method: str) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def should_retry_status(self, method: str, status: int) -> bool:
+        """429 means the panel rejected the request unprocessed; 5xx is only safe for idempotent calls"""
+        if status == 429:
+            return True
+        return status in RETRYABLE_STATUSES and self.is_idempotent(method)
+
+    def should_retry_error(self, method: str, error: Exception) -> bool:
+        if isinstance(error, NOT_SENT_ERRORS):
+            return True
+        return isinstance(error, TRANSIENT_ERRORS) and self.is_idempotent(method)
+
+    def next_delay(self, previous: float) -> float:
+        """Decorrelated jitter: uniform between base and 3x the previous delay, capped"""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous) * 3))
+
+    @staticmethod
+    def retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+        """Parse Retry-After (seconds or HTTP date) from a 429/503 response"""
+        if response is None or response.status_code not in (429, 503):
+            return None
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def plan_retry(
+        self,
+        attempt: int,
+        previous_delay: float,
+        deadline_at: float,
+        response: Optional[httpx.Response] = None,
+        max_attempts: Optional[int] = None,
+    ) -> Optional[float]:
+        """Return the delay before the next attempt, or None to give up.
+        attempt is the 1-based number of the attempt that just failed."""
+        if attempt >= (max_attempts or self.max_attempts):
+            return None
+        delay = self.next_delay(previous_delay)
+        server_delay = self.retry_after(response)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        if time.monotonic() + delay >= deadline_at:
+            logger.debug(f"Retry skipped: waiting {delay:.1f}s would exceed the call deadline")
+            return None
+        if self.budget is not None and not self.budget.try_acquire():
+            logger.warning("Retry budget exhausted, giving up without retrying")
+            return None
+        return delay
+
+
+# Глобальная политика для всех API классов
+retry_policy = RetryPolicy(
+    max_attempts=API_RETRY_MAX_ATTEMPTS,
+    base_delay=API_RETRY_BASE_DELAY,
+    max_delay=API_RETRY_MAX_DELAY,
+    deadline=API_RETRY_DEADLINE,
+    budget=RetryBudget(ratio=API_RETRY_BUDGET_RATIO, min_per_window=API_RETRY_BUDGET_MIN_PER_WINDOW),
+)
@@ -0,0 +1,323 @@
+"""
+Inverted index for generic user search.
+
+Human-entered fields (username, description, email, tag, telegramId) are
+lowercased and split into trigrams; each trigram maps to a sorted array of
+document ids. A query of 3+ characters walks the shortest posting list, keeps
+ids present in the next rarest lists (binary search) and only then verifies
+the real substring on those candidates. Queries shorter than a trigram, or whose
+rarest trigram is in most documents anyway, scan the precomputed lowercase
+texts instead (one substring test per user).
+
+Typo-tolerant search (TrigramIndex.similar) reuses the same postings: a
+username within k edits of the query shares at least len(grams) - 3k of its
+trigrams, so only documents in the rarest lists can qualify and the bounded
+edit distance is computed for those few candidates only. Matches are ordered
+by relevance() (exact id, prefix, substring), similar users go after them
+closest first.
+
+uuid and shortUuid are random hex: their trigrams would triple the index, and
+they are pasted whole or by their leading part, so they are matched by prefix
+through a sorted list instead.
+
+Updates are incremental: a changed user gets a new document id (ids only
+grow, so posting lists stay sorted) and the old id becomes a tombstone.
+Lists are compacted once tombstones make up a quarter of the documents.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+import heapq
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from modules.api.user_record import UserRecord
+
+# Record attributes matched as substrings through trigrams
+TEXT_FIELDS = ('username', 'description', 'email', 'tag', 'telegram_id')
+
+# Record attributes matched by prefix
+ID_FIELDS = ('uuid', 'short_uuid')
+
+_COMPACT_RATIO = 0.25
+# Past this share of documents intersecting posting lists is slower than scanning the texts
+_SCAN_RATIO = 0.1
+_INTERSECT_LISTS = 3
+# Similar search: shortest query considered, most postings counted and most edit distances computed
+_SIMILAR_MIN_LENGTH = 4
+_SIMILAR_MAX_POSTINGS = 20000
+_SIMILAR_MAX_CHECKS = 1000
+
+# Relevance tiers of substring matches, best first (similar matches come after all of them)
+EXACT, PREFIX, SUBSTRING = range(3)
+_SEPARATOR = '\x00'  # cannot appear in a query, so matches never span two fields
+
+
+def search_text(user: UserRecord) -> str:
+    """Lowercased text fields joined with a separator"""
+    return _SEPARATOR.join(
+        str(value).lower() for value in (getattr(user, field) for field in TEXT_FIELDS) if value not in (None, '')
+    )
+
+
+def user_matches(user: UserRecord, term: str) -> bool:
+    """Whether user matches a lowercased term the way TrigramIndex.search does"""
+    if term in search_text(user):
+        return True
+    return any(str(value).lower().startswith(term) for value in (getattr(user, field) for field in ID_FIELDS) if value)
+
+
+def edit_distance(term: str, text: str, bound: int) -> int:
+    """Optimal string alignment distance (edits plus adjacent swaps) between term and the
+    closest prefix of text, so "vsaya" is 1 from "vasya_42". Only the diagonal band of
+    width 2 * bound + 1 is computed; returns bound + 1 once the distance is over bound."""
+    text = text[:len(term) + bound]
+    over = bound + 1
+    previous2: List[int] = []
+    previous = [min(j, over) for j in range(len(text) + 1)]
+    for i in range(1, len(term) + 1):
+        char = term[i - 1]
+        current = [over] * (len(text) + 1)
+        current[0] = min(i, over)
+        for j in range(max(1, i - bound), min(len(text), i + bound) + 1):
+            # min() calls written out: this loop is the hot path of similar()
+            value = previous[j - 1] + (char != text[j - 1])
+            if previous[j] < value:
+                value = previous[j] + 1
+            if current[j - 1] < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and previous2[j - 2] < value and char == text[j - 2] and term[i - 2] == text[j - 1]:
+                value = previous2[j - 2] + 1
+            current[j] = value if value < over else over
+        if min(current) == over:
+            return over
+        previous2, previous = previous, current
+    return min(previous)
+
+
+def max_edits(term: str) -> int:
+    """Edits tolerated for a query of this length (0 below _SIMILAR_MIN_LENGTH)"""
+    if len(term) < _SIMILAR_MIN_LENGTH:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def relevance(user: UserRecord, term: str) -> Tuple[int, str]:
+    """Sort key of a user matching a lowercased term: (EXACT / PREFIX / SUBSTRING, username)"""
+    username = (user.username or '').lower()
+    if username.startswith(term):
+        return (EXACT if username == term else PREFIX), username
+    if term in username:
+        return SUBSTRING, username
+    if '@' in term:
+        if (user.email or '').lower() == term:
+            return EXACT, username
+    elif term.isdigit() and str(user.telegram_id) == term:
+        return EXACT, username
+    for value in (user.uuid, user.short_uuid):
+        if value and value.lower().startswith(term):
+            return (EXACT if len(value) == len(term) else PREFIX), username
+    return SUBSTRING, username
+
+
+def rank(users: Iterable[UserRecord], term: str) -> List[UserRecord]:
+    """Matching users ordered by relevance() for term"""
+    term = term.lower()
+    return sorted(users, key=lambda user: relevance(user, term))
+
+
+def _sorted_in_slices(items: list, size: int = 10000) -> list:
+    """sorted(items) without one long sort call: the index is built in a worker thread, and a
+    single sort of 200k ids would hold the GIL (and the event loop waiting for it) for ~0.2 s"""
+    slices = [sorted(items[start:start + size]) for start in range(0, len(items), size)]
+    return list(heapq.merge(*slices)) if len(slices) > 1 else (slices[0] if slices else [])
+
+
+class TrigramIndex:
+    """Substring index over UserRecord; kept in sync by UserSnapshot"""
+
+    def __init__(self, users: List[UserRecord] = ()):
+        self._postings: Dict[str, array] = {}
+        self._docs: List[Optional[UserRecord]] = []
+        self._texts: List[Optional[str]] = []
+        self._doc_ids: Dict[str, int] = {}
+        self._ids: List[Tuple[str, str]] = []  # sorted (lowercased id, uuid)
+        self._tombstones = 0
+        for user in users:
+            self._add_text(user)
+        self._ids = _sorted_in_slices([key for user in users for key in self._id_keys(user)])
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    @staticmethod
+    def _id_keys(user: UserRecord) -> List[Tuple[str, str]]:
+        return [(str(value).lower(), user.uuid) for value in (getattr(user, field) for field in ID_FIELDS) if value]
+
+    def _add_text(self, user: UserRecord):
+        doc_id = len(self._docs)
+        text = search_text(user)
+        self._docs.append(user)
+        self._texts.append(text)
+        self._doc_ids[user.uuid] = doc_id
+        postings = self._postings
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(doc_id)
+
+    def add(self, user: UserRecord):
+        """Index a user (replacing a previous version with the same uuid)"""
+        doc_id = self._doc_ids.get(user.uuid)
+        if doc_id is not None:
+            self.remove(self._docs[doc_id])
+        self._add_text(user)
+        for key in self._id_keys(user):
+            index = bisect_left(self._ids, key)
+            if index == len(self._ids) or self._ids[index] != key:
+                self._ids.insert(index, key)
+
+    def remove(self, user: UserRecord):
+        """Drop a user; its ids are taken from user, the record as it was when indexed"""
+        doc_id = self._doc_ids.pop(user.uuid, None)
+        if doc_id is None:
+            return
+        self._docs[doc_id] = None
+        self._texts[doc_id] = None
+        self._tombstones += 1
+        for key in self._id_keys(user):
+            index = bisect_left(self._ids, key)
+            if index < len(self._ids) and self._ids[index] == key:
+                del self._ids[index]
+        if self._tombstones > len(self._docs) * _COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the trigram postings without tombstones"""
+        live = [user for user in self._docs if user is not None]
+        self._postings = {}
+        self._docs = []
+        self._texts = []
+        self._doc_ids = {}
+        self._tombstones = 0
+        for user in live:
+            self._add_text(user)
+
+    @staticmethod
+    def _contains(posting: array, doc_id: int) -> bool:
+        index = bisect_left(posting, doc_id)
+        return index < len(posting) and posting[index] == doc_id
+
+    def _candidates(self, term: str) -> Optional[List[int]]:
+        """Document ids containing every trigram of term (None: scan all documents instead)"""
+        grams = {term[i:i + 3] for i in range(len(term) - 2)}
+        if not grams:
+            return None
+        postings: List[array] = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        # The substring check is exact, so the rarest few lists are enough to narrow the candidates
+        shortest, others = postings[0], postings[1:_INTERSECT_LISTS]
+        if len(shortest) > len(self._docs) * _SCAN_RATIO:
+            return None
+        return [doc_id for doc_id in shortest if all(self._contains(posting, doc_id) for posting in others)]
+
+    def _by_id_prefix(self, prefix: str) -> Iterator[str]:
+        """uuids of users whose uuid or shortUuid starts with prefix, each once"""
+        seen = set()
+        index = bisect_left(self._ids, (prefix,))
+        while index < len(self._ids) and self._ids[index][0].startswith(prefix):
+            user_uuid = self._ids[index][1]
+            if user_uuid not in seen:
+                seen.add(user_uuid)
+                yield user_uuid
+            index += 1
+
+    def search(self, term: str, limit: Optional[int] = None) -> Tuple[List[UserRecord], int]:
+        """Users whose text fields contain term or whose uuid/shortUuid starts with it.
+        With a limit, uuid/shortUuid prefix hits come first and substring verification stops
+        once the limit is filled (in index order), which bounds the cost of broad queries
+        without cutting off the id someone pasted. Returns (matches, number of candidates)."""
+        term = term.lower()
+        if not term or _SEPARATOR in term:
+            return [], 0
+        matches = [self._docs[self._doc_ids[user_uuid]] for user_uuid in islice(self._by_id_prefix(term), limit)]
+        if limit is not None and len(matches) >= limit:
+            return matches, len(matches)
+        doc_ids = self._candidates(term)
+        if doc_ids is None:
+            doc_ids = range(len(self._docs))
+        texts = self._texts
+        seen = {user.uuid for user in matches}
+        matched = (self._docs[doc_id] for doc_id in doc_ids
+                   if texts[doc_id] is not None and term in texts[doc_id] and self._docs[doc_id].uuid not in seen)
+        matches.extend(islice(matched, None if limit is None else limit - len(matches)))
+        return matches, len(doc_ids)
+
+    def _similar_candidates(self, grams: Set[str], edits: int) -> List[int]:
+        """Document ids that may hold a username within `edits` edits of the grams' term,
+        most shared trigrams first"""
+        postings = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        # q-gram lemma: within `edits` edits at least `needed` trigrams survive, so a match
+        # appears in one of the len - needed + 1 rarest lists and in `needed` lists overall
+        needed = len(grams) - 3 * edits
+        split = len(postings) - needed + 1
+        if needed < 1 or sum(len(posting) for posting in postings[:split]) > _SIMILAR_MAX_POSTINGS:
+            # Too few trigrams survive that many edits to prune exactly: count the rarest lists
+            # that fit the budget and let the best candidates be checked first
+            needed, split, total = 1, 0, 0
+            while split < len(postings) and total + len(postings[split]) <= _SIMILAR_MAX_POSTINGS:
+                total += len(postings[split])
+                split += 1
+        scanned, rest = postings[:split], postings[split:]
+        counts = Counter()
+        for posting in scanned:
+            counts.update(posting)
+        candidates = []
+        for doc_id, count in counts.items():
+            for posting in rest:
+                if count >= needed:
+                    break
+                count += self._contains(posting, doc_id)
+            if count >= needed:
+                candidates.append((-count, doc_id))
+        candidates.sort()
+        return [doc_id for _, doc_id in candidates]
+
+    def similar(self, term: str, max_distance: int, exclude: Set[str] = frozenset(),
+                limit: Optional[int] = None) -> List[UserRecord]:
+        """Users whose username (or its beginning) is within a few edits of term, except the
+        uuids in exclude, closest first. One edit is tried before two, candidates sharing the
+        most trigrams are checked first, and the search stops after a limit of users found or
+        _SIMILAR_MAX_CHECKS distances computed. Exhaustive while the q-gram bound prunes
+        (most queries with one edit), best effort otherwise."""
+        term = term.lower()
+        grams = {term[i:i + 3] for i in range(len(term) - 2)}
+        found: List[UserRecord] = []
+        seen = set(exclude)
+        checks = 0
+        for edits in range(1, min(max_distance, max_edits(term)) + 1):
+            for doc_id in self._similar_candidates(grams, edits)[:_SIMILAR_MAX_CHECKS - checks]:
+                checks += 1
+                user = self._docs[doc_id]
+                if user is None or user.uuid in seen or not user.username:
+                    continue
+                if edit_distance(term, user.username.lower(), edits) <= edits:
+                    seen.add(user.uuid)
+                    found.append(user)
+                    if limit is not None and len(found) >= limit:
+                        return found
+        return found
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'documents': len(self._doc_ids),
+            'tombstones': self._tombstones,
+            'trigrams': len(self._postings),
+            'postings': sum(len(posting) for posting in self._postings.values()),
+        }
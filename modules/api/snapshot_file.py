@@ -0,0 +1,165 @@
+"""
+On-disk snapshot for warm starts.
+
+After each background refresh the user snapshot and the cached node, host
+and config-profile/inbound lists are written to a SQLite file (SNAPSHOT_PATH).
+On startup they are loaded before the first update is handled, so screens are
+served from the last saved state while the background sync catches up.
+
+The file is rewritten as a whole (temporary file + rename), so a crash during
+a save never leaves a half-written snapshot behind.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from modules.api import json_codec
+from modules.api.client import RemnaAPI
+from modules.api.user_record import UserRecord
+from modules.api.user_store import user_store
+from modules.config import SNAPSHOT_PATH
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 3
+
+# Cached GET endpoints saved with the snapshot (prefixes, see modules/api/cache.py)
+PERSISTED_ENDPOINTS = ("nodes", "hosts", "config-profiles")
+
+_USER_COLUMNS = UserRecord.__slots__
+
+
+class SnapshotFile:
+    """Saves and restores the user store and cached panel lists"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._saving = False
+        self._last_saved_at: Optional[float] = None
+        self._last_save_seconds: Optional[float] = None
+        self._restored_users: Optional[int] = None
+        self._restored_age: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _write(self, users: List[tuple], total: int, complete: bool, saved_at: float, responses: Dict[str, str]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        connection = sqlite3.connect(temp_path)
+        try:
+            with connection:
+                connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+                connection.execute(f"CREATE TABLE users ({', '.join(_USER_COLUMNS)})")
+                connection.execute("CREATE TABLE responses (endpoint TEXT PRIMARY KEY, body TEXT)")
+                connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                    ("schema", str(SCHEMA_VERSION)),
+                    ("saved_at", repr(saved_at)),
+                    ("total", str(total)),
+                    ("complete", "1" if complete else "0"),
+                ])
+                placeholders = ", ".join("?" for _ in _USER_COLUMNS)
+                connection.executemany(f"INSERT INTO users VALUES ({placeholders})", users)
+                connection.executemany("INSERT INTO responses VALUES (?, ?)", responses.items())
+        finally:
+            connection.close()
+        os.replace(temp_path, self.path)
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+            if meta.get("schema") != str(SCHEMA_VERSION):
+                logger.warning(f"Снимок {self.path} имеет другую версию схемы, пропускаем")
+                return None
+            users = [UserRecord.from_row(row) for row in connection.execute(
+                f"SELECT {', '.join(_USER_COLUMNS)} FROM users"
+            )]
+            responses = {endpoint: json_codec.loads(body) for endpoint, body in connection.execute(
+                "SELECT endpoint, body FROM responses"
+            )}
+        finally:
+            connection.close()
+        return {
+            "saved_at": float(meta["saved_at"]),
+            "total": int(meta["total"]),
+            "complete": meta["complete"] == "1",
+            "users": users,
+            "responses": responses,
+        }
+
+    async def save(self) -> bool:
+        """Write the current state; the rows are collected on the event loop and written in a thread"""
+        snapshot = user_store.snapshot
+        if not self.enabled or snapshot is None or self._saving:
+            return False
+        started = time.monotonic()
+        users = [user.to_row() for user in snapshot.users]
+        responses = {
+            endpoint: json.dumps(value, ensure_ascii=False)
+            for endpoint, value in RemnaAPI.export_cache(PERSISTED_ENDPOINTS).items()
+        }
+        saved_at = time.time()
+        self._saving = True
+        try:
+            await asyncio.to_thread(self._write, users, snapshot.total, snapshot.complete, saved_at, responses)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Не удалось сохранить снимок в {self.path}: {e}")
+            return False
+        finally:
+            self._saving = False
+        self._last_saved_at = saved_at
+        self._last_save_seconds = time.monotonic() - started
+        logger.debug(f"Snapshot saved: {len(users)} users, {len(responses)} responses in {self._last_save_seconds:.2f}s")
+        return True
+
+    async def load(self) -> bool:
+        """Restore the saved state at startup and revalidate the cached lists in the background"""
+        if not self.enabled:
+            return False
+        started = time.monotonic()
+        try:
+            data = await asyncio.to_thread(self._read)
+        except (OSError, sqlite3.Error, ValueError, KeyError) as e:
+            logger.warning(f"Не удалось прочитать снимок {self.path}: {e}")
+            return False
+        if data is None:
+            return False
+
+        user_store.restore(data["users"], data["total"], data["complete"], data["saved_at"])
+        seeded = [endpoint for endpoint, value in data["responses"].items() if RemnaAPI.seed_cache(endpoint, value)]
+        self._restored_users = len(data["users"])
+        self._restored_age = time.time() - data["saved_at"]
+        logger.info(
+            f"Снимок загружен за {time.monotonic() - started:.2f}s: {len(data['users'])} пользователей, "
+            f"{len(seeded)} списков, возраст {self._restored_age:.0f}s"
+        )
+        # Users are synced by the refresh job; cached lists are refetched here
+        for endpoint in seeded:
+            asyncio.ensure_future(RemnaAPI.revalidate(endpoint))
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "last_saved_at": self._last_saved_at,
+            "last_save_seconds": self._last_save_seconds,
+            "restored_users": self._restored_users,
+            "restored_age": self._restored_age,
+        }
+
+
+# Глобальный экземпляр
+snapshot_file = SnapshotFile(SNAPSHOT_PATH)
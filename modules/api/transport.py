@@ -0,0 +1,86 @@
+"""
+Transport backends for the shared API client.
+
+All API classes go through RemnaAPI, and RemnaAPI sends every request through
+one httpx.AsyncBaseTransport selected by API_TRANSPORT:
+- "httpx": production connection pool (keep-alive, optional HTTP/2)
+- "mock": in-process synthetic panel (see modules/api/mock_panel.py)
+"""
+import importlib.util
+import logging
+
+import httpx
+
+from modules.config import (
+    API_TRANSPORT, API_HTTP2, API_MAX_CONNECTIONS, API_MAX_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY,
+    MOCK_PANEL_USERS, MOCK_PANEL_NODES, MOCK_PANEL_LATENCY_MS, MOCK_PANEL_JITTER_MS,
+    MOCK_PANEL_ERROR_RATE, MOCK_PANEL_SEED
+)
+
+logger = logging.getLogger(__name__)
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 is used only when requested and the h2 package (httpx[http2]) is installed"""
+    if not API_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("API_HTTP2=true, но пакет h2 не установлен (httpx[http2]); используется HTTP/1.1")
+        return False
+    return True
+
+
+class PanelHTTPTransport(httpx.AsyncHTTPTransport):
+    """Production transport: shared keep-alive pool to the panel"""
+
+    def __init__(self, http2: bool = False):
+        self.http2 = http2
+        super().__init__(
+            verify=True,  # Enable SSL verification for HTTPS
+            cert=None,  # No client certificate
+            # HTTP/1.1 by default; with HTTP/2 concurrent requests are multiplexed over one connection
+            http2=http2,
+            # Shared pool limits: connections are kept alive and reused between requests
+            limits=httpx.Limits(
+                max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=API_MAX_CONNECTIONS,
+                keepalive_expiry=API_KEEPALIVE_EXPIRY
+            ),
+        )
+
+
+def create_httpx_transport() -> PanelHTTPTransport:
+    return PanelHTTPTransport(http2=http2_enabled())
+
+
+def create_mock_transport() -> httpx.AsyncBaseTransport:
+    """Offline transport serving synthetic spec-shaped data"""
+    from modules.api.mock_panel import MockPanelData, MockPanelTransport
+
+    data = MockPanelData(users=MOCK_PANEL_USERS, nodes=MOCK_PANEL_NODES, seed=MOCK_PANEL_SEED)
+    logger.warning(
+        f"API_TRANSPORT=mock: используется синтетическая панель ({MOCK_PANEL_USERS} пользователей, "
+        f"{MOCK_PANEL_NODES} нод, задержка {MOCK_PANEL_LATENCY_MS} мс, ошибки {MOCK_PANEL_ERROR_RATE:.0%})"
+    )
+    return MockPanelTransport(
+        data=data,
+        latency=MOCK_PANEL_LATENCY_MS / 1000,
+        jitter=MOCK_PANEL_JITTER_MS / 1000,
+        error_rate=MOCK_PANEL_ERROR_RATE,
+        seed=MOCK_PANEL_SEED,
+    )
+
+
+TRANSPORTS = {
+    "httpx": create_httpx_transport,
+    "mock": create_mock_transport,
+}
+
+
+def create_transport(name: str = API_TRANSPORT) -> httpx.AsyncBaseTransport:
+    """Build the transport configured by API_TRANSPORT"""
+    factory = TRANSPORTS.get((name or "httpx").lower())
+    if factory is None:
+        logger.error(f"Неизвестный API_TRANSPORT '{name}', используется httpx")
+        factory = create_httpx_transport
+    return factory()
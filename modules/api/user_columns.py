@@ -0,0 +1,156 @@
+"""
+Columnar view of the user snapshot for dashboard aggregates.
+
+UserColumns groups users by status and keeps, per status, the user count,
+the traffic sum and sorted columns of expire time, online time and limit
+usage. Every aggregate is then a handful of additions or binary searches
+over at most a few statuses instead of a pass over all users:
+- status histogram and total traffic: O(statuses)
+- expiring within N days, online in the last N minutes, over X% of the
+  limit (optionally for one status): O(statuses * log n)
+
+The time columns hold references to the records' own floats, so they cost
+one pointer per user; they are plain lists because converting them to
+array('d') costs more build time than it saves memory.
+
+The columns are built once per snapshot and then patched per changed user
+(add/remove/update): counts and sums are adjusted, and only the sorted
+columns whose value changed get a bisect insert/delete.
+"""
+import math
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from modules.api.user_record import UserRecord
+
+
+class _StatusColumns:
+    """Aggregates and sorted columns for the users of one status"""
+
+    __slots__ = ('count', 'traffic', 'expire', 'online', 'usage')
+
+    def __init__(self, users: List[UserRecord]):
+        self.count = len(users)
+        self.traffic = sum([user.used_traffic_bytes for user in users])
+        # Users without a time or a limit are left out of the sorted columns
+        self.expire = sorted([user.expire_at for user in users if user.expire_at is not None])
+        self.online = sorted([user.online_at for user in users if user.online_at is not None])
+        self.usage = sorted([
+            user.used_traffic_bytes / user.traffic_limit_bytes for user in users if user.traffic_limit_bytes > 0
+        ])
+
+    @staticmethod
+    def values(user: UserRecord) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """The user's entries in the expire, online and usage columns (None if left out)"""
+        usage = user.used_traffic_bytes / user.traffic_limit_bytes if user.traffic_limit_bytes > 0 else None
+        return user.expire_at, user.online_at, usage
+
+    @property
+    def columns(self) -> Tuple[List[float], List[float], List[float]]:
+        return self.expire, self.online, self.usage
+
+    @staticmethod
+    def _discard(column: List[float], value: float):
+        position = bisect_left(column, value)
+        if position < len(column) and column[position] == value:
+            del column[position]
+
+    def add(self, user: UserRecord):
+        self.count += 1
+        self.traffic += user.used_traffic_bytes
+        for column, value in zip(self.columns, self.values(user)):
+            if value is not None:
+                insort(column, value)
+
+    def remove(self, user: UserRecord):
+        self.count -= 1
+        self.traffic -= user.used_traffic_bytes
+        for column, value in zip(self.columns, self.values(user)):
+            if value is not None:
+                self._discard(column, value)
+
+    def update(self, previous: UserRecord, user: UserRecord):
+        """Same status, new values: move only the entries that changed"""
+        self.traffic += user.used_traffic_bytes - previous.used_traffic_bytes
+        for column, old, new in zip(self.columns, self.values(previous), self.values(user)):
+            if old == new:
+                continue
+            if old is not None:
+                self._discard(column, old)
+            if new is not None:
+                insort(column, new)
+
+
+class UserColumns:
+    """Per-status columns built from a list of UserRecord and patched per changed user"""
+
+    def __init__(self, users: Iterable[UserRecord]):
+        groups: Dict[str, List[UserRecord]] = {}
+        for user in users:
+            groups.setdefault(user.status or 'UNKNOWN', []).append(user)
+        self._by_status: Dict[str, _StatusColumns] = {name: _StatusColumns(group) for name, group in groups.items()}
+        self._count = sum(group.count for group in self._by_status.values())
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _group(self, user: UserRecord) -> _StatusColumns:
+        status = user.status or 'UNKNOWN'
+        group = self._by_status.get(status)
+        if group is None:
+            group = self._by_status[status] = _StatusColumns([])
+        return group
+
+    def add(self, user: UserRecord):
+        """Count a created user"""
+        self._group(user).add(user)
+        self._count += 1
+
+    def remove(self, user: UserRecord):
+        """Uncount a deleted user, given its record as it was counted"""
+        self._group(user).remove(user)
+        self._count -= 1
+
+    def update(self, previous: UserRecord, user: UserRecord):
+        """Move a changed user from its previous values to its current ones"""
+        if (previous.status or 'UNKNOWN') == (user.status or 'UNKNOWN'):
+            self._group(user).update(previous, user)
+        else:
+            self._group(previous).remove(previous)
+            self._group(user).add(user)
+
+    def _groups(self, status: Optional[str]) -> List[_StatusColumns]:
+        if status is None:
+            return list(self._by_status.values())
+        group = self._by_status.get(status)
+        return [group] if group is not None else []
+
+    @staticmethod
+    def _count_between(values: List[float], low: float, high: float = math.inf) -> int:
+        """Count of sorted values in [low, high)"""
+        return bisect_left(values, high) - bisect_left(values, low)
+
+    def status_histogram(self) -> Dict[str, int]:
+        """Users per status"""
+        return {name: group.count for name, group in self._by_status.items()}
+
+    def total_traffic(self, status: Optional[str] = None) -> int:
+        """Sum of usedTrafficBytes (optionally for one status only)"""
+        return sum(group.traffic for group in self._groups(status))
+
+    def count_expiring(self, days: float, status: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Users whose subscription expires within the next `days` days (already expired not included)"""
+        now = time.time() if now is None else now
+        until = now + days * 86400
+        return sum(self._count_between(group.expire, now, until) for group in self._groups(status))
+
+    def count_online(self, minutes: float, status: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Users seen online within the last `minutes` minutes"""
+        since = (time.time() if now is None else now) - minutes * 60
+        return sum(self._count_between(group.online, since) for group in self._groups(status))
+
+    def count_over_limit(self, percent: float, status: Optional[str] = None) -> int:
+        """Users with a traffic limit who used at least `percent`% of it"""
+        share = percent / 100
+        return sum(self._count_between(group.usage, share) for group in self._groups(status))
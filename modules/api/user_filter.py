@@ -0,0 +1,186 @@
+"""
+Filter queries over the user snapshot, e.g. `status:ACTIVE used>80% expires<7d tag:VIP online<5m`.
+
+A query is a list of space-separated conditions, all of which must hold:
+- status:ACTIVE,LIMITED       status is one of the values
+- tag:VIP / tag:none         tag equals the value (case-insensitive) / no tag
+- used>80% / used>=10GB      traffic used, as a share of the limit or absolute
+- limit:0 / limit>100GB      traffic limit (0 = unlimited)
+- expires<7d / expires>30d   subscription ends within / later than the period;
+                             expires<0d matches subscriptions that already ended
+- online<5m / online>30d     seen within the period / not seen for it (or never)
+- any other word             contained in username, description, email, tag,
+                             Telegram ID, or a UUID prefix (the search index)
+A leading minus negates a condition (-tag:VIP); values may be quoted.
+Periods take s/m/h/d/w, sizes B/KB/MB/GB/TB.
+
+UserFilter.parse compiles the query once into predicates. apply() starts from
+the smallest candidate list an index can give (tag or text words), then runs
+each predicate as a list filter over the shrinking list; no panel calls.
+"""
+import re
+import shlex
+import time
+from typing import Callable, List, Optional, Tuple
+
+from modules.api.user_record import UserRecord
+
+FIELDS = ('status', 'tag', 'used', 'limit', 'expires', 'online')
+
+_CONDITION = re.compile(r'^(-?)(' + '|'.join(FIELDS) + r')(:|=|<=|>=|<|>)(.+)$', re.IGNORECASE)
+_PERIOD_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_SIZE_UNITS = {'b': 1, 'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3, 'tb': 1024 ** 4}
+_NUMBER = re.compile(r'^(-?\d+(?:\.\d+)?)\s*([a-z%]*)$', re.IGNORECASE)
+
+Predicate = Callable[[UserRecord], bool]
+
+
+class FilterError(ValueError):
+    """Query that cannot be parsed; the message is shown to the admin"""
+
+
+def is_filter_query(text: str) -> bool:
+    """Whether text uses the filter syntax (at least one field condition)"""
+    return any(_CONDITION.match(token) for token in text.split())
+
+
+def _number(value: str) -> Tuple[float, str]:
+    match = _NUMBER.match(value.strip())
+    if not match:
+        raise FilterError(f"Не число: {value}")
+    return float(match.group(1)), match.group(2).lower()
+
+
+def _period(value: str) -> float:
+    amount, unit = _number(value)
+    if unit not in _PERIOD_UNITS:
+        raise FilterError(f"Период задаётся как 30m, 12h, 7d или 2w: {value}")
+    return amount * _PERIOD_UNITS[unit]
+
+
+def _size(value: str) -> float:
+    amount, unit = _number(value)
+    if unit not in _SIZE_UNITS and unit != '':
+        raise FilterError(f"Объём задаётся как 500MB, 10GB или 1TB: {value}")
+    return amount * _SIZE_UNITS.get(unit, 1)
+
+
+def _compare(op: str, bound: float) -> Callable[[float], bool]:
+    if op == '<':
+        return lambda value: value < bound
+    if op == '<=':
+        return lambda value: value <= bound
+    if op == '>':
+        return lambda value: value > bound
+    if op == '>=':
+        return lambda value: value >= bound
+    return lambda value: value == bound
+
+
+class UserFilter:
+    """Compiled filter query; apply() runs it over a UserSnapshot"""
+
+    def __init__(self, query: str, conditions: List[Tuple[str, Predicate]], words: List[str], tag: Optional[str]):
+        self.query = query
+        # (normalized condition, predicate), cheapest first
+        self.conditions = conditions
+        self.words = words
+        self.tag = tag
+
+    @classmethod
+    def parse(cls, query: str, now: Optional[float] = None) -> 'UserFilter':
+        """Compile a query; periods are counted from now (defaults to the current time)"""
+        now = time.time() if now is None else now
+        try:
+            tokens = shlex.split(query)
+        except ValueError as e:
+            raise FilterError(f"Незакрытая кавычка в запросе: {e}")
+
+        conditions: List[Tuple[int, str, Predicate]] = []
+        words: List[str] = []
+        tag = None
+        for token in tokens:
+            match = _CONDITION.match(token)
+            if not match:
+                words.append(token)
+                continue
+            negate, field, op, value = match.group(1) == '-', match.group(2).lower(), match.group(3), match.group(4)
+            if op == '=':
+                op = ':'
+            cost, predicate = cls._compile(field, op, value, now)
+            if field == 'tag' and not negate and value.lower() != 'none':
+                tag = value
+            if negate:
+                predicate = (lambda inner: lambda user: not inner(user))(predicate)
+            conditions.append((cost, f"{'-' if negate else ''}{field}{op}{value}", predicate))
+        if not conditions and not words:
+            raise FilterError("Пустой запрос")
+        conditions.sort(key=lambda item: item[0])
+        return cls(query, [(text, predicate) for _, text, predicate in conditions], words, tag)
+
+    @staticmethod
+    def _compile(field: str, op: str, value: str, now: float) -> Tuple[int, Predicate]:
+        """(relative cost, predicate) of one condition"""
+        if field == 'status':
+            if op != ':':
+                raise FilterError("Для status используйте status:ACTIVE")
+            statuses = {item.strip().upper() for item in value.split(',') if item.strip()}
+            return 0, lambda user: user.status in statuses
+
+        if field == 'tag':
+            if op != ':':
+                raise FilterError("Для tag используйте tag:VIP или tag:none")
+            if value.lower() == 'none':
+                return 0, lambda user: not user.tag
+            tags = {item.strip().upper() for item in value.split(',') if item.strip()}
+            return 0, lambda user: user.tag is not None and user.tag.upper() in tags
+
+        if field in ('used', 'limit'):
+            if field == 'used' and value.endswith('%'):
+                share = _number(value[:-1])[0] / 100
+                check = _compare(op, share)
+                return 2, lambda user: (
+                    user.traffic_limit_bytes > 0 and check(user.used_traffic_bytes / user.traffic_limit_bytes)
+                )
+            check = _compare(op, _size(value))
+            if field == 'used':
+                return 1, lambda user: check(user.used_traffic_bytes)
+            return 1, lambda user: check(user.traffic_limit_bytes)
+
+        seconds = _period(value)
+        if field == 'expires':
+            if op == ':':
+                raise FilterError("Для expires используйте expires<7d или expires>30d")
+            check = _compare(op, now + seconds)
+            if op in ('<', '<=') and seconds > 0:
+                # "ends within 7 days": not already ended
+                return 1, lambda user: user.expire_at is not None and now <= user.expire_at and check(user.expire_at)
+            return 1, lambda user: user.expire_at is not None and check(user.expire_at)
+
+        # online: "online<5m" = seen less than 5 minutes ago, "online>30d" = not seen for 30 days (or never)
+        if op == ':':
+            raise FilterError("Для online используйте online<5m или online>30d")
+        since = now - seconds
+        if op in ('<', '<='):
+            return 1, lambda user: user.online_at is not None and user.online_at >= since
+        return 1, lambda user: user.online_at is None or user.online_at < since
+
+    def apply(self, snapshot) -> List[UserRecord]:
+        """Users of a UserSnapshot matching every condition"""
+        if self.words:
+            users = snapshot.search_index.search(self.words[0])[0]
+            for word in self.words[1:]:
+                found = {user.uuid for user in snapshot.search_index.search(word)[0]}
+                users = [user for user in users if user.uuid in found]
+        elif self.tag is not None:
+            wanted = {item.strip().upper() for item in self.tag.split(',')}
+            users = [user for key, bucket in snapshot.by_tag.items() if key.upper() in wanted for user in bucket]
+        else:
+            users = snapshot.users
+        for _, predicate in self.conditions:
+            users = [user for user in users if predicate(user)]
+        return users if users is not snapshot.users else list(users)
+
+    def describe(self) -> str:
+        """Normalized query for headers and logs"""
+        return " ".join([text for text, _ in self.conditions] + self.words)
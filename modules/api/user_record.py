@@ -0,0 +1,232 @@
+"""
+Compact in-memory representation of a panel user.
+
+The user store keeps one UserRecord per user instead of the raw /users JSON
+(nested squads, last node, subscription secrets...). A record holds only the
+fields the bot lists, searches and aggregates on; the full payload is fetched
+on demand for the detail card (see UserCache in modules/handlers/users).
+Inbound membership, which the panel nests in several shapes, is reduced to
+the matching keys of the referenced inbounds and the config profile uuid.
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """ISO 8601 string (with or without Z) -> epoch seconds; None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        text = str(value)
+        if text.endswith('Z'):
+            text = text[:-1] + '+00:00'
+        moment = datetime.fromisoformat(text)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def format_timestamp(value: Optional[float]) -> Optional[str]:
+    """Epoch seconds -> ISO 8601 in the panel's format (UTC, milliseconds, Z)"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _to_int(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return 0
+
+
+def _intern(value) -> Optional[str]:
+    # Statuses and tags repeat across thousands of users: keep one string object per value
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def inbound_key(ref) -> Optional[str]:
+    """Key an inbound is matched by when its uuid is not given: tag|port|type"""
+    if not isinstance(ref, dict):
+        return None
+    port = ref.get('port') if ref.get('port') is not None else ref.get('listenPort')
+    if not ref.get('tag') or not ref.get('type') or port is None:
+        return None
+    try:
+        return f"{ref['tag']}|{int(port)}|{ref['type']}"
+    except (TypeError, ValueError):
+        return None
+
+
+def _subscriptions(user: Dict[str, Any]) -> list:
+    items = [user['subscription']] if isinstance(user.get('subscription'), dict) else []
+    if isinstance(user.get('subscriptions'), list):
+        items.extend(item for item in user['subscriptions'] if isinstance(item, dict))
+    return items
+
+
+def _inbound_refs(user: Dict[str, Any]) -> Optional[str]:
+    """Newline-separated keys (uuid, tag|port|type) of the inbounds a user references
+    directly or through a subscription; None for the usual payload without them"""
+    refs = list(user.get('inbounds') or []) + list(user.get('activeInbounds') or [])
+    for subscription in _subscriptions(user):
+        if isinstance(subscription.get('inbounds'), list):
+            refs.extend(subscription['inbounds'])
+    keys = []
+    for ref in refs:
+        if isinstance(ref, str):
+            keys.append(ref)
+        elif isinstance(ref, dict):
+            keys.extend(str(key) for key in (ref.get('uuid'), inbound_key(ref)) if key)
+    return '\n'.join(dict.fromkeys(keys)) or None
+
+
+def _config_profile(user: Dict[str, Any]) -> Optional[str]:
+    """uuid of the user's config profile, from a subscription or the user itself"""
+    for item in _subscriptions(user) + [user]:
+        profile = item.get('configProfileUuid') or item.get('configProfile')
+        if isinstance(profile, dict):
+            profile = profile.get('uuid')
+        if profile:
+            return str(profile)
+    return None
+
+
+class UserRecord:
+    """One user as stored in the user store. Also answers dict-style reads
+    (user['username'], user.get('expireAt')) with the panel's field names."""
+
+    __slots__ = (
+        'uuid', 'username', 'status', 'used_traffic_bytes', 'traffic_limit_bytes',
+        'lifetime_used_traffic_bytes', 'expire_at', 'online_at', 'updated_at',
+        'tag', 'telegram_id', 'email', 'short_uuid', 'description', 'created_at',
+        'inbound_refs', 'config_profile',
+    )
+
+    # Panel field name -> slot
+    API_FIELDS = {
+        'uuid': 'uuid',
+        'username': 'username',
+        'status': 'status',
+        'usedTrafficBytes': 'used_traffic_bytes',
+        'trafficLimitBytes': 'traffic_limit_bytes',
+        'lifetimeUsedTrafficBytes': 'lifetime_used_traffic_bytes',
+        'expireAt': 'expire_at',
+        'onlineAt': 'online_at',
+        'updatedAt': 'updated_at',
+        'tag': 'tag',
+        'telegramId': 'telegram_id',
+        'email': 'email',
+        'shortUuid': 'short_uuid',
+        'description': 'description',
+        'createdAt': 'created_at',
+    }
+    TIMESTAMP_FIELDS = frozenset({'expire_at', 'online_at', 'updated_at', 'created_at'})
+
+    def __init__(self, uuid: str, username: Optional[str] = None, status: Optional[str] = None,
+                 used_traffic_bytes: int = 0, traffic_limit_bytes: int = 0, lifetime_used_traffic_bytes: int = 0,
+                 expire_at: Optional[float] = None, online_at: Optional[float] = None,
+                 updated_at: Optional[float] = None, tag: Optional[str] = None, telegram_id: Optional[int] = None,
+                 email: Optional[str] = None, short_uuid: Optional[str] = None, description: Optional[str] = None,
+                 created_at: Optional[float] = None, inbound_refs: Optional[str] = None,
+                 config_profile: Optional[str] = None):
+        self.uuid = uuid
+        self.username = username
+        self.status = status
+        self.used_traffic_bytes = used_traffic_bytes
+        self.traffic_limit_bytes = traffic_limit_bytes
+        self.lifetime_used_traffic_bytes = lifetime_used_traffic_bytes
+        self.expire_at = expire_at
+        self.online_at = online_at
+        self.updated_at = updated_at
+        self.tag = tag
+        self.telegram_id = telegram_id
+        self.email = email
+        self.short_uuid = short_uuid
+        self.description = description
+        self.created_at = created_at
+        self.inbound_refs = inbound_refs
+        self.config_profile = config_profile
+
+    @classmethod
+    def from_api(cls, user: Dict[str, Any]) -> 'UserRecord':
+        """Build a record from a /users payload item"""
+        return cls(
+            uuid=user.get('uuid'),
+            username=user.get('username'),
+            status=_intern(user.get('status')),
+            used_traffic_bytes=_to_int(user.get('usedTrafficBytes')),
+            traffic_limit_bytes=_to_int(user.get('trafficLimitBytes')),
+            lifetime_used_traffic_bytes=_to_int(user.get('lifetimeUsedTrafficBytes')),
+            expire_at=parse_timestamp(user.get('expireAt')),
+            online_at=parse_timestamp(user.get('onlineAt')),
+            updated_at=parse_timestamp(user.get('updatedAt')),
+            tag=_intern(user.get('tag')),
+            telegram_id=user.get('telegramId'),
+            email=user.get('email'),
+            short_uuid=user.get('shortUuid'),
+            description=user.get('description'),
+            created_at=parse_timestamp(user.get('createdAt')),
+            inbound_refs=_inbound_refs(user),
+            config_profile=_intern(_config_profile(user)),
+        )
+
+    @classmethod
+    def from_row(cls, row) -> 'UserRecord':
+        """Inverse of to_row()"""
+        record = cls(*row)
+        record.status = _intern(record.status)
+        record.tag = _intern(record.tag)
+        record.config_profile = _intern(record.config_profile)
+        return record
+
+    def to_row(self) -> tuple:
+        """Field values in __slots__ order (for persistence)"""
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    @classmethod
+    def coerce(cls, user):
+        """Record for a payload dict; records and None pass through unchanged"""
+        return cls.from_api(user) if isinstance(user, dict) else user
+
+    def copy(self) -> 'UserRecord':
+        clone = UserRecord.__new__(UserRecord)
+        for slot in self.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        return clone
+
+    def update_from(self, other: 'UserRecord'):
+        """Overwrite all fields in place (references held elsewhere see the new values)"""
+        for slot in self.__slots__:
+            setattr(self, slot, getattr(other, slot))
+
+    def references_inbound(self, keys: Iterable[str]) -> bool:
+        """Whether the user references an inbound by any of the keys (see inbound_key)"""
+        return bool(self.inbound_refs) and any(key in keys for key in self.inbound_refs.split('\n'))
+
+    def __getitem__(self, key: str):
+        slot = self.API_FIELDS.get(key)
+        if slot is None:
+            raise KeyError(key)
+        value = getattr(self, slot)
+        return format_timestamp(value) if slot in self.TIMESTAMP_FIELDS else value
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.API_FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Stored fields with the panel's names and formats"""
+        return {key: self[key] for key in self.API_FIELDS}
+
+    def __repr__(self):
+        return f"UserRecord({self.username!r}, {self.status})"
@@ -0,0 +1,184 @@
+"""
+Precomputed sort orders for user list views: most traffic used, soonest
+expiry, most recently online, highest share of the limit, newest.
+
+Each view keeps (sort key, uuid) pairs in a list sorted with bisect. The
+lists are built once per snapshot, on the first read, and then patched from
+the user store's change feed: a change is located by binary search and costs
+one list insert/delete, so no request ever re-sorts the user base. Changes
+that do not move a user within a view (a traffic update for "newest") are
+skipped, and a sync that moves many users drops the view to be sorted again
+on the next read, which is cheaper than shifting the list per change.
+Opening a page of a view is a slice of its list.
+
+Users without a key for a view (never online, unlimited traffic, no expiry)
+are left out of it. Keys are negated for descending views, so every list is
+ascending. Each view also remembers the key it filed every user under, so a
+change is found by uuid: a view built while a chunked sync was updating the
+records in place already holds some of the new keys, and the sync's changes
+replayed onto it move or re-add those users without duplicating them.
+"""
+import logging
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.api.user_record import UserRecord
+from modules.api.user_store import UserChange, UserSnapshot, UserStore, user_store
+
+logger = logging.getLogger(__name__)
+
+# A batch moving more than this share of a view's users drops the view instead of patching it
+_REBUILD_RATIO = 0.01
+_MIN_PATCHES = 100
+
+SortKey = Callable[[UserRecord], Optional[float]]
+
+
+def _traffic(user: UserRecord) -> Optional[float]:
+    return -user.used_traffic_bytes
+
+
+def _expiry(user: UserRecord) -> Optional[float]:
+    return user.expire_at
+
+
+def _online(user: UserRecord) -> Optional[float]:
+    return -user.online_at if user.online_at is not None else None
+
+
+def _limit_share(user: UserRecord) -> Optional[float]:
+    if user.traffic_limit_bytes <= 0:
+        return None
+    return -user.used_traffic_bytes / user.traffic_limit_bytes
+
+
+def _newest(user: UserRecord) -> Optional[float]:
+    return -user.created_at if user.created_at is not None else None
+
+
+# name -> (title, sort key, whether the view starts at the current time)
+VIEWS: Dict[str, Tuple[str, SortKey, bool]] = {
+    'traffic': ("📈 Больше всего трафика", _traffic, False),
+    'expiry': ("⏳ Скоро истекают", _expiry, True),
+    'online': ("🟢 Недавно в сети", _online, False),
+    'limit': ("📊 Ближе всего к лимиту", _limit_share, False),
+    'newest': ("🆕 Новые", _newest, False),
+}
+
+
+class SortIndex:
+    """Users ordered by one key as a sorted list of (key, uuid) pairs"""
+
+    __slots__ = ('_key', '_entries', '_keys')
+
+    def __init__(self, key: SortKey, users: List[UserRecord]):
+        self._key = key
+        keys = {}
+        for user in users:
+            value = key(user)
+            if value is not None:
+                keys[user.uuid] = value
+        self._keys: Dict[str, float] = keys
+        self._entries = sorted((value, user_uuid) for user_uuid, value in keys.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, user: UserRecord):
+        """File a user under its current key, replacing its entry if it has one"""
+        self.remove(user)
+        value = self._key(user)
+        if value is not None:
+            self._keys[user.uuid] = value
+            insort(self._entries, (value, user.uuid))
+
+    def remove(self, user: UserRecord):
+        """Drop a user's entry, found by uuid and the key it was filed under"""
+        value = self._keys.pop(user.uuid, None)
+        if value is None:
+            return
+        entry = (value, user.uuid)
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def lower_bound(self, value: float) -> int:
+        """Position of the first entry with a key not below value"""
+        return bisect_left(self._entries, (value,))
+
+    def slice(self, start: int, size: int) -> List[str]:
+        return [uuid for _, uuid in self._entries[start:start + size]]
+
+
+class UserSorter:
+    """Sort indexes of the store's current snapshot, kept in step with its change feed"""
+
+    def __init__(self, store: UserStore):
+        self._store = store
+        self._snapshot: Optional[UserSnapshot] = None
+        self._indexes: Dict[str, SortIndex] = {}
+        self._builds = 0
+        self._patched = 0
+        store.subscribe(self._on_changes)
+
+    def _on_changes(self, changes: List[UserChange]):
+        if self._snapshot is None or self._snapshot is not self._store.snapshot:
+            # Nothing built yet, or built for a replaced snapshot: rebuilt on the next read
+            return
+        for view, index in list(self._indexes.items()):
+            key = VIEWS[view][1]
+            limit = max(_MIN_PATCHES, len(index) * _REBUILD_RATIO)
+            moved = []
+            for change in changes:
+                # STATUS_CHANGED always comes with an UPDATED entry for the same user
+                if change.kind in (UserChange.CREATED, UserChange.DELETED) or (
+                        change.kind == UserChange.UPDATED and key(change.previous) != key(change.user)):
+                    moved.append(change)
+                    if len(moved) > limit:
+                        break
+            if len(moved) > limit:
+                # Cheaper to sort again than to shift the list per change: rebuilt on the next read
+                del self._indexes[view]
+                continue
+            for change in moved:
+                if change.kind == UserChange.DELETED:
+                    index.remove(change.user)
+                else:
+                    index.add(change.user)
+            self._patched += len(moved)
+
+    def _index(self, snapshot: UserSnapshot, view: str) -> SortIndex:
+        if snapshot is not self._snapshot:
+            self._snapshot = snapshot
+            self._indexes = {}
+        index = self._indexes.get(view)
+        if index is None:
+            started = time.perf_counter()
+            index = SortIndex(VIEWS[view][1], snapshot.users)
+            self._indexes[view] = index
+            self._builds += 1
+            logger.info(f"Индекс сортировки '{view}' построен за {time.perf_counter() - started:.2f}s ({len(index)} шт.)")
+        return index
+
+    async def get_page(self, view: str, start: int, size: int) -> Tuple[List[UserRecord], int]:
+        """One page of a view and the number of users in it"""
+        snapshot = await self._store.get_snapshot()
+        if snapshot is None:
+            return [], 0
+        index = self._index(snapshot, view)
+        offset = index.lower_bound(time.time()) if VIEWS[view][2] else 0
+        by_uuid = snapshot.by_uuid
+        users = [by_uuid[uuid] for uuid in index.slice(offset + start, size) if uuid in by_uuid]
+        return users, len(index) - offset
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'views': len(self._indexes),
+            'builds': self._builds,
+            'patched': self._patched,
+        }
+
+
+# Глобальный экземпляр
+user_sorter = UserSorter(user_store)
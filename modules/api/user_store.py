@@ -0,0 +1,703 @@
+"""
+Process-wide user store: one snapshot of all panel users with O(1) indexes,
+shared by handlers, keyboards, the dashboard and InboundAPI.
+
+Users are kept as compact UserRecord objects (see modules/api/user_record.py);
+the full payload is fetched only for the detail card.
+
+Refreshes are applied as deltas (see UserSnapshot.apply) and published as a
+change feed to subscribers (UserStore.subscribe).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from modules.api.search_index import TrigramIndex, rank
+from modules.api.user_columns import UserColumns
+from modules.api.user_filter import UserFilter
+from modules.api.user_record import UserRecord
+from modules.api.users import UserAPI
+from modules.config import SEARCH_FUZZY_MAX_DISTANCE, USER_STORE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class UserChange:
+    """One entry of the change feed produced by a delta sync"""
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    STATUS_CHANGED = "status_changed"
+
+    __slots__ = ("kind", "user", "previous", "raw")
+
+    def __init__(self, kind: str, user: UserRecord, previous: Optional[UserRecord] = None,
+                 raw: Optional[Dict[str, Any]] = None):
+        self.kind = kind
+        self.user = user
+        self.previous = previous
+        # Full panel payload when the change came with one (sync or mutation response)
+        self.raw = raw
+
+    def __repr__(self):
+        return f"UserChange({self.kind}, {self.user.username})"
+
+
+# Fields that may change without the panel bumping updatedAt
+_VOLATILE_FIELDS = ('updated_at', 'status', 'used_traffic_bytes', 'online_at')
+
+# Fields the lookup and search indexes are keyed on; changes elsewhere (traffic, onlineAt,
+# status...) update the record in place without touching the indexes
+_INDEXED_FIELDS = ('uuid', 'username', 'short_uuid', 'telegram_id', 'email', 'tag', 'description')
+
+
+# Users diffed between yields to the event loop during a background sync
+_APPLY_CHUNK = 2000
+
+# A batch changing more than this share of the users drops the aggregate columns (rebuilt on the
+# next read) instead of patching them user by user
+_COLUMNS_REBUILD_RATIO = 0.01
+_MIN_COLUMN_PATCHES = 100
+
+
+def parse_users(users: List[Dict[str, Any]]) -> List[UserRecord]:
+    """Records for a /users payload (run in a worker thread for full syncs)"""
+    return [UserRecord.from_api(user) for user in users]
+
+
+class UserSnapshot:
+    """All users with lookup indexes; delta syncs patch the indexes in place"""
+
+    def __init__(self, users: List[UserRecord], total: int, complete: bool):
+        self.users = users
+        self.total = total
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+        self.loaded_at_wall = time.time()
+        self.by_uuid: Dict[str, UserRecord] = {}
+        self.by_username: Dict[str, UserRecord] = {}
+        self.by_short_uuid: Dict[str, UserRecord] = {}
+        self.by_telegram_id: Dict[str, List[UserRecord]] = {}
+        self.by_email: Dict[str, List[UserRecord]] = {}
+        self.by_tag: Dict[str, List[UserRecord]] = {}
+        self._columns: Optional[UserColumns] = None
+        self._search: Optional[TrigramIndex] = None
+        self._search_build: Optional[asyncio.Future] = None
+        # Index changes made while the search index is built in a worker thread, replayed after
+        self._search_backlog: Optional[List[tuple]] = None
+        self._build_indexes(users)
+
+    @classmethod
+    def from_api(cls, users: List[Dict[str, Any]], total: int, complete: bool) -> 'UserSnapshot':
+        return cls([UserRecord.from_api(user) for user in users], total, complete)
+
+    def _build_indexes(self, users: List[UserRecord]):
+        """Bulk version of _index for a whole list (first load, warm start)"""
+        self.by_uuid = {user.uuid: user for user in users}
+        self.by_username = {user.username: user for user in users if user.username}
+        self.by_short_uuid = {user.short_uuid: user for user in users if user.short_uuid}
+        for user in users:
+            if user.telegram_id is not None:
+                self.by_telegram_id.setdefault(str(user.telegram_id), []).append(user)
+            if user.email:
+                self.by_email.setdefault(user.email.lower(), []).append(user)
+            if user.tag:
+                self.by_tag.setdefault(user.tag, []).append(user)
+
+    def _index(self, user: UserRecord):
+        self.by_uuid[user.uuid] = user
+        if user.username:
+            self.by_username[user.username] = user
+        if user.short_uuid:
+            self.by_short_uuid[user.short_uuid] = user
+        if user.telegram_id is not None:
+            self.by_telegram_id.setdefault(str(user.telegram_id), []).append(user)
+        if user.email:
+            self.by_email.setdefault(user.email.lower(), []).append(user)
+        if user.tag:
+            self.by_tag.setdefault(user.tag, []).append(user)
+        if self._search is not None:
+            self._search.add(user)
+        elif self._search_backlog is not None:
+            self._search_backlog.append((True, user))
+
+    @staticmethod
+    def _remove_from(index: Dict[str, List[UserRecord]], key, user: UserRecord):
+        bucket = index.get(key)
+        if not bucket:
+            return
+        bucket[:] = [item for item in bucket if item is not user]
+        if not bucket:
+            del index[key]
+
+    def _unindex(self, user: UserRecord):
+        if self.by_uuid.get(user.uuid) is user:
+            del self.by_uuid[user.uuid]
+        if user.username and self.by_username.get(user.username) is user:
+            del self.by_username[user.username]
+        if user.short_uuid and self.by_short_uuid.get(user.short_uuid) is user:
+            del self.by_short_uuid[user.short_uuid]
+        if user.telegram_id is not None:
+            self._remove_from(self.by_telegram_id, str(user.telegram_id), user)
+        if user.email:
+            self._remove_from(self.by_email, user.email.lower(), user)
+        if user.tag:
+            self._remove_from(self.by_tag, user.tag, user)
+        if self._search is not None:
+            self._search.remove(user)
+        elif self._search_backlog is not None:
+            self._search_backlog.append((False, user.copy()))
+
+    @staticmethod
+    def _changed(old: UserRecord, new: UserRecord) -> bool:
+        return any(getattr(old, field) != getattr(new, field) for field in _VOLATILE_FIELDS)
+
+    @staticmethod
+    def _rekeyed(old: UserRecord, new: UserRecord) -> bool:
+        return any(getattr(old, field) != getattr(new, field) for field in _INDEXED_FIELDS)
+
+    def _replace(self, old: UserRecord, new: UserRecord) -> UserRecord:
+        """Give old the fields of new, re-indexing only if an indexed field changed; returns
+        the copy of old as it was"""
+        previous = old.copy()
+        if self._rekeyed(old, new):
+            self._unindex(old)
+            old.update_from(new)
+            self._index(old)
+        else:
+            old.update_from(new)
+        return previous
+
+    def apply(self, users: List[Dict[str, Any]], total: int, complete: bool,
+              written: Optional[Set[str]] = None, records: Optional[List[UserRecord]] = None) -> List[UserChange]:
+        """Diff a fresh /users payload against the snapshot by uuid/updatedAt and patch the indexes.
+        Unchanged users keep their existing records, and changed ones are updated in place
+        (re-indexed only when a searchable field changed), so index work is proportional to the
+        changes. Deletions are only detected when the fresh list is complete.
+        Users in written were written through while the payload was downloading: the snapshot
+        already holds their newest state (or their deletion), so the payload is ignored for them.
+        records are the payload already parsed by parse_users."""
+        changes: List[UserChange] = []
+        for _ in self._diff(users, total, complete, written, records, changes):
+            pass
+        return changes
+
+    async def apply_async(self, users: List[Dict[str, Any]], total: int, complete: bool,
+                          written: Optional[Set[str]] = None,
+                          records: Optional[List[UserRecord]] = None) -> List[UserChange]:
+        """apply() that yields to the event loop every _APPLY_CHUNK users. Mutations written
+        through meanwhile must be added to written (the same set object) to be kept."""
+        changes: List[UserChange] = []
+        for _ in self._diff(users, total, complete, written, records, changes):
+            await asyncio.sleep(0)
+        return changes
+
+    def _diff(self, users, total, complete, written, records, changes):
+        merged: List[UserRecord] = []
+        seen = set()
+        written = written if written is not None else set()
+        if records is None:
+            records = parse_users(users)
+        patched = 0
+
+        for position, (raw, user) in enumerate(zip(users, records), 1):
+            seen.add(user.uuid)
+            old = self.by_uuid.get(user.uuid)
+            if user.uuid in written:
+                if old is not None:
+                    merged.append(old)
+                else:
+                    # Deleted after the panel listed it
+                    total -= 1
+                continue
+            if old is None:
+                self._index(user)
+                changes.append(UserChange(UserChange.CREATED, user, raw=raw))
+            elif self._changed(old, user):
+                previous = self._replace(old, user)
+                changes.append(UserChange(UserChange.UPDATED, old, previous, raw=raw))
+                if previous.status != old.status:
+                    changes.append(UserChange(UserChange.STATUS_CHANGED, old, previous, raw=raw))
+            merged.append(old if old is not None else user)
+            if position % _APPLY_CHUNK == 0:
+                # The columns must match the records whenever the loop may read them
+                self._patch_columns(changes[patched:])
+                patched = len(changes)
+                yield
+
+        if complete:
+            for user_uuid in [key for key in self.by_uuid if key not in seen]:
+                old = self.by_uuid[user_uuid]
+                if user_uuid in written:
+                    # Created after the panel listed the users
+                    merged.append(old)
+                    continue
+                self._unindex(old)
+                changes.append(UserChange(UserChange.DELETED, old, old))
+        else:
+            # Users missing from a partial list are kept rather than reported as deleted
+            merged.extend(user for key, user in self.by_uuid.items() if key not in seen)
+
+        if written:
+            # Users deleted by a write-through after their chunk was merged
+            merged = [user for user in merged if self.by_uuid.get(user.uuid) is user]
+        self.users = merged
+        self.total = len(merged) if complete else total
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+        self.loaded_at_wall = time.time()
+        self._patch_columns(changes[patched:])
+
+    def upsert(self, raw: Dict[str, Any]) -> List[UserChange]:
+        """Write-through for one user returned by a mutation. An existing record is updated
+        in place, so references held by handlers see the new data too."""
+        user = UserRecord.from_api(raw)
+        old = self.by_uuid.get(user.uuid)
+        if old is None:
+            self._index(user)
+            self.users.append(user)
+            self.total += 1
+            changes = [UserChange(UserChange.CREATED, user, raw=raw)]
+        else:
+            previous = self._replace(old, user)
+            changes = [UserChange(UserChange.UPDATED, old, previous, raw=raw)]
+            if previous.status != old.status:
+                changes.append(UserChange(UserChange.STATUS_CHANGED, old, previous, raw=raw))
+        self._patch_columns(changes)
+        return changes
+
+    def remove(self, user_uuid: str) -> List[UserChange]:
+        """Drop one deleted user from the list and the indexes"""
+        old = self.by_uuid.get(user_uuid)
+        if old is None:
+            return []
+        self._unindex(old)
+        self.users = [user for user in self.users if user is not old]
+        self.total = max(0, self.total - 1)
+        changes = [UserChange(UserChange.DELETED, old, old)]
+        self._patch_columns(changes)
+        return changes
+
+    def _patch_columns(self, changes: List[UserChange]):
+        """Carry changes over to the aggregate columns, if built; a large batch drops them"""
+        columns = self._columns
+        if columns is None or not changes:
+            return
+        if len(changes) > max(_MIN_COLUMN_PATCHES, len(self.by_uuid) * _COLUMNS_REBUILD_RATIO):
+            # Cheaper to build again than to shift the sorted columns per change
+            self._columns = None
+            return
+        for change in changes:
+            if change.kind == UserChange.CREATED:
+                columns.add(change.user)
+            elif change.kind == UserChange.DELETED:
+                columns.remove(change.previous)
+            elif change.kind == UserChange.UPDATED:
+                columns.update(change.previous, change.user)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was loaded"""
+        return time.monotonic() - self.loaded_at
+
+    @property
+    def columns(self) -> UserColumns:
+        """Columnar copy for aggregates (built lazily, then patched by _patch_columns)"""
+        if self._columns is None:
+            self._columns = UserColumns(self.users)
+        return self._columns
+
+    @property
+    def search_index(self) -> TrigramIndex:
+        """Substring index for generic search; built on first use, then kept in sync by _index/_unindex.
+        Builds synchronously if needed: on the event loop prefer `await get_search_index()`."""
+        if self._search is None:
+            self._search = TrigramIndex(self.users)
+            self._search_backlog = None
+        return self._search
+
+    def prepare_search_index(self) -> asyncio.Future:
+        """Start building the search index in a worker thread (once); the returned future
+        completes when the index is published"""
+        if self._search_build is None:
+            if self._search is not None:
+                self._search_build = asyncio.get_running_loop().create_future()
+                self._search_build.set_result(self._search)
+            else:
+                self._search_build = asyncio.ensure_future(self._build_search_index())
+        return self._search_build
+
+    async def get_search_index(self) -> TrigramIndex:
+        """Search index, built off the event loop if it does not exist yet"""
+        if self._search is not None:
+            return self._search
+        return await asyncio.shield(self.prepare_search_index())
+
+    async def _build_search_index(self) -> TrigramIndex:
+        started = time.perf_counter()
+        self._search_backlog = []
+        try:
+            # A private list: the loop may swap self.users while the thread reads it
+            index = await asyncio.to_thread(TrigramIndex, list(self.users))
+        except BaseException:
+            self._search_backlog = None
+            self._search_build = None
+            raise
+        if self._search is None:
+            # Replay the index changes made during the build, in order
+            for added, user in self._search_backlog:
+                if added:
+                    index.add(user)
+                else:
+                    index.remove(user)
+            self._search = index
+        self._search_backlog = None
+        logger.info(f"Поисковый индекс построен за {time.perf_counter() - started:.2f}s ({len(self._search)} шт.)")
+        return self._search
+
+    def search_stats(self) -> Optional[Dict[str, int]]:
+        """Search index counters (None until the first search builds it)"""
+        return self._search.get_stats() if self._search is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, per-status counts and total used traffic"""
+        columns = self.columns
+        return {'count': len(columns), 'stats': columns.status_histogram(), 'total_traffic': columns.total_traffic()}
+
+
+class UserStore:
+    """Owns the user snapshot; lookups hit the indexes and fall back to the API on a miss.
+    The snapshot is refreshed in the background (see main.user_store_refresh_job)."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._snapshot: Optional[UserSnapshot] = None
+        self._loading: Optional[asyncio.Task] = None
+        self._stale = False
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._failed_refreshes = 0
+        self._last_changes = 0
+        self._write_throughs = 0
+        self._searches = 0
+        self._search_candidates = 0
+        self._similar_found = 0
+        self._filters = 0
+        # uuids written through since the running load started downloading (None when idle)
+        self._written: Optional[Set[str]] = None
+        self._subscribers: List[tuple] = []
+
+    @property
+    def snapshot(self) -> Optional[UserSnapshot]:
+        """Current snapshot without triggering a load"""
+        return self._snapshot
+
+    async def get_snapshot(self, max_age: Optional[float] = None) -> Optional[UserSnapshot]:
+        """Return the last good snapshot immediately (stale-while-revalidate).
+        A snapshot older than max_age (defaults to the TTL) triggers a background refresh;
+        only the very first read, before any snapshot exists, waits for the download."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh()
+        max_age = self.ttl if max_age is None else max_age
+        if self._stale or snapshot.age > max_age:
+            self.refresh_in_background()
+        return snapshot
+
+    async def refresh(self) -> Optional[UserSnapshot]:
+        """Download all users and rebuild the indexes; concurrent triggers share one download"""
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._loading)
+
+    def refresh_in_background(self):
+        """Start a refresh without waiting for it (no-op if one is already running)"""
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self._load())
+
+    @property
+    def refreshing(self) -> bool:
+        return self._loading is not None and not self._loading.done()
+
+    async def _load(self) -> Optional[UserSnapshot]:
+        started = time.monotonic()
+        self._stale = False
+        self._written = set()
+        try:
+            response = await UserAPI.get_all_users()
+        except Exception as e:
+            logger.error(f"Error refreshing user store: {e}")
+            response = None
+        if not isinstance(response, dict):
+            self._written = None
+            self._failed_refreshes += 1
+            if self._snapshot is not None:
+                logger.warning("Не удалось обновить список пользователей, используется предыдущий снимок")
+            return self._snapshot
+        users = response.get('users') or []
+        total = response.get('total', len(users))
+        complete = response.get('complete', True)
+        # Parsing 100k users takes about a second: do it off the event loop
+        records = await asyncio.to_thread(parse_users, users)
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._written = None
+            snapshot = UserSnapshot(records, total, complete)
+            self._snapshot = snapshot
+            # Ready before the first search instead of built inside it
+            snapshot.prepare_search_index()
+            changes = []
+            logger.info(f"User store loaded {len(users)} users in {time.monotonic() - started:.2f}s")
+        else:
+            try:
+                # self._written stays live: write-throughs during the chunked diff are kept too
+                changes = await snapshot.apply_async(users, total, complete, self._written, records)
+            finally:
+                self._written = None
+            logger.info(
+                f"User store synced {len(users)} users in {time.monotonic() - started:.2f}s, "
+                f"{len(changes)} changes"
+            )
+        self._loads += 1
+        self._last_changes = len(changes)
+        self._publish(changes)
+        return snapshot
+
+    def subscribe(self, callback: Callable[[List[UserChange]], Any],
+                  kinds: Optional[List[str]] = None) -> Callable[[], None]:
+        """Register a change feed listener; returns a function that unsubscribes it.
+        The callback gets a list of UserChange per sync; coroutine callbacks run as tasks."""
+        entry = (callback, frozenset(kinds) if kinds else None)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _publish(self, changes: List[UserChange]):
+        if not changes:
+            return
+        for callback, kinds in list(self._subscribers):
+            batch = changes if kinds is None else [change for change in changes if change.kind in kinds]
+            if not batch:
+                continue
+            try:
+                result = callback(batch)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"User change listener {callback!r} failed: {e}")
+
+    def restore(self, users: List[UserRecord], total: int, complete: bool, saved_at: float) -> bool:
+        """Install a snapshot loaded from disk (warm start). It keeps its real age and is marked
+        stale, so it is served at once while the next refresh syncs it by delta."""
+        if self._snapshot is not None:
+            return False
+        snapshot = UserSnapshot(users, total, complete)
+        age = max(0.0, time.time() - saved_at)
+        snapshot.loaded_at -= age
+        snapshot.loaded_at_wall = saved_at
+        self._snapshot = snapshot
+        self._stale = True
+        logger.info(f"User store restored {len(users)} users from disk ({age:.0f}s old)")
+        return True
+
+    def invalidate(self):
+        """Mark the snapshot stale so the next read starts a background refresh"""
+        self._stale = True
+
+    def apply_mutation(self, action: str, user_uuid: Optional[str], user: Optional[Dict[str, Any]]):
+        """UserAPI mutation listener: patch the snapshot from the API response instead of reloading"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            if self.refreshing:
+                # The first download may have listed users before this change
+                self._stale = True
+            return
+        if self._written is not None:
+            # A refresh is downloading: keep this change when its (older) payload is applied
+            written_uuid = user_uuid or (user or {}).get('uuid')
+            if written_uuid:
+                self._written.add(written_uuid)
+        if action == UserAPI.MUTATION_DELETED and user_uuid:
+            changes = snapshot.remove(user_uuid)
+        elif user is not None and action in (UserAPI.MUTATION_CREATED, UserAPI.MUTATION_UPDATED):
+            changes = snapshot.upsert(user)
+        else:
+            # Bulk actions (or a response without the user) touch unknown users: resync by delta
+            self._stale = True
+            self.refresh_in_background()
+            return
+        self._write_throughs += 1
+        self._publish(changes)
+
+    def get_age(self) -> Optional[float]:
+        """Age of the current snapshot in seconds (None before the first load)"""
+        return self._snapshot.age if self._snapshot is not None else None
+
+    async def get_users(self) -> List[UserRecord]:
+        """All users from the last good snapshot"""
+        snapshot = await self.get_snapshot()
+        return snapshot.users if snapshot else []
+
+    async def get_page(self, start: int, size: int) -> Tuple[List[UserRecord], int]:
+        """One page of users and the total number of users, in panel order. Served from the
+        snapshot; before the first snapshot is loaded (or past the end of an incomplete one)
+        only this page is requested from the panel instead of waiting for the whole list."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot = await self.get_snapshot()
+            page = snapshot.users[start:start + size]
+            if page or snapshot.complete or start >= snapshot.total:
+                return page, snapshot.total
+        else:
+            self.refresh_in_background()
+
+        self._misses += 1
+        fetched = await UserAPI.get_users_page(start, size)
+        if fetched is None:
+            return [], snapshot.total if snapshot else 0
+        users, total = fetched
+        return [UserRecord.from_api(user) for user in users], total if total is not None else start + len(users)
+
+    async def count_users(self, predicate: Optional[Callable[[UserRecord], bool]] = None) -> int:
+        """Count users matching predicate (all users if predicate is None)"""
+        users = await self.get_users()
+        if predicate is None:
+            return len(users)
+        return sum(1 for user in users if predicate(user))
+
+    async def get_users_summary(self) -> Dict[str, Any]:
+        """Count, per-status counts and total used traffic for the dashboard"""
+        snapshot = await self.get_snapshot()
+        if snapshot is None:
+            return {'count': 0, 'stats': {}, 'total_traffic': 0}
+        return snapshot.summary()
+
+    async def get_user_columns(self) -> Optional[UserColumns]:
+        """Columnar view of the snapshot for range counts (expiring, online, over limit)"""
+        snapshot = await self.get_snapshot()
+        return snapshot.columns if snapshot else None
+
+    async def search(self, term: str, limit: Optional[int] = None) -> List[UserRecord]:
+        """Users whose username, description, email, tag or Telegram ID contains term, or whose
+        UUID/short UUID starts with it (case-insensitive), most relevant first; at most limit
+        users if given"""
+        snapshot = await self.get_snapshot()
+        if snapshot is None:
+            return []
+        index = await snapshot.get_search_index()
+        matches, candidates = index.search(term, limit)
+        self._searches += 1
+        self._search_candidates += candidates
+        if limit is None or len(matches) < limit:
+            return rank(matches, term)
+        # A broad query is cut in index order: exact username/email/Telegram ID hits may lie
+        # past the cut, so they are looked up directly and ranked in before truncating
+        exact = list(snapshot.by_telegram_id.get(term, ())) + list(snapshot.by_email.get(term.lower(), ()))
+        if snapshot.by_username.get(term) is not None:
+            exact.append(snapshot.by_username[term])
+        merged = {user.uuid: user for user in exact + matches}
+        return rank(merged.values(), term)[:limit]
+
+    def search_similar(self, term: str, exclude: Set[str], limit: int) -> List[UserRecord]:
+        """Up to limit users (not in exclude) whose username is within SEARCH_FUZZY_MAX_DISTANCE
+        edits of term (typos), closest first, from the current snapshot"""
+        snapshot = self._snapshot
+        if snapshot is None or SEARCH_FUZZY_MAX_DISTANCE <= 0:
+            return []
+        similar = snapshot.search_index.similar(term, SEARCH_FUZZY_MAX_DISTANCE, exclude, limit)
+        self._similar_found += len(similar)
+        return similar
+
+    async def filter_users(self, user_filter: UserFilter) -> List[UserRecord]:
+        """Users matching a compiled filter query, evaluated over the snapshot without panel calls"""
+        snapshot = await self.get_snapshot()
+        if snapshot is None:
+            return []
+        self._filters += 1
+        if user_filter.words:
+            await snapshot.get_search_index()
+        return user_filter.apply(snapshot)
+
+    def peek_by_uuid(self, uuid: str) -> Optional[UserRecord]:
+        """Look up a user in the current snapshot without loading or calling the API"""
+        snapshot = self._snapshot
+        return snapshot.by_uuid.get(uuid) if snapshot else None
+
+    def peek(self, index: str, key):
+        """Entry of a snapshot index (by_username, by_email, ...) without loading or calling the API"""
+        snapshot = self._snapshot
+        found = getattr(snapshot, index).get(key) if snapshot else None
+        if found:
+            self._hits += 1
+        return found
+
+    async def _lookup(self, index: str, key, fetch: Callable):
+        if self._snapshot is not None:
+            snapshot = await self.get_snapshot()
+            found = getattr(snapshot, index).get(key)
+            if found:
+                self._hits += 1
+                return found
+        else:
+            # Before the first snapshot one panel lookup is faster than waiting for all users
+            self.refresh_in_background()
+        # Users created after the snapshot was taken are only known to the panel
+        self._misses += 1
+        found = await fetch()
+        if isinstance(found, list):
+            return [UserRecord.coerce(user) for user in found]
+        return UserRecord.coerce(found)
+
+    async def get_by_uuid(self, uuid: str) -> Optional[UserRecord]:
+        return await self._lookup('by_uuid', uuid, lambda: UserAPI.get_user_by_uuid(uuid))
+
+    async def get_by_username(self, username: str) -> Optional[UserRecord]:
+        return await self._lookup('by_username', username, lambda: UserAPI.get_user_by_username(username))
+
+    async def get_by_short_uuid(self, short_uuid: str) -> Optional[UserRecord]:
+        return await self._lookup('by_short_uuid', short_uuid, lambda: UserAPI.get_user_by_short_uuid(short_uuid))
+
+    async def find_by_telegram_id(self, telegram_id) -> List[UserRecord]:
+        return await self._lookup(
+            'by_telegram_id', str(telegram_id), lambda: UserAPI.get_user_by_telegram_id(telegram_id)
+        ) or []
+
+    async def find_by_email(self, email: str) -> List[UserRecord]:
+        return await self._lookup('by_email', email.lower(), lambda: UserAPI.get_user_by_email(email)) or []
+
+    async def find_by_tag(self, tag: str) -> List[UserRecord]:
+        return await self._lookup('by_tag', tag, lambda: UserAPI.get_user_by_tag(tag)) or []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return snapshot and index lookup counters for diagnostics"""
+        snapshot = self._snapshot
+        lookups = self._hits + self._misses
+        return {
+            'users': len(snapshot.users) if snapshot else 0,
+            'complete': snapshot.complete if snapshot else None,
+            'age': snapshot.age if snapshot else None,
+            'loads': self._loads,
+            'failed_refreshes': self._failed_refreshes,
+            'last_changes': self._last_changes,
+            'write_throughs': self._write_throughs,
+            'refreshing': self.refreshing,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_ratio': self._hits / lookups if lookups else 0.0,
+            'searches': self._searches,
+            'search_candidates': self._search_candidates,
+            'similar_found': self._similar_found,
+            'filters': self._filters,
+            'search_index': snapshot.search_stats() if snapshot else None,
+        }
+
+
+# Глобальный экземпляр для всех модулей
+user_store = UserStore(ttl=USER_STORE_TTL)
+UserAPI.add_mutation_listener(user_store.apply_mutation)
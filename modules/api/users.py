@@ -1,59 +1,233 @@
 import logging
+import asyncio
 from modules.api.client import RemnaAPI
+from modules.config import USERS_PAGE_SIZE, USERS_FETCH_CONCURRENCY
 import re
 
 logger = logging.getLogger(__name__)
 
+class UsersFetchError(Exception):
+    """Raised when a users page cannot be fetched while streaming"""
+
 class UserAPI:
     """API client for user operations"""
     
+    # Called as listener(action, uuid, user) after successful mutations so caches can
+    # patch themselves without importing this module's callers (see user_store)
+    MUTATION_CREATED = "created"
+    MUTATION_UPDATED = "updated"
+    MUTATION_DELETED = "deleted"
+    MUTATION_BULK = "bulk"
+    _mutation_listeners = []
+    
     @staticmethod
-    async def get_all_users():
-        """Get all users with pagination support"""
-        all_users = []
-        start = 0
-        size = 500  # Maximum allowed by API
-        
-        while True:
-            # Get batch of users
-            params = {
-                'size': size,
-                'start': start
-            }
-            
+    def add_mutation_listener(listener):
+        """Register a callback for successful user mutations"""
+        if listener not in UserAPI._mutation_listeners:
+            UserAPI._mutation_listeners.append(listener)
+    
+    @staticmethod
+    def notify_mutation(action, uuid=None, user=None):
+        """Tell listeners that a user (or, for bulk actions, many users) changed on the panel"""
+        for listener in list(UserAPI._mutation_listeners):
             try:
-                response = await RemnaAPI.get("users", params=params)
-                
-                if not response:
-                    break
-                
-                # Handle different response structures
-                users = []
-                if isinstance(response, dict):
-                    if 'users' in response:
-                        users = response['users']
-                    elif 'response' in response and 'users' in response['response']:
-                        users = response['response']['users']
-                elif isinstance(response, list):
-                    users = response
-                
-                if not users:
-                    break
-                
-                all_users.extend(users)
-                
-                # If we got less than requested size, we've reached the end
-                if len(users) < size:
-                    break
-                
-                start += size
-                
+                listener(action, uuid, user)
             except Exception as e:
-                logger.error(f"Error fetching users batch (start={start}, size={size}): {e}")
+                logger.error(f"User mutation listener failed: {e}")
+    
+    @staticmethod
+    def _after_mutation(action, uuid, result):
+        """Forward a mutation result to listeners; the panel returns the full user for updates"""
+        if not result:
+            return result
+        user = result if isinstance(result, dict) and result.get('uuid') else None
+        UserAPI.notify_mutation(action, uuid or (user or {}).get('uuid'), user)
+        return result
+    
+    @staticmethod
+    def _parse_users_page(response):
+        """Extract (users, total) from a /users response; total is None when absent"""
+        users = []
+        total = None
+        if isinstance(response, dict):
+            payload = response
+            if 'users' not in payload and isinstance(payload.get('response'), dict):
+                payload = payload['response']
+            users = payload.get('users') or []
+            if isinstance(payload.get('total'), (int, float)):
+                total = int(payload['total'])
+        elif isinstance(response, list):
+            users = response
+        return users, total
+    
+    @staticmethod
+    async def _fetch_users_page(start, size):
+        """Fetch one page of users; returns (users, total) or None on failure"""
+        try:
+            response = await RemnaAPI.get("users", params={'size': size, 'start': start})
+        except Exception as e:
+            logger.error(f"Error fetching users batch (start={start}, size={size}): {e}")
+            return None
+        if response is None:
+            return None
+        return UserAPI._parse_users_page(response)
+    
+    @staticmethod
+    async def get_users_page(start, size):
+        """Get one page of users (/users?start=&size=); returns (users, total) or None on failure"""
+        return await UserAPI._fetch_users_page(start, size)
+    
+    @staticmethod
+    async def get_all_users(page_size=USERS_PAGE_SIZE, concurrency=USERS_FETCH_CONCURRENCY):
+        """Get all users: read total from the first page, then fetch the rest concurrently.
+        Returns {'users', 'total', 'complete'}, or [] if the first page could not be fetched."""
+        first_page = await UserAPI._fetch_users_page(0, page_size)
+        if first_page is None:
+            logger.error("Failed to fetch the first page of users")
+            return []
+        
+        all_users, total = first_page
+        complete = True
+        
+        if total is not None and 0 < len(all_users) < min(page_size, total):
+            # The panel capped the page size below the requested one
+            page_size = len(all_users)
+        
+        if total is not None and len(all_users) >= page_size and total > page_size:
+            offsets = list(range(page_size, total, page_size))
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            
+            async def fetch(offset):
+                async with semaphore:
+                    return await UserAPI._fetch_users_page(offset, page_size)
+            
+            pages = await asyncio.gather(*(fetch(offset) for offset in offsets))
+            
+            # Give failed pages one more sequential chance before reporting a partial result
+            for index, offset in enumerate(offsets):
+                if pages[index] is None:
+                    logger.warning(f"Retrying users page start={offset}")
+                    pages[index] = await UserAPI._fetch_users_page(offset, page_size)
+            
+            for offset, page in zip(offsets, pages):
+                if page is None:
+                    complete = False
+                    logger.error(f"Users page start={offset} failed, result is incomplete")
+                    continue
+                page_users, _ = page
+                is_last_page = offset + page_size >= total
+                if len(page_users) < page_size and not is_last_page:
+                    # Users were deleted while paging: offsets shifted and some rows may be skipped
+                    complete = False
+                    logger.warning(f"Short users page start={offset}: got {len(page_users)} of {page_size}")
+                all_users.extend(page_users)
+            
+            next_start = offsets[-1] + page_size
+            last_page = pages[-1]
+            tail_full = last_page is not None and len(last_page[0]) >= page_size
+        else:
+            next_start = len(all_users)
+            tail_full = total is None and len(all_users) >= page_size
+        
+        # Users created during pagination (or an API without total): continue sequentially
+        while tail_full:
+            page = await UserAPI._fetch_users_page(next_start, page_size)
+            if page is None:
+                complete = False
+                logger.error(f"Users page start={next_start} failed, result is incomplete")
                 break
+            page_users, _ = page
+            all_users.extend(page_users)
+            tail_full = len(page_users) >= page_size
+            next_start += page_size
         
-        logger.info(f"Retrieved {len(all_users)} users total")
-        return {'users': all_users} if all_users else []
+        # Shifted offsets can return the same user twice
+        seen = set()
+        unique_users = []
+        for user in all_users:
+            user_uuid = user.get('uuid') if isinstance(user, dict) else None
+            if user_uuid is not None:
+                if user_uuid in seen:
+                    continue
+                seen.add(user_uuid)
+            unique_users.append(user)
+        
+        if total is not None and len(unique_users) < total:
+            complete = False
+        
+        if complete:
+            logger.info(f"Retrieved {len(unique_users)} users total")
+        else:
+            logger.warning(f"Retrieved {len(unique_users)} of {total if total is not None else '?'} users, result is incomplete")
+        
+        return {'users': unique_users, 'total': total if total is not None else len(unique_users), 'complete': complete}
+    
+    @staticmethod
+    async def iter_user_pages(page_size=USERS_PAGE_SIZE):
+        """Yield /users pages one by one, prefetching the next page while the current one is consumed"""
+        start = 0
+        next_page = asyncio.ensure_future(UserAPI._fetch_users_page(start, page_size))
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                if page is None:
+                    raise UsersFetchError(f"Failed to fetch users page start={start}")
+                users, total = page
+                if not users:
+                    return
+                start += len(users)
+                has_more = start < total if total is not None else len(users) >= page_size
+                if has_more:
+                    next_page = asyncio.ensure_future(UserAPI._fetch_users_page(start, page_size))
+                yield users
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+    
+    @staticmethod
+    async def iter_users(page_size=USERS_PAGE_SIZE):
+        """Async iterator over all users; memory is bounded by the page size"""
+        async for page in UserAPI.iter_user_pages(page_size):
+            for user in page:
+                yield user
+    
+    @staticmethod
+    def get_traffic_bytes(user, field='usedTrafficBytes') -> int:
+        """Read a traffic counter from a user payload as int"""
+        value = user.get(field, 0)
+        if isinstance(value, (int, float)):
+            return int(value)
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+        return 0
+    
+    @staticmethod
+    async def count_users(predicate=None) -> int:
+        """Count users (optionally matching predicate) in a single streaming pass"""
+        count = 0
+        async for user in UserAPI.iter_users():
+            if predicate is None or predicate(user):
+                count += 1
+        return count
+    
+    @staticmethod
+    async def sum_users_traffic(field='usedTrafficBytes', predicate=None) -> int:
+        """Sum a traffic counter over users in a single streaming pass"""
+        total = 0
+        async for user in UserAPI.iter_users():
+            if predicate is None or predicate(user):
+                total += UserAPI.get_traffic_bytes(user, field)
+        return total
+    
+    @staticmethod
+    async def get_users_sample(limit=3):
+        """Get the first few users without loading the full list"""
+        page = await UserAPI._fetch_users_page(0, limit)
+        if page is None:
+            return []
+        users, _ = page
+        return users[:limit]
     
     @staticmethod
     async def get_users_count():
@@ -185,7 +359,8 @@ class UserAPI:
         # Финальное логирование перед отправкой
         logger.info(f"Final user data before API request: trafficLimitStrategy='{user_data.get('trafficLimitStrategy')}', hwidDeviceLimit={user_data.get('hwidDeviceLimit', 'Not set')}")
         
-        return await RemnaAPI.post("users", user_data)
+        result = await RemnaAPI.post("users", user_data)
+        return UserAPI._after_mutation(UserAPI.MUTATION_CREATED, None, result)
     
     @staticmethod
     async def update_user(uuid, update_data):
@@ -196,32 +371,38 @@ class UserAPI:
         # Логируем данные для отладки
         logger.debug(f"Updating user {uuid} with data: {update_data}")
         
-        return await RemnaAPI.patch("users", update_data)
+        result = await RemnaAPI.patch("users", update_data)
+        return UserAPI._after_mutation(UserAPI.MUTATION_UPDATED, uuid, result)
     
     @staticmethod
     async def delete_user(uuid):
         """Delete a user"""
-        return await RemnaAPI.delete(f"users/{uuid}")
+        result = await RemnaAPI.delete(f"users/{uuid}")
+        return UserAPI._after_mutation(UserAPI.MUTATION_DELETED, uuid, result)
     
     @staticmethod
     async def revoke_user_subscription(uuid):
         """Revoke user subscription"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/revoke")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/revoke")
+        return UserAPI._after_mutation(UserAPI.MUTATION_UPDATED, uuid, result)
     
     @staticmethod
     async def disable_user(uuid):
         """Disable a user using v2113 actions endpoint"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/disable")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/disable")
+        return UserAPI._after_mutation(UserAPI.MUTATION_UPDATED, uuid, result)
     
     @staticmethod
     async def enable_user(uuid):
         """Enable a user using v2113 actions endpoint"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/enable")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/enable")
+        return UserAPI._after_mutation(UserAPI.MUTATION_UPDATED, uuid, result)
     
     @staticmethod
     async def reset_user_traffic(uuid):
         """Reset user traffic"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/reset-traffic")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/reset-traffic")
+        return UserAPI._after_mutation(UserAPI.MUTATION_UPDATED, uuid, result)
     
     
     @staticmethod
@@ -270,103 +451,22 @@ class UserAPI:
         
         return await RemnaAPI.post("hwid/devices/delete", data)
     
-    @staticmethod
-    async def search_users_by_partial_name(partial_name):
-        """Search users by partial name match"""
-        try:
-            response = await UserAPI.get_all_users()
-            if not response:
-                return []
-            
-            # Обрабатываем разные структуры ответа
-            users = []
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users']
-                elif 'response' in response and 'users' in response['response']:
-                    users = response['response']['users']
-            elif isinstance(response, list):
-                users = response
-            
-            if not users:
-                return []
-            
-            partial_name_lower = partial_name.lower()
-            matching_users = []
-            
-            for user in users:
-                if partial_name_lower in user.get("username", "").lower():
-                    matching_users.append(user)
-            
-            return matching_users
-        except Exception as e:
-            logger.error(f"Error searching users by partial name: {e}")
-            return []
-    
-    @staticmethod
-    async def search_users_by_description(description_keyword):
-        """Search users by description keyword"""
-        try:
-            response = await UserAPI.get_all_users()
-            if not response:
-                return []
-            
-            # Обрабатываем разные структуры ответа
-            users = []
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users']
-                elif 'response' in response and 'users' in response['response']:
-                    users = response['response']['users']
-            elif isinstance(response, list):
-                users = response
-            
-            if not users:
-                return []
-            
-            keyword_lower = description_keyword.lower()
-            matching_users = []
-            
-            for user in users:
-                user_description = user.get("description", "")
-                if user_description and keyword_lower in user_description.lower():
-                    matching_users.append(user)
-            
-            return matching_users
-        except Exception as e:
-            logger.error(f"Error searching users by description: {e}")
-            return []
-    
     @staticmethod
     async def get_users_stats():
-        """Get user statistics efficiently"""
+        """Get user statistics in a single streaming pass over all users"""
+        stats = {'ACTIVE': 0, 'DISABLED': 0, 'LIMITED': 0, 'EXPIRED': 0}
+        count = 0
+        total_traffic = 0
         try:
-            # For now, we need to get all users to calculate stats
-            # TODO: Optimize when API provides stats endpoint
-            response = await UserAPI.get_all_users()
-            
-            stats = {'ACTIVE': 0, 'DISABLED': 0, 'LIMITED': 0, 'EXPIRED': 0}
-            total_traffic = 0
-            
-            if response:
-                users = []
-                if isinstance(response, dict) and 'users' in response:
-                    users = response['users']
-                elif isinstance(response, list):
-                    users = response
-                
-                for user in users:
-                    status = user.get('status', 'UNKNOWN')
-                    if status in stats:
-                        stats[status] += 1
-                    
-                    # Calculate traffic
-                    traffic_used = user.get('trafficUsed', 0)
-                    if isinstance(traffic_used, (int, float)):
-                        total_traffic += traffic_used
+            async for user in UserAPI.iter_users():
+                count += 1
+                status = user.get('status', 'UNKNOWN')
+                if status in stats:
+                    stats[status] += 1
+                total_traffic += UserAPI.get_traffic_bytes(user)
             
             return {
-                'count': len(users) if 'users' in locals() else 0,
+                'count': count,
                 'stats': stats,
                 'total_traffic': total_traffic
             }
@@ -54,6 +54,71 @@ if _raw_cookies and not API_COOKIES:
 API_BASE_URL = os.getenv("API_BASE_URL", "http://remnawave:3000/api")
 API_TOKEN = os.getenv("REMNAWAVE_API_TOKEN")
 
+# Shared HTTP connection pool settings
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "30"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "20"))
+API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("API_MAX_KEEPALIVE_CONNECTIONS", "10"))
+API_KEEPALIVE_EXPIRY = float(os.getenv("API_KEEPALIVE_EXPIRY", "60"))
+
+# Transport behind the API client: httpx (real panel) or mock (synthetic in-process panel
+# for offline benchmarks and load tests; see modules/api/mock_panel.py)
+API_TRANSPORT = os.getenv("API_TRANSPORT", "httpx").lower()
+MOCK_PANEL_USERS = int(os.getenv("MOCK_PANEL_USERS", "1000"))
+MOCK_PANEL_NODES = int(os.getenv("MOCK_PANEL_NODES", "8"))
+MOCK_PANEL_LATENCY_MS = float(os.getenv("MOCK_PANEL_LATENCY_MS", "20"))
+MOCK_PANEL_JITTER_MS = float(os.getenv("MOCK_PANEL_JITTER_MS", "10"))
+MOCK_PANEL_ERROR_RATE = float(os.getenv("MOCK_PANEL_ERROR_RATE", "0"))
+MOCK_PANEL_SEED = int(os.getenv("MOCK_PANEL_SEED", "42"))
+
+# HTTP/2 multiplexing (needs an HTTP/2-capable reverse proxy) and a cap on simultaneous
+# requests shared by all API classes (0 = unlimited)
+API_HTTP2 = os.getenv("API_HTTP2", "false").lower() == "true"
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "16"))
+
+# JSON decoder for API responses: auto (orjson -> msgspec -> json), orjson, msgspec or json
+API_JSON_BACKEND = os.getenv("API_JSON_BACKEND", "auto")
+
+# Retry policy: decorrelated jitter between base and max delay, per-call deadline,
+# and a budget limiting retries to a share of recent requests
+API_RETRY_MAX_ATTEMPTS = int(os.getenv("API_RETRY_MAX_ATTEMPTS", "3"))
+API_RETRY_BASE_DELAY = float(os.getenv("API_RETRY_BASE_DELAY", "0.5"))
+API_RETRY_MAX_DELAY = float(os.getenv("API_RETRY_MAX_DELAY", "10"))
+API_RETRY_DEADLINE = float(os.getenv("API_RETRY_DEADLINE", "45"))
+API_RETRY_BUDGET_RATIO = float(os.getenv("API_RETRY_BUDGET_RATIO", "0.2"))
+API_RETRY_BUDGET_MIN_PER_WINDOW = int(os.getenv("API_RETRY_BUDGET_MIN_PER_WINDOW", "5"))
+
+# Circuit breaker / panel health probe settings
+API_CB_FAILURE_THRESHOLD = int(os.getenv("API_CB_FAILURE_THRESHOLD", "5"))
+API_CB_RECOVERY_TIMEOUT = float(os.getenv("API_CB_RECOVERY_TIMEOUT", "30"))
+API_HEALTH_PROBE_INTERVAL = float(os.getenv("API_HEALTH_PROBE_INTERVAL", "30"))  # 0 disables the probe
+
+# Response cache for nodes/hosts/config profiles (TTLs are set in modules/api/cache.py)
+API_CACHE_ENABLED = os.getenv("API_CACHE_ENABLED", "true").lower() == "true"
+
+# Users pagination: page size (API maximum is 500) and parallel page requests
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "500"))
+USERS_FETCH_CONCURRENCY = int(os.getenv("USERS_FETCH_CONCURRENCY", "4"))
+USER_STORE_TTL = int(os.getenv("USER_STORE_TTL", "300"))  # Snapshot age that triggers a refresh on read
+# Background refresh of the user snapshot (0 disables the job); jitter spreads refreshes in time
+USER_STORE_REFRESH_INTERVAL = float(os.getenv("USER_STORE_REFRESH_INTERVAL", "240"))
+USER_STORE_REFRESH_JITTER = float(os.getenv("USER_STORE_REFRESH_JITTER", "30"))
+
+# Per-user card cache (LRU bounded by entry count and estimated memory)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "2000"))
+USER_CACHE_MAX_BYTES = int(os.getenv("USER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))  # 0 = no byte limit
+
+# On-disk snapshot (users and cached panel lists) for warm starts; empty disables
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "data/snapshot.db").strip()
+
+# Typo-tolerant user search: max edits between the query and a username (0 disables)
+SEARCH_FUZZY_MAX_DISTANCE = int(os.getenv("SEARCH_FUZZY_MAX_DISTANCE", "2"))
+
+# Inline mode (@bot <query>): results per answer, per-user debounce and latency budget of one answer
+INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "20"))  # Telegram allows up to 50
+INLINE_DEBOUNCE_MS = int(os.getenv("INLINE_DEBOUNCE_MS", "250"))
+INLINE_SEARCH_BUDGET_MS = int(os.getenv("INLINE_SEARCH_BUDGET_MS", "50"))
+
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
 # Parse admin user IDs with detailed logging
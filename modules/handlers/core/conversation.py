@@ -22,6 +22,7 @@ from modules.config import (
 from modules.utils.auth import check_authorization
 
 from modules.handlers.core.start import start
+from modules.handlers.core.diagnostics import show_api_stats, show_cache_stats
 from modules.handlers.core.menu import handle_menu_selection
 from modules.handlers.users import (
     handle_users_menu, handle_user_selection, handle_user_action,
@@ -65,7 +66,11 @@ async def unauthorized_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 def create_conversation_handler():
     """Create the main conversation handler"""
     return ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[
+            CommandHandler("start", start),
+            CommandHandler("apistats", show_api_stats),
+            CommandHandler("cachestats", show_cache_stats)
+        ],
         states={
             MAIN_MENU: [
                 CallbackQueryHandler(handle_menu_selection)
@@ -175,6 +180,8 @@ def create_conversation_handler():
         },
         fallbacks=[
             CommandHandler("start", unauthorized_handler),
+            CommandHandler("apistats", show_api_stats),
+            CommandHandler("cachestats", show_cache_stats),
             MessageHandler(filters.TEXT, unauthorized_handler),
             CallbackQueryHandler(unauthorized_handler)
         ],
@@ -0,0 +1,137 @@
+"""
+Admin diagnostics: API client and cache counters for tuning panel load
+"""
+from telegram import Update
+from telegram.ext import ContextTypes
+import logging
+import time
+
+from modules.api.client import RemnaAPI
+from modules.api.health import api_health
+from modules.api.retry import retry_policy
+from modules.api.snapshot_file import snapshot_file
+from modules.api.user_sort import user_sorter
+from modules.api.user_store import user_store
+from modules.utils.auth import check_admin
+from modules.utils.formatters import format_bytes
+from modules.handlers.users.handlers import user_cache
+from modules.handlers.users.inline import inline_search
+
+logger = logging.getLogger(__name__)
+
+
+def format_api_stats() -> str:
+    """Build a plain-text report of API client counters"""
+    requests = RemnaAPI.get_stats()
+    health = api_health.get_stats()
+
+    lines = [
+        "📡 Статистика API",
+        "",
+        f"Состояние панели: {health['state']} (ошибок подряд: {health['consecutive_failures']}, отклонено: {health['rejected']})",
+        f"Транспорт: {requests['transport']}, протокол: {'HTTP/2' if requests['http2'] else 'HTTP/1.1'}, запросов выполняется: {requests['active_requests']}"
+        f" (лимит: {requests['max_concurrency'] or 'нет'})",
+        "",
+        "Объединение одинаковых GET-запросов:",
+        f"  • Вызовов GET: {requests['get_calls']}",
+        f"  • Отправлено в панель: {requests['sent']}",
+        f"  • Объединено: {requests['coalesced']} ({requests['coalesced_ratio'] * 100:.1f}%)",
+        f"  • Сейчас в полёте: {requests['inflight']}",
+    ]
+
+    if retry_policy.budget is not None:
+        budget = retry_policy.budget.get_stats()
+        lines += [
+            "",
+            f"Повторы за последние {retry_policy.budget.window:.0f} с: {budget['retries']} на {budget['requests']} запросов"
+            f" (бюджет исчерпан: {budget['exhausted']} раз)",
+        ]
+
+    cache = requests["cache"]
+    lines += [
+        "",
+        f"Кэш ответов: {'включён' if cache['enabled'] else 'выключен'}, записей: {cache['entries']}",
+        f"  • Попаданий: {cache['hits']}, промахов: {cache['misses']} ({cache['hit_ratio'] * 100:.1f}%)",
+    ]
+    for endpoint, counters in sorted(cache["endpoints"].items()):
+        lines.append(f"  • {endpoint}: {counters['hits']}/{counters['misses']}")
+
+    store = user_store.get_stats()
+    age = f"{store['age']:.0f} с" if store['age'] is not None else "не загружен"
+    lines += [
+        "",
+        f"Хранилище пользователей: {store['users']} шт., возраст снимка: {age}, загрузок: {store['loads']}"
+        f" (неудачных: {store['failed_refreshes']}){', обновляется' if store['refreshing'] else ''}",
+        f"  • Изменений при последней синхронизации: {store['last_changes']}, точечных обновлений: {store['write_throughs']}",
+        f"  • Поиск по индексам: {store['hits']} попаданий, {store['misses']} запросов в панель"
+        f" ({store['hit_ratio'] * 100:.1f}%)",
+    ]
+    return "\n".join(lines)
+
+
+def format_cache_stats() -> str:
+    """Build a plain-text report of the in-memory caches"""
+    cards = user_cache.get_stats()
+    responses = RemnaAPI.get_stats()["cache"]
+    store = user_store.get_stats()
+
+    max_bytes = format_bytes(cards['max_bytes']) if cards['max_bytes'] else "нет"
+    lines = [
+        "🗄 Статистика кэшей",
+        "",
+        f"Карточки пользователей: {cards['entries']} из {cards['max_entries']}, "
+        f"~{format_bytes(cards['bytes'])} из {max_bytes}",
+        f"  • Попаданий: {cards['hits']}, промахов: {cards['misses']} ({cards['hit_ratio'] * 100:.1f}%)",
+        f"  • Вытеснено: {cards['evictions']}, истекло: {cards['expirations']}",
+        "",
+        f"Кэш ответов API: {'включён' if responses['enabled'] else 'выключен'}, записей: {responses['entries']}",
+        f"  • Попаданий: {responses['hits']}, промахов: {responses['misses']} ({responses['hit_ratio'] * 100:.1f}%)",
+        "",
+        f"Снимок пользователей: {store['users']} шт., попаданий в индексы: {store['hits']}, "
+        f"промахов: {store['misses']} ({store['hit_ratio'] * 100:.1f}%)",
+    ]
+    search = store['search_index']
+    if search is not None:
+        lines.append(
+            f"  • Поисковый индекс: {search['documents']} пользователей, {search['trigrams']} триграмм, "
+            f"{search['postings']} ссылок; поисков: {store['searches']}, проверено кандидатов: {store['search_candidates']}, "
+            f"найдено с опечатками: {store['similar_found']}, фильтров: {store['filters']}"
+        )
+    sorts = user_sorter.get_stats()
+    if sorts['views']:
+        lines.append(
+            f"  • Сортировки: {sorts['views']} индексов, построено: {sorts['builds']}, "
+            f"изменений применено: {sorts['patched']}"
+        )
+    inline = inline_search.get_stats()
+    if inline['queries'] or inline['superseded']:
+        lines.append(
+            f"  • Инлайн-поиск: {inline['queries']} ответов, пропущено при наборе: {inline['superseded']}, "
+            f"по префиксу: {inline['prefix_hits']}, дольше бюджета: {inline['over_budget']} "
+            f"(макс. {inline['slowest_ms']:.0f} мс)"
+        )
+
+    disk = snapshot_file.get_stats()
+    if disk["enabled"]:
+        saved = (
+            f"сохранён {time.time() - disk['last_saved_at']:.0f} с назад за {disk['last_save_seconds']:.2f} с"
+            if disk["last_saved_at"] else "ещё не сохранялся"
+        )
+        lines.append(f"Снимок на диске ({disk['path']}): {saved}")
+        if disk["restored_users"] is not None:
+            lines.append(f"  • При старте восстановлено {disk['restored_users']} пользователей (возраст {disk['restored_age']:.0f} с)")
+    return "\n".join(lines)
+
+
+@check_admin
+async def show_api_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /apistats: show API client counters without changing conversation state"""
+    await update.message.reply_text(format_api_stats())
+    return None
+
+
+@check_admin
+async def show_cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /cachestats: show cache sizes, evictions and hit ratios"""
+    await update.message.reply_text(format_cache_stats())
+    return None
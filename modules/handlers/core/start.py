@@ -10,9 +10,10 @@ from modules.utils.auth import (
     get_user_role,
     is_admin_user
 )
-from modules.api.users import UserAPI
+from modules.api.user_store import user_store
 from modules.api.nodes import NodeAPI
 from modules.api.inbounds import InboundAPI
+from modules.api.client import RemnaAPI
 from modules.handlers.core.language import LANGUAGE_MENU_CALLBACK
 from modules.localization import SUPPORTED_LANGUAGES, get_user_language
 from modules.utils.formatters import format_bytes
@@ -22,6 +23,9 @@ logger = logging.getLogger(__name__)
 
 ROLE_DISPLAY = {"admin": "Администратор", "operator": "Оператор"}
 
+# Статусы пользователей в сводке дашборда, в порядке вывода
+DASHBOARD_STATUSES = {"ACTIVE": "✅", "DISABLED": "❌", "LIMITED": "⚠️", "EXPIRED": "⏰"}
+
 @check_operator_or_admin
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
@@ -56,6 +60,8 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     stats_text = await get_system_stats()
     
     message = "🎛️ *Главное меню Remnawave Admin*\n\n"
+    if not RemnaAPI.is_available():
+        message += "⚠️ *Панель недоступна* — данные могут быть неполными или устаревшими.\n\n"
     message += stats_text + "\n"
     message += f"🌐 Текущий язык: {language_label}\n\n"
     message += "Выберите раздел для управления:"
@@ -142,44 +148,34 @@ async def get_system_stats():
         # Статистика пользователей (если включена)
         if DASHBOARD_SHOW_USERS_COUNT:
             try:
-                users_response = await UserAPI.get_all_users()
-                users_count = 0
-                user_stats = {'ACTIVE': 0, 'DISABLED': 0, 'LIMITED': 0, 'EXPIRED': 0}
-                total_traffic = 0
-                
-                if users_response:
-                    users = []
-                    if isinstance(users_response, dict):
-                        if 'users' in users_response:
-                            users = users_response['users']
-                        elif 'response' in users_response and 'users' in users_response['response']:
-                            users = users_response['response']['users']
-                    elif isinstance(users_response, list):
-                        users = users_response
-                    
-                    users_count = len(users)
-                    
-                    for user in users:
-                        status = user.get('status', 'UNKNOWN')
-                        if status in user_stats:
-                            user_stats[status] += 1
-                        
-                        if DASHBOARD_SHOW_TRAFFIC_STATS:
-                            traffic_bytes = user.get('usedTrafficBytes', 0)
-                            if isinstance(traffic_bytes, (int, float)):
-                                total_traffic += traffic_bytes
-                            elif isinstance(traffic_bytes, str) and traffic_bytes.isdigit():
-                                total_traffic += int(traffic_bytes)
+                # Сводка считается один раз на снимок общего хранилища пользователей
+                users_summary = await user_store.get_users_summary()
+                users_count = users_summary['count']
+                user_stats = users_summary['stats']
+                total_traffic = users_summary['total_traffic'] if DASHBOARD_SHOW_TRAFFIC_STATS else 0
                 
                 user_section = f"👥 *Пользователи* ({users_count} всего):\n"
-                for status, count in user_stats.items():
-                    if count > 0:
-                        emoji = {"ACTIVE": "✅", "DISABLED": "❌", "LIMITED": "⚠️", "EXPIRED": "⏰"}.get(status, "❓")
-                        user_section += f"  • {emoji} {status}: {count}\n"
+                # Колонки есть только у встречающихся статусов: отсутствующие показываем нулём
+                for status, emoji in DASHBOARD_STATUSES.items():
+                    user_section += f"  • {emoji} {status}: {user_stats.get(status, 0)}\n"
                 
                 if DASHBOARD_SHOW_TRAFFIC_STATS and total_traffic > 0:
                     user_section += f"  • Общий трафик: {format_bytes(total_traffic)}\n"
                 
+                # Счётчики по диапазонам: бинарный поиск по колонкам снимка
+                columns = await user_store.get_user_columns()
+                if columns is not None and len(columns) > 0:
+                    user_section += f"  • 🟢 Онлайн (5 мин): {columns.count_online(5)}\n"
+                    user_section += f"  • ⏳ Истекают в течение 7 дней: {columns.count_expiring(7)}\n"
+                    over_limit = columns.count_over_limit(80)
+                    if over_limit:
+                        user_section += f"  • 📈 Израсходовали ≥80% лимита: {over_limit}\n"
+                
+                # Данные берутся из снимка, который обновляется в фоне; показываем его возраст
+                age = user_store.get_age()
+                if age is not None and age >= 60:
+                    user_section += f"  • Данные обновлены {int(age // 60)} мин назад\n"
+                
                 stats_sections.append(user_section)
                 
             except Exception as e:
@@ -286,22 +282,9 @@ async def get_basic_system_stats():
     """Get basic system statistics (fallback version)"""
     try:
         # Получаем статистику пользователей
-        users_response = await UserAPI.get_all_users()
-        users_count = 0
-        active_users = 0
-        if users_response:
-            # Проверяем разные возможные структуры ответа
-            users = []
-            if isinstance(users_response, dict):
-                if 'users' in users_response:
-                    users = users_response['users']
-                elif 'response' in users_response and 'users' in users_response['response']:
-                    users = users_response['response']['users']
-            elif isinstance(users_response, list):
-                users = users_response
-            
-            users_count = len(users)
-            active_users = sum(1 for user in users if user.get('status') == 'ACTIVE')
+        users_summary = await user_store.get_users_summary()
+        users_count = users_summary['count']
+        active_users = users_summary['stats'].get('ACTIVE', 0)
 
         # Получаем статистику узлов
         nodes_response = await NodeAPI.get_all_nodes()
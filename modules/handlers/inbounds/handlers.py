@@ -7,6 +7,7 @@ from datetime import datetime
 from modules.config import MAIN_MENU, INBOUND_MENU
 from modules.api.inbounds import InboundAPI
 from modules.api.users import UserAPI
+from modules.api.user_store import user_store
 from modules.api.nodes import NodeAPI
 from modules.utils.formatters import format_inbound_details, escape_markdown
 from modules.utils.selection_helpers import SelectionHelper
@@ -216,58 +217,49 @@ async def debug_user_structure(update: Update, context: ContextTypes.DEFAULT_TYP
         await InboundAPI.debug_user_structure()
         
         # Get a sample user to show structure
-        users_response = await UserAPI.get_all_users()
-        if not users_response:
+        users = await UserAPI.get_users_sample(1)
+        if not users:
             message = "❌ Не удалось получить данные пользователей для отладки"
         else:
-            users = []
-            if isinstance(users_response, dict) and 'users' in users_response:
-                users = users_response['users']
-            elif isinstance(users_response, list):
-                users = users_response
+            user = users[0]  # Get first user
+            message = f"🔍 *Структура данных пользователя*\n\n"
+            message += f"👤 *Пользователь*: {escape_markdown(user.get('username', 'N/A'))}\n"
+            message += f"📊 *Статус*: {user.get('status', 'N/A')}\n"
+            message += f"🆔 *UUID*: `{user.get('uuid', 'N/A')}`\n\n"
             
-            if not users:
-                message = "❌ Пользователи не найдены"
+            # Subscription info
+            subscription = user.get('subscription')
+            if subscription:
+                message += f"📋 *Подписка:*\n"
+                message += f"  • Статус: {subscription.get('status', 'N/A')}\n"
+                message += f"  • Config Profile UUID: `{subscription.get('configProfileUuid', 'N/A')}`\n"
+                message += f"  • Inbounds: {subscription.get('inbounds', 'N/A')}\n\n"
             else:
-                user = users[0]  # Get first user
-                message = f"🔍 *Структура данных пользователя*\n\n"
-                message += f"👤 *Пользователь*: {escape_markdown(user.get('username', 'N/A'))}\n"
-                message += f"📊 *Статус*: {user.get('status', 'N/A')}\n"
-                message += f"🆔 *UUID*: `{user.get('uuid', 'N/A')}`\n\n"
-                
-                # Subscription info
-                subscription = user.get('subscription')
-                if subscription:
-                    message += f"📋 *Подписка:*\n"
-                    message += f"  • Статус: {subscription.get('status', 'N/A')}\n"
-                    message += f"  • Config Profile UUID: `{subscription.get('configProfileUuid', 'N/A')}`\n"
-                    message += f"  • Inbounds: {subscription.get('inbounds', 'N/A')}\n\n"
-                else:
-                    message += f"📋 *Подписка*: Нет данных\n\n"
-                
-                # Direct inbound references
-                user_inbounds = user.get('inbounds', [])
-                if user_inbounds:
-                    message += f"🔌 *Прямые Inbounds*: {len(user_inbounds)} шт.\n"
-                    for i, inbound in enumerate(user_inbounds[:3]):
-                        message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
-                    if len(user_inbounds) > 3:
-                        message += f"  ... и еще {len(user_inbounds) - 3}\n"
-                else:
-                    message += f"🔌 *Прямые Inbounds*: Нет данных\n"
-                
-                # Active inbounds
-                active_inbounds = user.get('activeInbounds', [])
-                if active_inbounds:
-                    message += f"✅ *Активные Inbounds*: {len(active_inbounds)} шт.\n"
-                    for i, inbound in enumerate(active_inbounds[:3]):
-                        message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
-                    if len(active_inbounds) > 3:
-                        message += f"  ... и еще {len(active_inbounds) - 3}\n"
-                else:
-                    message += f"✅ *Активные Inbounds*: Нет данных\n"
-                
-                message += f"\n📝 *Проверьте логи для подробной информации*"
+                message += f"📋 *Подписка*: Нет данных\n\n"
+            
+            # Direct inbound references
+            user_inbounds = user.get('inbounds', [])
+            if user_inbounds:
+                message += f"🔌 *Прямые Inbounds*: {len(user_inbounds)} шт.\n"
+                for i, inbound in enumerate(user_inbounds[:3]):
+                    message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
+                if len(user_inbounds) > 3:
+                    message += f"  ... и еще {len(user_inbounds) - 3}\n"
+            else:
+                message += f"🔌 *Прямые Inbounds*: Нет данных\n"
+            
+            # Active inbounds
+            active_inbounds = user.get('activeInbounds', [])
+            if active_inbounds:
+                message += f"✅ *Активные Inbounds*: {len(active_inbounds)} шт.\n"
+                for i, inbound in enumerate(active_inbounds[:3]):
+                    message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
+                if len(active_inbounds) > 3:
+                    message += f"  ... и еще {len(active_inbounds) - 3}\n"
+            else:
+                message += f"✅ *Активные Inbounds*: Нет данных\n"
+            
+            message += f"\n📝 *Проверьте логи для подробной информации*"
         
         keyboard = [
             [InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)]
@@ -530,18 +522,7 @@ async def show_inbound_users(update: Update, context: ContextTypes.DEFAULT_TYPE,
         message += f"📡 *Онлайн сейчас*: {online_count}\n\n"
         
         # Получим общее количество активных пользователей
-        from modules.api.users import UserAPI
-        all_users_resp = await UserAPI.get_all_users()
-        all_users = []
-        if isinstance(all_users_resp, dict) and 'users' in all_users_resp:
-            all_users = all_users_resp['users'] or []
-        elif isinstance(all_users_resp, list):
-            all_users = all_users_resp
-        
-        active_users = 0
-        for user in all_users:
-            if InboundAPI._is_active_status(user.get('status')):
-                active_users += 1
+        active_users = (await user_store.get_users_summary())['stats'].get('ACTIVE', 0)
         
         message += f"📊 *Всего активных пользователей*: {active_users}\n\n"
         # Добавим время обновления чтобы избежать ошибки "Message is not modified"
@@ -11,13 +11,16 @@ from modules.utils.formatters import safe_edit_message
 
 from modules.config import (
     MAIN_MENU, USER_MENU, SELECTING_USER, WAITING_FOR_INPUT, CONFIRM_ACTION,
-    EDIT_USER, EDIT_FIELD, EDIT_VALUE, CREATE_USER, CREATE_USER_FIELD, USER_FIELDS
+    EDIT_USER, EDIT_FIELD, EDIT_VALUE, CREATE_USER, CREATE_USER_FIELD, USER_FIELDS,
+    USER_CACHE_TTL, USER_CACHE_MAX_ENTRIES, USER_CACHE_MAX_BYTES
 )
 
 # Константы для callback_data
 class CallbackData:
     # Основные действия
     LIST_USERS = "list_users"
+    USER_VIEWS = "user_views"
+    USER_VIEW = "user_view_"
     SEARCH_USER = "search_user"
     CREATE_USER = "create_user"
     BACK_TO_MAIN = "back_to_main"
@@ -100,8 +103,13 @@ class Messages:
     CONFIRM_RESET = "⚠️ Вы уверены, что хотите сбросить трафик пользователя?"
     CONFIRM_REVOKE = "⚠️ Вы уверены, что хотите отозвать подписку пользователя?"
 from modules.api.users import UserAPI
+from modules.api.user_filter import FilterError, UserFilter, is_filter_query
+from modules.api.user_sort import VIEWS
+from modules.api.user_store import UserChange, user_store
+from modules.utils.lru_cache import LRUCache
 from modules.utils.formatters import format_bytes, format_user_details, format_user_details_safe, escape_markdown, safe_edit_message
 from modules.utils.selection_helpers import SelectionHelper
+from modules.utils.user_cursor import UserCursor
 from modules.utils.auth import (
     check_admin,
     check_authorization,
@@ -249,41 +257,27 @@ class ErrorHandler:
 
 # Кэширование данных пользователей
 class UserCache:
-    """Класс для кэширования данных пользователей"""
+    """Кэш карточек пользователей (LRU с ограничением по числу записей, объёму и TTL).
+    Хранит полные ответы панели для карточки; список всех пользователей — компактные записи user_store"""
     
-    def __init__(self, cache_ttl: int = 300):  # 5 минут по умолчанию
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._cache_ttl = cache_ttl
-    
-    def _is_expired(self, timestamp: float) -> bool:
-        """Проверяет, истек ли срок кэша"""
-        return datetime.now().timestamp() - timestamp > self._cache_ttl
+    def __init__(self, cache_ttl: int = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES,
+                 max_bytes: int = USER_CACHE_MAX_BYTES):
+        self._cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=cache_ttl)
     
     async def get_user(self, uuid: str) -> Optional[Dict[str, Any]]:
         """Получает пользователя из кэша или API"""
         cache_key = f"user_{uuid}"
         
-        if cache_key in self._cache:
-            cached_data = self._cache[cache_key]
-            if not self._is_expired(cached_data['timestamp']):
-                logger.debug(f"User {uuid} found in cache")
-                return cached_data['data']
-            else:
-                # Удаляем устаревшие данные
-                del self._cache[cache_key]
-        
-        # Периодически очищаем кэш (каждый 10-й запрос)
-        if len(self._cache) % 10 == 0:
-            self.cleanup_expired()
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"User {uuid} found in cache")
+            return cached
         
-        # Получаем данные из API
+        # Полные данные нужны только карточке: снимок хранит урезанные записи
         try:
             user_data = await UserAPI.get_user_by_uuid(uuid)
             if user_data:
-                self._cache[cache_key] = {
-                    'data': user_data,
-                    'timestamp': datetime.now().timestamp()
-                }
+                self._cache.set(cache_key, user_data)
                 logger.debug(f"User {uuid} cached")
             return user_data
         except Exception as e:
@@ -291,70 +285,46 @@ class UserCache:
             return None
     
     async def get_all_users(self) -> Optional[list]:
-        """Получает всех пользователей из кэша или API"""
-        cache_key = "all_users"
-        
-        if cache_key in self._cache:
-            cached_data = self._cache[cache_key]
-            if not self._is_expired(cached_data['timestamp']):
-                logger.debug("All users found in cache")
-                return cached_data['data']
-            else:
-                del self._cache[cache_key]
-        
-        # Получаем данные из API
+        """Получает всех пользователей (компактные записи) из общего хранилища"""
         try:
-            response = await UserAPI.get_all_users()
-            users = []
-            
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users'] or []
-                elif 'response' in response and isinstance(response['response'], dict) and 'users' in response['response']:
-                    users = response['response']['users'] or []
-            elif isinstance(response, list):
-                users = response
-            
-            if users:
-                self._cache[cache_key] = {
-                    'data': users,
-                    'timestamp': datetime.now().timestamp()
-                }
-                logger.debug(f"Cached {len(users)} users")
-            
-            return users
+            return await user_store.get_users()
         except Exception as e:
             logger.error(f"Error fetching all users: {e}")
             return None
     
+    def on_user_changes(self, changes: list):
+        """Слушатель ленты изменений user_store: обновляет карточки на месте вместо сброса кэша"""
+        for change in changes:
+            cache_key = f"user_{change.user.uuid}"
+            if change.kind == UserChange.DELETED or change.raw is None:
+                self._cache.pop(cache_key)
+            elif cache_key in self._cache:
+                self._cache.set(cache_key, change.raw)
+    
     def invalidate_user(self, uuid: str):
         """Инвалидирует кэш конкретного пользователя"""
-        cache_key = f"user_{uuid}"
-        if cache_key in self._cache:
-            del self._cache[cache_key]
+        if self._cache.pop(f"user_{uuid}") is not None:
             logger.debug(f"Cache invalidated for user {uuid}")
     
     def invalidate_all_users(self):
         """Инвалидирует кэш всех пользователей"""
         self._cache.clear()
+        user_store.invalidate()
         logger.debug("All users cache invalidated")
     
     def cleanup_expired(self):
         """Очищает устаревшие записи из кэша"""
-        current_time = datetime.now().timestamp()
-        expired_keys = [
-            key for key, data in self._cache.items()
-            if current_time - data['timestamp'] > self._cache_ttl
-        ]
-        
-        for key in expired_keys:
-            del self._cache[key]
-        
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
+        removed = self._cache.cleanup_expired()
+        if removed:
+            logger.debug(f"Cleaned up {removed} expired cache entries")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики кэша для /cachestats"""
+        return self._cache.get_stats()
 
 # Глобальный экземпляр кэша
 user_cache = UserCache()
+user_store.subscribe(user_cache.on_user_changes)
 
 # Функция для ручной очистки кэша
 def cleanup_cache():
@@ -374,6 +344,7 @@ class KeyboardBuilder:
         """Создает главное меню пользователей"""
         rows = [
             [InlineKeyboardButton("📋 Список всех пользователей", callback_data=CallbackData.LIST_USERS)],
+            [InlineKeyboardButton("🏆 Топы и сортировки", callback_data=CallbackData.USER_VIEWS)],
             [InlineKeyboardButton("🔍 Поиск пользователя", callback_data=CallbackData.SEARCH_USER)]
         ]
         if is_admin:
@@ -381,6 +352,16 @@ class KeyboardBuilder:
         rows.append([InlineKeyboardButton("🔙 Назад в главное меню", callback_data=CallbackData.BACK_TO_MAIN)])
         return InlineKeyboardMarkup(rows)
     
+    @staticmethod
+    def create_views_menu():
+        """Создает меню сортировок списка пользователей"""
+        rows = [
+            [InlineKeyboardButton(title, callback_data=f"{CallbackData.USER_VIEW}{name}")]
+            for name, (title, _, _) in VIEWS.items()
+        ]
+        rows.append([InlineKeyboardButton("🔙 Назад", callback_data=CallbackData.BACK_TO_USERS)])
+        return InlineKeyboardMarkup(rows)
+    
     @staticmethod
     def create_back_button(callback_data: str = CallbackData.BACK_TO_USERS):
         """Создает кнопку 'Назад'"""
@@ -650,7 +631,8 @@ async def show_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     message = (
         "👥 *Управление пользователями*\n\n"
-        "🔍 *Поиск:* введите любую часть имени, Telegram ID, UUID, короткого UUID, email, тега или описания.\n\n"
+        "🔍 *Поиск:* введите любую часть имени, Telegram ID, UUID, короткого UUID, email, тега или описания.\n"
+        "🧮 *Фильтр:* `status:ACTIVE used>80% expires<7d tag:VIP online<5m`\n\n"
         "Выберите действие:"
     )
 
@@ -680,11 +662,28 @@ async def handle_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await list_users(update, context)
         return SELECTING_USER
 
+    elif data == CallbackData.USER_VIEWS:
+        await safe_edit_message(
+            query,
+            "🏆 *Топы и сортировки*\n\nВыберите, в каком порядке показать пользователей:",
+            KeyboardBuilder.create_views_menu(),
+            "Markdown"
+        )
+        return USER_MENU
+
+    elif data.startswith(CallbackData.USER_VIEW) and data[len(CallbackData.USER_VIEW):] in VIEWS:
+        view = data[len(CallbackData.USER_VIEW):]
+        UserCursor(per_page=10, title=f"*{VIEWS[view][0]}*", view=view).attach(context)
+        await send_users_page(update, context)
+        return SELECTING_USER
+
     elif data == CallbackData.SEARCH_USER:
         back_markup = KeyboardBuilder.create_back_button()
         search_prompt = (
             "🔍 Введите текст для поиска пользователя:\n\n"
-            "💡 *Пример:* имя, часть описания, email, тег, UUID или Telegram ID."
+            "💡 *Пример:* имя, часть описания, email, тег, UUID или Telegram ID.\n"
+            "🧮 *Фильтр:* `status:ACTIVE,LIMITED used>80% expires<7d tag:VIP online<5m`, "
+            "минус перед условием исключает (`-tag:VIP`)."
         )
         await safe_edit_message(
             query,
@@ -709,43 +708,52 @@ async def handle_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return USER_MENU
 
-async def search_users_by_term(term: str):
-    """Fetch users and filter by generic term"""
+async def search_users_by_term(term: str, similar_limit: int = 10):
+    """Find users by generic term through the store's search index.
+    Returns (matches most relevant first, users with a similar username); similar ones
+    fill the list up to similar_limit when there are few matches (typos in the query)."""
     try:
-        users = await user_cache.get_all_users()
-        if not users:
-            return []
+        matches = await user_store.search(term)
     except Exception as e:
         logger.error(f"Error fetching users for search: {e}")
-        return []
+        return [], []
 
-    term_lower = term.lower()
-    matches = []
-    seen = set()
+    if not matches:
+        # Users created since the last sync are only known to the panel: an identifier-shaped
+        # term is resolved there, with the applicable lookups running concurrently
+        found = await SelectionHelper.get_user_by_identifier(term)
+        if found:
+            return [found], []
 
-    for user in users:
-        if not isinstance(user, dict):
-            continue
-        user_uuid = str(user.get('uuid') or '')
-        if not user_uuid or user_uuid in seen:
-            continue
-
-        fields = [
-            str(user.get('username') or ''),
-            str(user.get('description') or ''),
-            str(user.get('email') or ''),
-            str(user.get('tag') or ''),
-            str(user.get('shortUuid') or ''),
-            user_uuid,
-            str(user.get('telegramId') or '')
-        ]
+    similar = []
+    if len(matches) < similar_limit:
+        similar = user_store.search_similar(term, {user.uuid for user in matches}, similar_limit - len(matches))
+    return matches, similar
 
-        if any(term_lower in field.lower() for field in fields if field):
-            matches.append(user)
-            seen.add(user_uuid)
 
-    matches.sort(key=lambda u: (u.get('username') or '').lower())
-    return matches
+async def show_filter_results(update: Update, context: ContextTypes.DEFAULT_TYPE, query_text: str):
+    """Answer a filter query (status:ACTIVE used>80% ...) with the paginated user list"""
+    back_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_to_users")]])
+    try:
+        user_filter = UserFilter.parse(query_text)
+    except FilterError as e:
+        await update.message.reply_text(f"❌ {e}", reply_markup=back_markup)
+        return WAITING_FOR_INPUT
+
+    users = await user_store.filter_users(user_filter)
+    description = escape_markdown(user_filter.describe())
+    if not users:
+        await update.message.reply_text(
+            f"❌ Нет пользователей по фильтру {description}.",
+            reply_markup=back_markup,
+            parse_mode="Markdown"
+        )
+        return USER_MENU
+
+    title = f"🧮 *Фильтр:* {description} — {len(users)} шт."
+    UserCursor(per_page=5, uuids=[user.uuid for user in users], title=title).attach(context)
+    await send_users_page(update, context)
+    return SELECTING_USER
 
 
 async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -754,7 +762,9 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Use SelectionHelper for user-friendly interface
+        cursor = UserCursor(per_page=8).attach(context)
         keyboard, users_data = await SelectionHelper.get_users_selection_keyboard(
+            cursor,
             callback_prefix="select_user",
             include_back=True,
             max_per_row=1
@@ -770,10 +780,7 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return USER_MENU
 
-        # Store users data for later use
-        context.user_data["users_data"] = users_data
-        
-        message = f"👥 *Список пользователей* ({len(users_data)} шт.)\n\n"
+        message = f"👥 *Список пользователей* ({cursor.total} шт.)\n\n"
         message += "Выберите пользователя для просмотра подробной информации:"
 
         await update.callback_query.edit_message_text(
@@ -795,38 +802,21 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return USER_MENU
 
-    if not users or not users.get("users"):
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_users")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.callback_query.edit_message_text(
-            "❌ Пользователи не найдены или ошибка при получении списка.",
-            reply_markup=reply_markup
-        )
-        return USER_MENU
-
-    # Create a paginated list of users
-    users_per_page = 5
-    context.user_data["users"] = users["users"]
-    context.user_data["current_page"] = 0
-    context.user_data["users_per_page"] = users_per_page
-
-    await send_users_page(update, context)
-    return SELECTING_USER
-
 async def send_users_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send a page of users"""
-    users = context.user_data["users"]
-    current_page = context.user_data["current_page"]
-    users_per_page = context.user_data["users_per_page"]
-
-    start_idx = current_page * users_per_page
-    end_idx = min(start_idx + users_per_page, len(users))
+    """Send the current page of the chat's user list (see UserCursor)"""
+    cursor = UserCursor.of(context)
+    if cursor is None:
+        if update.callback_query:
+            await show_users_menu(update, context)
+        return
+    users = await cursor.fetch()
+    start_idx = cursor.start
 
-    message = f"👥 *Пользователи* (Страница {current_page + 1}/{(len(users) + users_per_page - 1) // users_per_page}):\n\n"
+    message = f"👥 *Пользователи* (Страница {cursor.page + 1}/{cursor.pages}):\n\n"
+    if cursor.title:
+        message = f"{cursor.title}\n{message}"
 
-    for i in range(start_idx, end_idx):
-        user = users[i]
+    for i, user in enumerate(users, start_idx):
         status_emoji = "✅" if user["status"] == "ACTIVE" else "❌"
         
         # Format expiration date
@@ -837,7 +827,7 @@ async def send_users_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
             expire_text = f"{user['expireAt'][:10]} ({days_left} дней)"
         except Exception:
             expire_status = "📅"
-            expire_text = user['expireAt'][:10]
+            expire_text = (user['expireAt'] or "Не указано")[:10]
         
         message += f"{i+1}. {status_emoji} *{escape_markdown(user['username'])}*\n"
         message += f"   🔑 ID: `{user['shortUuid']}`\n"
@@ -848,18 +838,17 @@ async def send_users_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = []
     nav_row = []
 
-    if current_page > 0:
+    if cursor.has_prev:
         nav_row.append(InlineKeyboardButton("◀️ Назад", callback_data="prev_page"))
 
-    if end_idx < len(users):
+    if cursor.has_next:
         nav_row.append(InlineKeyboardButton("Вперед ▶️", callback_data="next_page"))
 
     if nav_row:
         keyboard.append(nav_row)
 
     # Add action buttons for each user
-    for i in range(start_idx, end_idx):
-        user = users[i]
+    for user in users:
         user_row = [
             InlineKeyboardButton(f"👤 {user['username']}", callback_data=f"view_{user['uuid']}")
         ]
@@ -910,16 +899,18 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
     elif data.startswith("users_page_"):
         page = int(data.split("_")[2])
         try:
+            cursor = UserCursor.of(context)
+            if cursor is None or cursor.uuids is not None or cursor.view is not None:
+                cursor = UserCursor(per_page=8).attach(context)
+            cursor.move(page)
             keyboard, users_data = await SelectionHelper.get_users_selection_keyboard(
+                cursor,
                 callback_prefix="select_user",
                 include_back=True,
-                max_per_row=1,
-                page=page
+                max_per_row=1
             )
             
-            context.user_data["users_data"] = users_data
-            
-            message = f"👥 *Список пользователей* ({len(users_data)} шт.) - страница {page + 1}\n\n"
+            message = f"👥 *Список пользователей* ({cursor.total} шт.) - страница {cursor.page + 1}\n\n"
             message += "Выберите пользователя для просмотра подробной информации:"
 
             await query.edit_message_text(
@@ -938,11 +929,15 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
 
     # Legacy support for old callback patterns
     elif data == "prev_page":
-        context.user_data["current_page"] -= 1
+        cursor = UserCursor.of(context)
+        if cursor:
+            cursor.move(cursor.page - 1)
         await send_users_page(update, context)
 
     elif data == "next_page":
-        context.user_data["current_page"] += 1
+        cursor = UserCursor.of(context)
+        if cursor:
+            cursor.move(cursor.page + 1)
         await send_users_page(update, context)
 
     elif data == "back_to_users":
@@ -1331,7 +1326,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return WAITING_FOR_INPUT
 
-        matches = await search_users_by_term(term)
+        if is_filter_query(term):
+            return await show_filter_results(update, context, term)
+
+        exact, similar = await search_users_by_term(term)
+        matches = exact + similar
 
         if not matches:
             back_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_to_users")]])
@@ -1348,8 +1347,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
             return USER_MENU
 
-        if len(matches) == 1:
-            user = matches[0]
+        if len(matches) == 1 or len(exact) == 1:
+            # Единственное точное совпадение открываем сразу, похожие имена не мешают
+            found = exact[0] if exact else matches[0]
+            # Карточке нужны полные данные, в снимке только компактная запись
+            user = await user_cache.get_user(found.uuid) or found.to_dict()
             try:
                 message = format_user_details_safe(user)
 
@@ -1403,15 +1405,17 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         max_results = 10
         keyboard = []
-        message_lines = [
-            f"🔍 Найдено {len(matches)} пользователей по запросу `{escape_markdown(term)}`:",
-            ""
-        ]
+        if exact:
+            header = f"🔍 Найдено {len(exact)} пользователей по запросу `{escape_markdown(term)}`:"
+        else:
+            header = f"🔍 Точных совпадений по запросу `{escape_markdown(term)}` нет, похожие имена:"
+        message_lines = [header, ""]
 
         for index, user in enumerate(matches[:max_results], 1):
             username = user.get('username') or 'Без имени'
             status = user.get('status') or 'UNKNOWN'
-            message_lines.append(f"{index}. {escape_markdown(username)} — {escape_markdown(str(status))}")
+            mark = "≈ " if index > len(exact) else ""
+            message_lines.append(f"{index}. {mark}{escape_markdown(username)} — {escape_markdown(str(status))}")
             user_uuid = user.get('uuid')
             if user_uuid:
                 keyboard.append([InlineKeyboardButton(f"👤 {username}", callback_data=f"view_{user_uuid}")])
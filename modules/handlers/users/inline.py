@@ -0,0 +1,171 @@
+"""
+Inline mode: `@bot <query>` in any chat lists matching users while the admin types.
+
+Answers come from the user store's search index only (no panel requests):
+- each keystroke is a separate inline query, so a query is answered only if no
+  newer one from the same user arrived within INLINE_DEBOUNCE_MS;
+- broad queries stop after INLINE_SEARCH_LIMIT matches, and results of a query
+  that was not cut are reused for its extensions ("vas" -> "vasy") by
+  filtering them instead of searching again;
+- results are ranked exact id, prefix, substring; when there are fewer than
+  INLINE_RESULTS_LIMIT, users with a similar username (typos) fill the list;
+- answers slower than INLINE_SEARCH_BUDGET_MS are logged and counted.
+
+Only users with a role in USER_ROLES get results; both roles may read users,
+and the sent card is a read-only summary without action buttons.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from telegram import InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent, Update
+from telegram.ext import ContextTypes
+
+from modules.api.search_index import rank, user_matches
+from modules.api.user_record import UserRecord
+from modules.api.user_store import user_store
+from modules.config import INLINE_DEBOUNCE_MS, INLINE_RESULTS_LIMIT, INLINE_SEARCH_BUDGET_MS
+from modules.handlers.users.handlers import UserUtils
+from modules.utils.auth import get_user_role
+from modules.utils.formatters import format_bytes
+from modules.utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 2
+# Matches collected per query before ranking; more than a screen of results, far less than a scan
+INLINE_SEARCH_LIMIT = 200
+# Seconds Telegram may reuse an answer for the same user and query
+ANSWER_CACHE_TIME = 5
+
+
+def _result(user: UserRecord) -> InlineQueryResultArticle:
+    if user.traffic_limit_bytes:
+        traffic = f"{format_bytes(user.used_traffic_bytes)} / {format_bytes(user.traffic_limit_bytes)}"
+    else:
+        traffic = f"{format_bytes(user.used_traffic_bytes)} / ∞"
+    expire = user.get('expireAt') or ''
+    return InlineQueryResultArticle(
+        id=user.uuid,
+        title=user.username or user.uuid,
+        description=f"{UserUtils.format_user_status(user.status)} · {traffic} · {expire[:10]}",
+        input_message_content=InputTextMessageContent(UserUtils.get_user_summary(user), parse_mode="Markdown"),
+    )
+
+
+class InlineUserSearch:
+    """Debounce, prefix result cache and counters of inline user search"""
+
+    def __init__(self):
+        self._latest: Dict[int, str] = {}
+        # lowercased query -> (matches, complete); dropped on every change of the snapshot
+        self._results = LRUCache(max_entries=256, ttl=60)
+        self._queries = 0
+        self._superseded = 0
+        self._prefix_hits = 0
+        self._over_budget = 0
+        self._slowest = 0.0
+        user_store.subscribe(lambda changes: self._results.clear())
+
+    async def debounce(self, user_id: int, query_id: str) -> bool:
+        """Wait out the debounce pause; False if a newer query from the same user arrived meanwhile"""
+        self._latest[user_id] = query_id
+        if INLINE_DEBOUNCE_MS > 0:
+            await asyncio.sleep(INLINE_DEBOUNCE_MS / 1000)
+        if self._latest.get(user_id) != query_id:
+            self._superseded += 1
+            return False
+        del self._latest[user_id]
+        return True
+
+    async def find(self, term: str) -> List[UserRecord]:
+        """Matching users, at most INLINE_SEARCH_LIMIT, reusing a cached shorter prefix when possible"""
+        key = term.lower()
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached[0]
+        for length in range(len(key) - 1, MIN_QUERY_LENGTH - 1, -1):
+            if key[:length] not in self._results:
+                continue
+            base = self._results.get(key[:length])
+            if base[1]:
+                matches = [user for user in base[0] if user_matches(user, key)]
+                self._prefix_hits += 1
+                self._results.set(key, (matches, True))
+                return matches
+        # The original case finds an exact username (usernames are case-sensitive)
+        matches = await user_store.search(term, INLINE_SEARCH_LIMIT)
+        self._results.set(key, (matches, len(matches) < INLINE_SEARCH_LIMIT))
+        return matches
+
+    def record(self, seconds: float, term: str):
+        self._queries += 1
+        self._slowest = max(self._slowest, seconds)
+        if seconds * 1000 > INLINE_SEARCH_BUDGET_MS:
+            self._over_budget += 1
+            logger.warning(f"Инлайн-поиск '{term}' занял {seconds * 1000:.0f} мс (бюджет {INLINE_SEARCH_BUDGET_MS} мс)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queries': self._queries,
+            'superseded': self._superseded,
+            'prefix_hits': self._prefix_hits,
+            'over_budget': self._over_budget,
+            'slowest_ms': self._slowest * 1000,
+            'cache': self._results.get_stats(),
+        }
+
+
+# Глобальный экземпляр
+inline_search = InlineUserSearch()
+
+
+def _index_ready() -> Optional[str]:
+    """None when the search index can answer right away, otherwise the reason it cannot.
+    A missing snapshot or index is prepared in the background instead of inside the answer."""
+    snapshot = user_store.snapshot
+    if snapshot is None:
+        user_store.refresh_in_background()
+        return "⏳ Список пользователей загружается"
+    if snapshot.search_stats() is None:
+        # Built in a worker thread and published when done; answers go on meanwhile
+        snapshot.prepare_search_index()
+        return "⏳ Поисковый индекс готовится"
+    return None
+
+
+async def inline_user_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer `@bot <query>` with the best matching users from the search index"""
+    query = update.inline_query
+    user = query.from_user
+    if get_user_role(user.id) is None:
+        logger.warning("Inline query from user %s without a role", user.id)
+        await query.answer([], cache_time=ANSWER_CACHE_TIME, is_personal=True)
+        return
+
+    term = query.query.strip()
+    if len(term) < MIN_QUERY_LENGTH:
+        await query.answer([], cache_time=ANSWER_CACHE_TIME, is_personal=True)
+        return
+    if not await inline_search.debounce(user.id, query.id):
+        # Superseded queries stay unanswered: the client already shows the newer one
+        return
+
+    started = time.perf_counter()
+    not_ready = _index_ready()
+    if not_ready:
+        button = InlineQueryResultsButton(text=f"{not_ready}, повторите через пару секунд", start_parameter="search")
+        await query.answer([], cache_time=0, is_personal=True, button=button)
+        return
+
+    best = rank(await inline_search.find(term), term)[:INLINE_RESULTS_LIMIT]
+    if len(best) < INLINE_RESULTS_LIMIT:
+        best += user_store.search_similar(term, {found.uuid for found in best}, INLINE_RESULTS_LIMIT - len(best))
+    results = [_result(found) for found in best]
+    inline_search.record(time.perf_counter() - started, term)
+
+    try:
+        await query.answer(results, cache_time=ANSWER_CACHE_TIME, is_personal=True)
+    except Exception as e:
+        logger.error(f"Failed to answer inline query: {e}")
@@ -0,0 +1,113 @@
+"""
+Bounded LRU cache with TTL and approximate memory accounting
+"""
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate deep size in bytes of JSON-like data (dicts, lists, strings, numbers)"""
+    size = sys.getsizeof(value)
+    if _depth > 8:
+        return size
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key, _depth + 1) + estimate_size(item, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+    return size
+
+
+class LRUCache:
+    """LRU cache bounded by entry count and estimated bytes, with a per-entry TTL.
+    get/set/evict are O(1) (plus the size estimate of the stored value on set)."""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 0, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 = no byte limit
+        self.ttl = ttl
+        # key -> (expires_at, size, value); most recently used entries are at the end
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a live value and mark it most recently used, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            self._expirations += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting least recently used entries past the limits"""
+        if key in self._entries:
+            self._drop(key)
+        size = estimate_size(value)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove an entry and return its value"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._drop(key)
+        return entry[2]
+
+    def _drop(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def cleanup_expired(self) -> int:
+        """Remove all expired entries; returns how many were removed"""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._drop(key)
+        self._expirations += len(expired)
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
@@ -2,70 +2,85 @@
 Helper functions for user-friendly selection of entities (users, inbounds, nodes)
 instead of working with UUIDs directly
 """
+import asyncio
 import logging
+import re
 from typing import List, Dict, Optional, Tuple
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from modules.api.users import UserAPI
+from modules.api.user_store import user_store
 from modules.api.inbounds import InboundAPI
 from modules.api.nodes import NodeAPI
 from modules.utils.formatters import escape_markdown
+from modules.utils.user_cursor import UserCursor
 
 logger = logging.getLogger(__name__)
 
+# Shapes of user identifiers, as the panel validates them
+_UUID = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+_USERNAME = re.compile(r"^[a-zA-Z0-9_-]{6,34}$")
+_SHORT_UUID = re.compile(r"^[a-zA-Z0-9_-]{8,64}$")
+_EMAIL = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+_TAG = re.compile(r"^[A-Z0-9_]{1,16}$")
+
+# kind -> (snapshot index, snapshot key normalization, store lookup that falls back to the panel)
+_USER_LOOKUPS = {
+    'uuid': ('by_uuid', str.lower, user_store.get_by_uuid),
+    'username': ('by_username', str, user_store.get_by_username),
+    'short_uuid': ('by_short_uuid', str, user_store.get_by_short_uuid),
+    'telegram_id': ('by_telegram_id', str, user_store.find_by_telegram_id),
+    'email': ('by_email', str.lower, user_store.find_by_email),
+    'tag': ('by_tag', str, user_store.find_by_tag),
+}
+
 class SelectionHelper:
     """Helper class for entity selection with user-friendly interface"""
     
     @staticmethod
     async def get_users_selection_keyboard(
-        page: int = 0, 
-        per_page: int = 8,
+        cursor: Optional[UserCursor] = None,
         callback_prefix: str = "select_user",
         include_back: bool = True,
         max_per_row: int = 1
     ) -> Tuple[InlineKeyboardMarkup, Dict]:
         """
-        Create keyboard for user selection with pagination
+        Create keyboard for user selection with pagination.
+        Only the cursor's current page is read (8 users per page by default);
+        cursor.total holds the number of users afterwards
         Returns: (keyboard, users_data)
         """
+        cursor = cursor or UserCursor(per_page=8)
         try:
-            response = await UserAPI.get_all_users()
-            if not response or not response.get("users"):
+            users = await cursor.fetch()
+            if not users:
                 keyboard = []
                 if include_back:
                     keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back")])
                 return InlineKeyboardMarkup(keyboard), {}
             
-            users = response["users"]
-            total_users = len(users)
-            total_pages = (total_users + per_page - 1) // per_page
-            
-            start_idx = page * per_page
-            end_idx = min(start_idx + per_page, total_users)
-            
+            page = cursor.page
             keyboard = []
             users_data = {}
             
             # Add user buttons
-            for i in range(start_idx, end_idx):
-                user = users[i]
-                status_emoji = "✅" if user["status"] == "ACTIVE" else "❌"
-                display_name = f"{status_emoji} {user['username']}"
+            for user in users:
+                status_emoji = "✅" if user.status == "ACTIVE" else "❌"
+                display_name = f"{status_emoji} {user.username}"
                 
-                callback_data = f"{callback_prefix}_{user['uuid']}"
-                users_data[user['uuid']] = user
+                callback_data = f"{callback_prefix}_{user.uuid}"
+                users_data[user.uuid] = user
                 
                 keyboard.append([InlineKeyboardButton(display_name, callback_data=callback_data)])
             
             # Add pagination if needed
-            if total_pages > 1:
+            if cursor.pages > 1:
                 pagination_row = []
-                if page > 0:
+                if cursor.has_prev:
                     pagination_row.append(InlineKeyboardButton("⬅️", callback_data=f"users_page_{page-1}"))
                 
-                pagination_row.append(InlineKeyboardButton(f"{page+1}/{total_pages}", callback_data="page_info"))
+                pagination_row.append(InlineKeyboardButton(f"{page+1}/{cursor.pages}", callback_data="page_info"))
                 
-                if page < total_pages - 1:
+                if cursor.has_next:
                     pagination_row.append(InlineKeyboardButton("➡️", callback_data=f"users_page_{page+1}"))
                 
                 keyboard.append(pagination_row)
@@ -172,16 +187,16 @@ class SelectionHelper:
         """
         try:
             if search_type == "username":
-                response = await UserAPI.get_user_by_username(query)
+                response = await user_store.get_by_username(query)
                 return [response] if response else []
             elif search_type == "telegram_id":
-                response = await UserAPI.get_user_by_telegram_id(query)
+                response = await user_store.find_by_telegram_id(query)
                 return response if isinstance(response, list) else [response] if response else []
             elif search_type == "email":
-                response = await UserAPI.get_user_by_email(query)
+                response = await user_store.find_by_email(query)
                 return response if isinstance(response, list) else [response] if response else []
             elif search_type == "tag":
-                response = await UserAPI.get_user_by_tag(query)
+                response = await user_store.find_by_tag(query)
                 return response if isinstance(response, list) else [response] if response else []
             else:
                 return []
@@ -256,42 +271,83 @@ class SelectionHelper:
                 InlineKeyboardButton("🔙 Назад к списку", callback_data="back_to_nodes")
             ]
         ]
-        return InlineKeyboardMarkup(keyboard)    @staticmethod
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def classify_identifier(identifier: str) -> List[str]:
+        """
+        Kinds of user identifier the string may be (uuid, username, short_uuid,
+        telegram_id, email, tag), most specific first, judged by their shape
+        """
+        if _EMAIL.match(identifier):
+            return ['email']
+        kinds = []
+        if _UUID.match(identifier):
+            kinds.append('uuid')
+        if _USERNAME.match(identifier):
+            kinds.append('username')
+        if _SHORT_UUID.match(identifier):
+            kinds.append('short_uuid')
+        if identifier.isdigit():
+            kinds.append('telegram_id')
+        if _TAG.match(identifier):
+            kinds.append('tag')
+        return kinds
+
+    @staticmethod
     async def get_user_by_identifier(identifier: str) -> Optional[Dict]:
         """
-        Smart user lookup - try to find user by username, UUID, or telegram ID
+        Smart user lookup by UUID, username, short UUID, telegram ID, email or tag.
+        The snapshot indexes are tried first; on a miss the applicable panel
+        lookups run concurrently and the first unique-key hit wins
         """
-        try:
-            # Try by username first
-            try:
-                user = await UserAPI.get_user_by_username(identifier)
-                if user:
-                    return user
-            except Exception:
-                pass
-            
-            # Try by UUID if it looks like UUID
-            if len(identifier) == 36 and identifier.count('-') == 4:
-                try:
-                    user = await UserAPI.get_user_by_uuid(identifier)
-                    if user:
-                        return user
-                except Exception:
-                    pass
-            
-            # Try by telegram ID if it's numeric
-            if identifier.isdigit():
-                try:
-                    users = await UserAPI.get_user_by_telegram_id(identifier)
-                    if users and len(users) > 0:
-                        return users[0]
-                except Exception:
-                    pass
-            
+        identifier = identifier.strip()
+        kinds = SelectionHelper.classify_identifier(identifier)
+        if not kinds:
             return None
+
+        try:
+            # No waiting for a first full download: without a snapshot the panel is asked directly
+            if user_store.snapshot is not None:
+                await user_store.get_snapshot()
+            for kind in kinds:
+                index, normalize, _ = _USER_LOOKUPS[kind]
+                found = user_store.peek(index, normalize(identifier))
+                if found:
+                    return found[0] if isinstance(found, list) else found
         except Exception as e:
-            logger.error(f"Error in smart user lookup: {e}")
+            logger.error(f"Error in local user lookup: {e}")
+
+        async def fetch(kind: str):
+            lookup = _USER_LOOKUPS[kind][2]
+            try:
+                return await lookup(identifier)
+            except Exception as e:
+                logger.debug(f"User lookup by {kind} failed: {e}")
+                return None
+
+        tasks = {asyncio.ensure_future(fetch(kind)): kind for kind in kinds}
+        shared = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    found = task.result()
+                    if not found:
+                        continue
+                    if isinstance(found, list):
+                        # Telegram ID, email and tag may be shared: used only if no unique key matches
+                        shared[tasks[task]] = found[0]
+                    else:
+                        return found
+            for kind in kinds:
+                if kind in shared:
+                    return shared[kind]
             return None
+        finally:
+            for task in tasks:
+                task.cancel()
 
     @staticmethod
     async def get_inbound_by_identifier(identifier: str) -> Optional[Dict]:
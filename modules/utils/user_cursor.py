@@ -0,0 +1,83 @@
+"""
+Per-chat cursor over a paginated user list.
+
+The cursor lives in context.chat_data instead of a copy of the user list:
+- without uuids it pages through all users via UserStore.get_page (the
+  snapshot, or /users?start=&size= while no snapshot is loaded);
+- with uuids (filter results) it pages through those, resolving only the
+  users of the shown page from the snapshot;
+- with a view (see modules/api/user_sort.py) it pages through the view's
+  precomputed sort order.
+Turning a page costs O(page size) either way.
+"""
+from typing import Any, List, Optional
+
+from modules.api.user_record import UserRecord
+from modules.api.user_sort import user_sorter
+from modules.api.user_store import user_store
+
+CHAT_DATA_KEY = "users_cursor"
+
+
+class UserCursor:
+    """Page position, page size and source of a user list shown in one chat"""
+
+    def __init__(self, per_page: int, uuids: Optional[List[str]] = None, title: Optional[str] = None,
+                 view: Optional[str] = None):
+        self.per_page = per_page
+        self.page = 0
+        self.uuids = uuids
+        self.view = view
+        self.title = title
+        self.total = len(uuids) if uuids is not None else 0
+
+    @property
+    def start(self) -> int:
+        return self.page * self.per_page
+
+    @property
+    def pages(self) -> int:
+        return max(1, (self.total + self.per_page - 1) // self.per_page)
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 0
+
+    @property
+    def has_next(self) -> bool:
+        return self.start + self.per_page < self.total
+
+    def move(self, page: int):
+        """Go to a page; the number is clamped to the known pages on fetch"""
+        self.page = max(0, page)
+
+    async def fetch(self) -> List[UserRecord]:
+        """Users of the current page; also refreshes the total"""
+        users = await self._fetch()
+        if not users and self.page > 0 and self.start >= self.total:
+            # The list shrank since the page buttons were drawn
+            self.page = self.pages - 1
+            users = await self._fetch()
+        return users
+
+    async def _fetch(self) -> List[UserRecord]:
+        if self.view is not None:
+            users, self.total = await user_sorter.get_page(self.view, self.start, self.per_page)
+            return users
+        if self.uuids is None:
+            users, self.total = await user_store.get_page(self.start, self.per_page)
+            return users
+        self.total = len(self.uuids)
+        # Users deleted since the list was built are skipped
+        found = (user_store.peek_by_uuid(uuid) for uuid in self.uuids[self.start:self.start + self.per_page])
+        return [user for user in found if user is not None]
+
+    @staticmethod
+    def of(context: Any) -> Optional['UserCursor']:
+        """Cursor of the chat, if a user list was opened there"""
+        return context.chat_data.get(CHAT_DATA_KEY)
+
+    def attach(self, context: Any) -> 'UserCursor':
+        """Make this the chat's cursor, replacing the previous list"""
+        context.chat_data[CHAT_DATA_KEY] = self
+        return self
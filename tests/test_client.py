@@ -0,0 +1,97 @@
+"""
+Regression tests for GET coalescing in RemnaAPI: the shared request outlives a
+cancelled caller but not the last one, every caller gets its own response, and
+nobody joins a request that started before a mutation.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from modules.api.client import RemnaAPI
+
+
+class CoalescedCancelTest(unittest.IsolatedAsyncioTestCase):
+    """Cancelling callers of a GET that is shared through the single-flight registry"""
+
+    async def asyncSetUp(self):
+        self.started = asyncio.Event()
+        self.cancelled = asyncio.Event()
+        self.patch = mock.patch.object(RemnaAPI, '_make_request', self._request)
+        self.patch.start()
+
+    async def asyncTearDown(self):
+        self.patch.stop()
+
+    async def _request(self, method, endpoint, params=None):
+        self.started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return {'endpoint': endpoint}
+
+    async def test_request_survives_one_cancelled_caller(self):
+        first = asyncio.ensure_future(RemnaAPI.get('users/by-username/cancel_one'))
+        second = asyncio.ensure_future(RemnaAPI.get('users/by-username/cancel_one'))
+        await self.started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(self.cancelled.is_set())
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+
+    async def test_request_is_cancelled_with_its_last_caller(self):
+        caller = asyncio.ensure_future(RemnaAPI.get('users/by-username/cancel_all'))
+        await self.started.wait()
+        caller.cancel()
+        await asyncio.wait_for(self.cancelled.wait(), 1)
+        self.assertNotIn(RemnaAPI._request_key('users/by-username/cancel_all', None), RemnaAPI._inflight)
+
+
+class CoalescedResultTest(unittest.IsolatedAsyncioTestCase):
+    """Callers that joined an in-flight GET"""
+
+    async def test_each_caller_gets_its_own_response(self):
+        async def request(method, endpoint, params=None):
+            await asyncio.sleep(0.01)
+            return {'users': [{'username': 'first'}]}
+
+        with mock.patch.object(RemnaAPI, '_make_request', request):
+            first, second = await asyncio.gather(
+                RemnaAPI.get('users/by-username/shared'), RemnaAPI.get('users/by-username/shared'))
+        second['users'][0]['username'] = 'changed'
+        self.assertEqual(first['users'][0]['username'], 'first')
+
+
+class MutationDuringFlightTest(unittest.IsolatedAsyncioTestCase):
+    """A GET issued after a mutation must not join a GET that started before it"""
+
+    async def test_get_after_mutation_makes_a_fresh_request(self):
+        requests = []
+        started = asyncio.Event()
+
+        async def request(method, endpoint, params=None, data=None):
+            requests.append((method, endpoint))
+            number = len(requests)
+            if method == 'GET':
+                started.set()
+                await asyncio.sleep(0.01)
+            return {'request': number}
+
+        with mock.patch.object(RemnaAPI, '_make_request', request):
+            before = asyncio.ensure_future(RemnaAPI.get('users/by-username/mutated'))
+            await started.wait()
+            await RemnaAPI.patch('users', {'uuid': 'mutated'})
+            after = asyncio.ensure_future(RemnaAPI.get('users/by-username/mutated'))
+            first, second = await asyncio.gather(before, after)
+
+        self.assertEqual([method for method, _ in requests], ['GET', 'PATCH', 'GET'])
+        self.assertNotEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
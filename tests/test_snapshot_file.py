@@ -0,0 +1,54 @@
+"""
+Regression tests for the on-disk snapshot: cached node and host lists expire
+long before the refresh job saves the snapshot, and must be saved anyway.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from modules.api.client import RemnaAPI
+from modules.api.snapshot_file import SnapshotFile
+from modules.api.user_record import UserRecord
+from modules.api.user_store import user_store
+
+
+class ExpiredResponsesTest(unittest.IsolatedAsyncioTestCase):
+    """Saving after the TTL of the persisted lists has run out"""
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = SnapshotFile(os.path.join(self.directory.name, "snapshot.sqlite"))
+        RemnaAPI._cache.clear()
+        user_store._snapshot = None
+        user_store.restore([UserRecord('00000000-0000-4000-8000-000000000001', 'user_000001', 'ACTIVE')],
+                           1, True, time.time())
+
+    async def asyncTearDown(self):
+        user_store._snapshot = None
+        RemnaAPI._cache.clear()
+        self.directory.cleanup()
+
+    async def test_expired_lists_are_saved_and_restored(self):
+        nodes = [{'uuid': 'node', 'name': 'DE-01'}]
+        self.assertTrue(RemnaAPI.seed_cache('nodes', nodes))
+        later = time.monotonic() + 3600
+        with mock.patch('modules.api.cache.time.monotonic', return_value=later):
+            self.assertFalse(RemnaAPI._cache.get(RemnaAPI._request_key('nodes', None))[0])
+            self.assertTrue(await self.file.save())
+
+        RemnaAPI._cache.clear()
+        user_store._snapshot = None
+        with mock.patch.object(RemnaAPI, 'revalidate', mock.AsyncMock()):
+            self.assertTrue(await self.file.load())
+        hit, value = RemnaAPI._cache.get(RemnaAPI._request_key('nodes', None))
+        self.assertTrue(hit)
+        self.assertEqual(value, nodes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Regression tests for the sort views: a view built while a chunked sync is
+updating the records in place must not list a user twice once the sync's
+changes are published.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from modules.api.user_sort import UserSorter
+from modules.api.user_store import UserStore
+from modules.api.users import UserAPI
+from tests.test_user_store import _user
+
+
+class ViewBuiltDuringSyncTest(unittest.IsolatedAsyncioTestCase):
+    """A sort view read between the chunks of a background diff"""
+
+    async def test_no_duplicate_rows(self):
+        panel = [_user(index, usedTrafficBytes=index) for index in range(1, 11)]
+        store = UserStore(ttl=300)
+        sorter = UserSorter(store)
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': panel, 'total': len(panel), 'complete': True})):
+            await store.refresh()
+        first = store.snapshot.users[0]
+
+        fresh = [_user(index, usedTrafficBytes=1000 - index) for index in range(1, 11)]
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': fresh, 'total': len(fresh), 'complete': True})), \
+                mock.patch('modules.api.user_store._APPLY_CHUNK', 2):
+            refresh = asyncio.ensure_future(store.refresh())
+            while first.used_traffic_bytes == 1 and not refresh.done():
+                await asyncio.sleep(0)
+            self.assertFalse(refresh.done())
+            await sorter.get_page('traffic', 0, 20)
+            await refresh
+
+        users, total = await sorter.get_page('traffic', 0, 20)
+        self.assertEqual(total, 10)
+        self.assertEqual([user.username for user in users], [f'user_{index:06d}' for index in range(1, 11)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Regression tests for the user store: write-through mutations that land while a
+background refresh is downloading must survive the refresh, and a search cut at
+a limit must not drop its best matches.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from modules.api.user_columns import UserColumns
+from modules.api.user_store import UserChange, UserStore
+from modules.api.users import UserAPI
+
+
+def _user(index: int, **fields):
+    user = {
+        'uuid': f'00000000-0000-4000-8000-{index:012d}', 'shortUuid': f'short{index:011d}',
+        'username': f'user_{index:06d}', 'status': 'ACTIVE', 'usedTrafficBytes': 0,
+        'trafficLimitBytes': 0, 'updatedAt': '2026-01-01T00:00:00.000Z',
+    }
+    user.update(fields)
+    return user
+
+
+class InFlightRefreshTest(unittest.IsolatedAsyncioTestCase):
+    """Mutations applied between the start of a refresh download and its apply()"""
+
+    async def asyncSetUp(self):
+        self.panel = [_user(1), _user(2), _user(3)]
+        self.release = None
+        self.store = UserStore(ttl=300)
+        self.changes = []
+        self.store.subscribe(self.changes.extend)
+        with mock.patch.object(UserAPI, 'get_all_users', self._download):
+            await self.store.refresh()
+
+    async def _download(self):
+        # The payload is taken when the download starts; the test mutates in between
+        payload = {'users': [dict(user) for user in self.panel], 'total': len(self.panel), 'complete': True}
+        if self.release is not None:
+            self.started.set()
+            await self.release.wait()
+        return payload
+
+    async def _refresh_around(self, mutate):
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+        with mock.patch.object(UserAPI, 'get_all_users', self._download):
+            refresh = asyncio.ensure_future(self.store.refresh())
+            await self.started.wait()
+            self.assertTrue(self.store.refreshing)
+            mutate()
+            self.changes.clear()
+            self.release.set()
+            return await refresh
+
+    async def test_created_during_refresh_is_kept(self):
+        created = _user(4)
+        snapshot = await self._refresh_around(
+            lambda: self.store.apply_mutation(UserAPI.MUTATION_CREATED, None, created))
+        self.assertIn(created['uuid'], snapshot.by_uuid)
+        self.assertEqual(len(snapshot.users), 4)
+        self.assertEqual(snapshot.total, 4)
+        self.assertEqual(self.changes, [])
+
+    async def test_updated_during_refresh_is_not_rolled_back(self):
+        updated = _user(2, status='DISABLED', updatedAt='2026-02-01T00:00:00.000Z')
+        snapshot = await self._refresh_around(
+            lambda: self.store.apply_mutation(UserAPI.MUTATION_UPDATED, updated['uuid'], updated))
+        self.assertEqual(snapshot.by_uuid[updated['uuid']].status, 'DISABLED')
+        self.assertEqual(self.changes, [])
+
+    async def test_deleted_during_refresh_stays_deleted(self):
+        deleted = self.panel[0]['uuid']
+        snapshot = await self._refresh_around(
+            lambda: self.store.apply_mutation(UserAPI.MUTATION_DELETED, deleted, None))
+        self.assertNotIn(deleted, snapshot.by_uuid)
+        self.assertEqual(len(snapshot.users), 2)
+        self.assertEqual(snapshot.total, 2)
+        self.assertFalse(any(change.kind == UserChange.CREATED for change in self.changes))
+
+    async def test_untouched_users_still_sync(self):
+        # The panel changed user 3 before the download started
+        self.panel[2] = _user(3, status='LIMITED', updatedAt='2026-02-01T00:00:00.000Z')
+        snapshot = await self._refresh_around(
+            lambda: self.store.apply_mutation(UserAPI.MUTATION_CREATED, None, _user(4)))
+        self.assertEqual(snapshot.by_uuid[self.panel[2]['uuid']].status, 'LIMITED')
+        self.assertEqual(len(snapshot.users), 4)
+
+
+class ChunkedApplyTest(unittest.IsolatedAsyncioTestCase):
+    """Write-throughs that land between the chunks of a background diff"""
+
+    async def test_mutations_between_chunks_are_kept(self):
+        panel = [_user(index) for index in range(1, 7)]
+        store = UserStore(ttl=300)
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': panel, 'total': len(panel), 'complete': True})):
+            await store.refresh()
+        snapshot = store.snapshot
+        fresh = [_user(index, usedTrafficBytes=100) for index in range(1, 7)]
+        written = set()
+        store._written = written
+
+        async def mutate():
+            await asyncio.sleep(0)
+            store.apply_mutation(UserAPI.MUTATION_DELETED, panel[0]['uuid'], None)
+            store.apply_mutation(UserAPI.MUTATION_CREATED, None, _user(7))
+            store.apply_mutation(UserAPI.MUTATION_UPDATED, panel[5]['uuid'], _user(6, status='DISABLED'))
+
+        with mock.patch('modules.api.user_store._APPLY_CHUNK', 2):
+            _, changes = await asyncio.gather(mutate(), snapshot.apply_async(fresh, 6, True, written))
+
+        self.assertNotIn(panel[0]['uuid'], snapshot.by_uuid)
+        self.assertEqual([user.username for user in snapshot.users][-1], 'user_000007')
+        self.assertEqual(len(snapshot.users), 6)
+        self.assertEqual(snapshot.total, 6)
+        self.assertEqual(snapshot.by_uuid[panel[5]['uuid']].status, 'DISABLED')
+        self.assertEqual(snapshot.by_uuid[panel[1]['uuid']].used_traffic_bytes, 100)
+        self.assertFalse(any(change.kind == UserChange.DELETED for change in changes))
+
+
+class ColumnsPatchTest(unittest.IsolatedAsyncioTestCase):
+    """Aggregate columns patched by syncs and write-throughs match columns built from scratch"""
+
+    @staticmethod
+    def _aggregates(columns):
+        return (len(columns), columns.status_histogram(), columns.total_traffic(),
+                columns.count_expiring(30, now=0), columns.count_online(60, now=0),
+                columns.count_over_limit(50), columns.count_over_limit(50, status='ACTIVE'))
+
+    async def test_patched_columns_match_a_rebuild(self):
+        panel = [_user(index, usedTrafficBytes=index * 10, trafficLimitBytes=1000 * (index % 3),
+                       onlineAt='1970-01-01T00:30:00.000Z' if index % 2 else None,
+                       expireAt=f'1970-01-{index % 28 + 1:02d}T00:00:00.000Z') for index in range(1, 31)]
+        store = UserStore(ttl=300)
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': panel, 'total': len(panel), 'complete': True})):
+            await store.refresh()
+        snapshot = store.snapshot
+        columns = snapshot.columns
+
+        fresh = [dict(user) for user in panel[1:]]
+        fresh[0].update(usedTrafficBytes=900, status='LIMITED')
+        fresh[1].update(onlineAt=None, expireAt=None, trafficLimitBytes=0)
+        fresh[2].update(usedTrafficBytes=1)
+        fresh.append(_user(31, usedTrafficBytes=5, trafficLimitBytes=10, onlineAt='1970-01-01T00:10:00.000Z'))
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': fresh, 'total': len(fresh), 'complete': True})):
+            await store.refresh()
+        store.apply_mutation(UserAPI.MUTATION_UPDATED, panel[5]['uuid'], _user(6, status='DISABLED'))
+        store.apply_mutation(UserAPI.MUTATION_DELETED, panel[6]['uuid'], None)
+        store.apply_mutation(UserAPI.MUTATION_CREATED, None, _user(32, usedTrafficBytes=7, trafficLimitBytes=7))
+
+        self.assertIs(snapshot.columns, columns)
+        self.assertEqual(self._aggregates(columns), self._aggregates(UserColumns(snapshot.users)))
+
+
+class LookupWithoutSnapshotTest(unittest.IsolatedAsyncioTestCase):
+    """Identifier lookups before the first snapshot go to the panel without waiting for all users"""
+
+    async def test_lookup_does_not_wait_for_the_download(self):
+        store = UserStore(ttl=300)
+        release = asyncio.Event()
+
+        async def download():
+            await release.wait()
+            return {'users': [], 'total': 0, 'complete': True}
+
+        found = _user(1)
+        with mock.patch.object(UserAPI, 'get_all_users', download), \
+                mock.patch.object(UserAPI, 'get_user_by_username', mock.AsyncMock(return_value=found)):
+            user = await asyncio.wait_for(store.get_by_username(found['username']), 1)
+            self.assertEqual(user.uuid, found['uuid'])
+            self.assertTrue(store.refreshing)
+            release.set()
+            await store.refresh()
+
+
+class LimitedSearchTest(unittest.IsolatedAsyncioTestCase):
+    """A search cut at a limit keeps the exact and id-prefix matches of a broad query"""
+
+    async def asyncSetUp(self):
+        self.panel = [_user(index, username=f'abc{index}', description='00000000-0000-4000-8000-00000000009')
+                      for index in range(1, 60)]
+        self.panel.append(_user(90, username='abc'))
+        self.store = UserStore(ttl=300)
+        with mock.patch.object(UserAPI, 'get_all_users', mock.AsyncMock(return_value={
+                'users': self.panel, 'total': len(self.panel), 'complete': True})):
+            await self.store.refresh()
+
+    async def test_exact_username_survives_the_cut(self):
+        matches = await self.store.search('abc', 5)
+        self.assertEqual(len(matches), 5)
+        self.assertEqual(matches[0].username, 'abc')
+
+    async def test_id_prefix_survives_the_cut(self):
+        matches = await self.store.search('00000000-0000-4000-8000-00000000009', 5)
+        self.assertEqual(len(matches), 5)
+        self.assertEqual(matches[0].uuid, self.panel[-1]['uuid'])
+
+
+if __name__ == '__main__':
+    unittest.main()